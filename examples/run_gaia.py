@@ -9,6 +9,7 @@ import os
 import sys
 import threading
 from datetime import datetime
+from functools import partial
 from pathlib import Path
 
 import pandas as pd
@@ -17,12 +18,20 @@ from mmengine import DictAction
 root = str(Path(__file__).resolve().parents[1])
 sys.path.append(root)
 
-from src.agent import create_agent, prepare_response
+from src.agent import (
+    AgentFactory,
+    BenchmarkRunner,
+    ShardedBenchmarkRunner,
+    is_infrastructure_error,
+    prepare_response,
+)
 from src.config import config
-from src.logger import logger
+from src.logger import LoopMonitor, logger, metrics, model_ledger, tracer
+from src.memory import MemoryCheckpoint, build_run_report, format_run_report
 from src.metric import question_scorer
 from src.models import model_manager
 from src.registry import DATASET
+from src.tools import artifact_store
 
 append_answer_lock = threading.Lock()
 
@@ -90,10 +99,22 @@ def get_tasks_to_run(answers_file, dataset) -> list[dict]:
         done_questions = []
     return [line for line in data.to_dict(orient="records") if line["task_id"] not in done_questions]
 
-async def answer_single_question(config, example):
+def resumable_checkpoint(checkpoint_path: str) -> str | None:
+    """Return `checkpoint_path` if it holds an unfinished run to continue, None to start the task over."""
+    if not os.path.exists(checkpoint_path):
+        return None
+    try:
+        checkpoint = MemoryCheckpoint.load(checkpoint_path)
+    except ValueError:
+        # Interrupted before its first step
+        return None
+    # A finished run whose answer was not kept, e.g. because it was retried, is run again rather than replayed
+    return None if checkpoint.finished else checkpoint_path
+
+async def answer_single_question(config, example, agent_factory: AgentFactory):
 
     try:
-        agent = await create_agent(config)
+        agent = await agent_factory.create()
         logger.visualize_agent_tree(agent)
 
         logger.info(f"Task Id: {example['task_id']}, Final Answer: {example['true_answer']}")
@@ -109,16 +130,26 @@ async def answer_single_question(config, example):
 
         start_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-        # Run agent 🚀
-        final_result = await agent.run(task=augmented_question)
+        # Checkpoint every step, continuing an interrupted run of this task if there is one
+        checkpoint_path = os.path.join(config.exp_path, "checkpoints", f"{example['task_id']}.jsonl")
+        resume_from = await asyncio.to_thread(resumable_checkpoint, checkpoint_path)
+
+        # Run agent 🚀, attributing every model call to this task in the ledger
+        with model_ledger.caller(f"task_{example['task_id']}"):
+            final_result = await agent.run(task=augmented_question,
+                                           time_limit=config.get("task_time_limit", None),
+                                           checkpoint_path=checkpoint_path,
+                                           resume_from=resume_from)
 
-        agent_memory = await agent.write_memory_to_messages(summary_mode=True)
+            agent_memory = await agent.write_memory_to_messages(summary_mode=True)
 
-        final_result = await prepare_response(augmented_question,
-                                              agent_memory,
-                                              reformulation_model=model_manager.registered_models["gpt-4.1"])
+            final_result = await prepare_response(augmented_question,
+                                                  agent_memory,
+                                                  reformulation_model=model_manager.registered_models["gpt-4.1"])
 
         output = str(final_result)
+        performance = build_run_report(agent)
+        logger.info(f"| Performance of task {example['task_id']}:\n{format_run_report(performance)}")
         for memory_step in agent.memory.steps:
             memory_step.model_input_messages = None
         intermediate_steps = [str(step) for step in agent.memory.steps]
@@ -131,11 +162,15 @@ async def answer_single_question(config, example):
         raised_exception = False
 
     except Exception as e:
+        # Leave the task to the runner to retry
+        if is_infrastructure_error(e):
+            raise
         logger.info("Error on ", augmented_question, e)
         output = None
         intermediate_steps = []
         parsing_error = False
         iteration_limit_exceeded = False
+        performance = None
         exception = e
         raised_exception = True
     end_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -148,13 +183,47 @@ async def answer_single_question(config, example):
         "parsing_error": parsing_error,
         "iteration_limit_exceeded": iteration_limit_exceeded,
         "agent_error": str(exception) if raised_exception else None,
+        "performance": performance,
         "start_time": start_time,
         "end_time": end_time,
         "task": example["task"],
         "task_id": example["task_id"],
         "true_answer": example["true_answer"],
     }
-    append_answer(annotated_example, config.save_path)
+    return annotated_example
+
+async def create_solve(args, shard):
+    """Set up a shard process of a sharded run: its configuration, log file, models and a warm agent."""
+    config.init_config(args.config, args)
+    log_root, log_ext = os.path.splitext(config.log_path)
+    logger.init_logger(log_path=f"{log_root}_shard{shard}{log_ext}")
+    model_manager.init_models(use_local_proxy=True)
+    if config.get("tracing", False):
+        tracer.enable()
+    artifact_store.set_root(os.path.join(config.exp_path, "artifacts"))
+
+    agent_factory = AgentFactory(config)
+    await agent_factory.create()
+    return partial(answer_single_question, config, agent_factory=agent_factory)
+
+async def shutdown_shard(shard):
+    """Export the model calls, trace and metrics recorded by a shard process of a sharded run to files of its own."""
+    export_records(suffix=f"_shard{shard}")
+    if config.get("metrics", None):
+        metrics.write_snapshot(os.path.join(config.exp_path, f"metrics_shard{shard}.jsonl"))
+
+def export_records(suffix: str = ""):
+    """Export the model call ledger and the trace of this process to the experiment directory."""
+    ledger_path = os.path.join(config.exp_path, f"model_calls{suffix}.jsonl")
+    model_ledger.export_jsonl(ledger_path)
+    logger.info(f"| Model calls exported to {ledger_path}")
+    for model_id, stats in model_ledger.aggregate("model_id").items():
+        logger.info(f"| {model_id}: {json.dumps(stats)}")
+
+    if tracer.enabled:
+        tracer.export_jsonl(os.path.join(config.exp_path, f"trace{suffix}.jsonl"))
+        tracer.export_chrome_trace(os.path.join(config.exp_path, f"trace{suffix}.json"))
+        logger.info(f"| Trace exported to {config.exp_path}")
 
 def parse_args():
     parser = argparse.ArgumentParser(description='main')
@@ -198,12 +267,63 @@ async def main():
     tasks_to_run = [task for task in tasks_to_run[:1]]
     logger.info(f"| Loaded {len(tasks_to_run)} tasks to run.")
 
-    # Run tasks
-    batch_size = getattr(config, "concurrency", 4)
-    for i in range(0, len(tasks_to_run), batch_size):
-        batch = tasks_to_run[i:min(i + batch_size, len(tasks_to_run))]
-        await asyncio.gather(*[answer_single_question(config, task) for task in batch])
-        logger.info(f"| Batch {i // batch_size + 1} done.")
+    # Trace runs, steps, model calls and tool calls, for offline viewing in chrome://tracing or Perfetto
+    if config.get("tracing", False):
+        tracer.enable()
+
+    # Keep the large tool observations spilled by the agents next to the results
+    artifact_store.set_root(os.path.join(config.exp_path, "artifacts"))
+
+    # Build the agent hierarchy once, each task runs on a fresh clone
+    agent_factory = AgentFactory(config)
+
+    # Serve live metrics on localhost and snapshot them, e.g. metrics = dict(port=9464, snapshot_interval=60)
+    metrics_config = config.get("metrics", None)
+    metrics_path = os.path.join(config.exp_path, "metrics.jsonl")
+    if metrics_config:
+        if metrics_config.get("port"):
+            port = metrics.serve(port=metrics_config["port"])
+            logger.info(f"| Metrics served at http://127.0.0.1:{port}/metrics")
+        metrics.start_snapshots(metrics_path, interval=metrics_config.get("snapshot_interval", 60))
+
+    # Watch the event loop for blocking calls, e.g. loop_monitor = dict(threshold=0.25, baseline="loop_baseline.json")
+    loop_monitor = LoopMonitor(**config.loop_monitor) if config.get("loop_monitor", None) else None
+    if loop_monitor is not None:
+        loop_monitor.start()
+
+    # Run tasks on a pool of workers pulling from a queue, Ctrl-C drains it. With processes > 1, the tasks are
+    # spread over that many processes, each with its own event loop and agents, and the answers are written here
+    # while each process exports its own model calls, trace and metrics
+    runner_options = dict(on_result=lambda task, answer: append_answer(answer, config.save_path),
+                          concurrency=config.get("concurrency", 4),
+                          task_timeout=config.get("task_timeout", None),
+                          max_retries=config.get("task_retries", 2))
+    sharded = config.get("processes", 1) > 1
+    if sharded:
+        runner = ShardedBenchmarkRunner(partial(create_solve, args), shutdown_shard=shutdown_shard,
+                                        processes=config.processes, **runner_options)
+    else:
+        runner = BenchmarkRunner(partial(answer_single_question, config, agent_factory=agent_factory),
+                                 **runner_options)
+    await runner.run(tasks_to_run)
+
+    if loop_monitor is not None:
+        await loop_monitor.stop()
+        loop_monitor.export_json(os.path.join(config.exp_path, "event_loop.json"))
+        logger.info(f"| {loop_monitor.format_report()}")
+
+    # Export the model call ledger and the trace, those of a sharded run are in the files of each shard
+    if not sharded:
+        export_records()
+
+    # Export the final metrics, those of the runner for a sharded run
+    if metrics_config:
+        metrics.write_snapshot(metrics_path)
+        metrics.shutdown()
+
+    # Fail on blocking calls missing from the baseline of the event loop monitor
+    if loop_monitor is not None and loop_monitor.baseline:
+        loop_monitor.check()
 
 if __name__ == '__main__':
     asyncio.run(main())
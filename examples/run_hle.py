@@ -9,6 +9,7 @@ import os
 import sys
 import threading
 from datetime import datetime
+from functools import partial
 from pathlib import Path
 
 import pandas as pd
@@ -17,7 +18,13 @@ from mmengine import DictAction
 root = str(Path(__file__).resolve().parents[1])
 sys.path.append(root)
 
-from src.agent import create_agent, prepare_response
+from src.agent import (
+    AgentFactory,
+    BenchmarkRunner,
+    ShardedBenchmarkRunner,
+    is_infrastructure_error,
+    prepare_response,
+)
 from src.config import config
 from src.logger import logger
 from src.models import model_manager
@@ -51,9 +58,9 @@ def get_tasks_to_run(answers_file, dataset) -> list[dict]:
         done_questions = []
     return [line for line in data.to_dict(orient="records") if line["task_id"] not in done_questions]
 
-async def answer_single_question(config, example):
+async def answer_single_question(config, example, agent_factory: AgentFactory):
 
-    agent = await create_agent(config)
+    agent = await agent_factory.create()
     logger.visualize_agent_tree()
 
     logger.info(f"Task Id: {example['task_id']}, Final Answer: {example['true_answer']}")
@@ -71,7 +78,7 @@ async def answer_single_question(config, example):
     start_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     try:
         # Run agent 🚀
-        final_result = await agent.run(task=augmented_question)
+        final_result = await agent.run(task=augmented_question, time_limit=config.get("task_time_limit", None))
 
         agent_memory = await agent.write_memory_to_messages(summary_mode=True)
 
@@ -90,6 +97,9 @@ async def answer_single_question(config, example):
         raised_exception = False
 
     except Exception as e:
+        # Leave the task to the runner to retry
+        if is_infrastructure_error(e):
+            raise
         logger.info("Error on ", augmented_question, e)
         output = None
         intermediate_steps = []
@@ -113,9 +123,20 @@ async def answer_single_question(config, example):
         "task_id": example["task_id"],
         "true_answer": example["true_answer"],
     }
-    append_answer(annotated_example, config.save_path)
+    return annotated_example
 
 
+async def create_solve(args, shard):
+    """Set up a shard process of a sharded run: its configuration, log file, models and a warm agent."""
+    config.init_config(args.config, args)
+    log_root, log_ext = os.path.splitext(config.log_path)
+    logger.init_logger(log_path=f"{log_root}_shard{shard}{log_ext}")
+    model_manager.init_models(use_local_proxy=True)
+
+    agent_factory = AgentFactory(config)
+    await agent_factory.create()
+    return partial(answer_single_question, config, agent_factory=agent_factory)
+
 def parse_args():
     parser = argparse.ArgumentParser(description='main')
     parser.add_argument("--config", default=os.path.join(root, "configs", "config_gaia.py"), help="config file path")
@@ -159,12 +180,21 @@ async def main():
     tasks_to_run = [task for task in tasks_to_run]
     logger.info(f"| Loaded {len(tasks_to_run)} tasks to run.")
 
-    # Run tasks
-    batch_size = getattr(config, "concurrency", 4)
-    for i in range(0, len(tasks_to_run), batch_size):
-        batch = tasks_to_run[i:min(i + batch_size, len(tasks_to_run))]
-        await asyncio.gather(*[answer_single_question(config, task) for task in batch])
-        logger.info(f"| Batch {i // batch_size + 1} done.")
+    # Build the agent hierarchy once, each task runs on a fresh clone
+    agent_factory = AgentFactory(config)
+
+    # Run tasks on a pool of workers pulling from a queue, Ctrl-C drains it. With processes > 1, the tasks are
+    # spread over that many processes, each with its own event loop and agents, and the answers are written here
+    runner_options = dict(on_result=lambda task, answer: append_answer(answer, config.save_path),
+                          concurrency=config.get("concurrency", 4),
+                          task_timeout=config.get("task_timeout", None),
+                          max_retries=config.get("task_retries", 2))
+    if config.get("processes", 1) > 1:
+        runner = ShardedBenchmarkRunner(partial(create_solve, args), processes=config.processes, **runner_options)
+    else:
+        runner = BenchmarkRunner(partial(answer_single_question, config, agent_factory=agent_factory),
+                                 **runner_options)
+    await runner.run(tasks_to_run)
 
 if __name__ == '__main__':
     asyncio.run(main())
@@ -1,10 +1,18 @@
-from src.agent.agent import create_agent
+from src.agent.agent import AgentFactory, create_agent
 from src.agent.browser_use_agent import BrowserUseAgent
 from src.agent.deep_analyzer_agent import DeepAnalyzerAgent
 from src.agent.deep_researcher_agent import DeepResearcherAgent
 from src.agent.general_agent import GeneralAgent
 from src.agent.planning_agent import PlanningAgent
 from src.agent.reformulator import prepare_response
+from src.agent.runner import (
+    BenchmarkRunner,
+    ShardedBenchmarkRunner,
+    ShardInfrastructureError,
+    ShardTaskError,
+    TaskResult,
+    is_infrastructure_error,
+)
 
 __all__ = [
     "PlanningAgent",
@@ -13,5 +21,12 @@ __all__ = [
     "DeepResearcherAgent",
     "GeneralAgent",
     "create_agent",
+    "AgentFactory",
     "prepare_response",
+    "BenchmarkRunner",
+    "ShardedBenchmarkRunner",
+    "ShardTaskError",
+    "ShardInfrastructureError",
+    "TaskResult",
+    "is_infrastructure_error",
 ]
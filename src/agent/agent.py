@@ -1,6 +1,9 @@
 
+import asyncio
+
 from src.logger import logger
 from src.mcp.mcpadapt import AsyncToolAdapter, MCPAdapt
+from src.memory import MemoryCompactor
 from src.models import model_manager
 from src.registry import AGENT, TOOL
 from src.tools import make_tool_instance
@@ -78,6 +81,13 @@ async def build_agent(config,
     # Load Model
     model = model_manager.registered_models[agent_config["model_id"]]
 
+    # Summarize old observations with a cheap model once the history exceeds a token budget
+    memory_compactor = None
+    if agent_config.get("memory_compaction", None) is not None:
+        compaction_config = dict(agent_config["memory_compaction"])
+        compaction_model = model_manager.registered_models[compaction_config.pop("model_id")]
+        memory_compactor = MemoryCompactor(model=compaction_model, **compaction_config)
+
     # Build Agent
     combined_tools = tools + mcp_tools + managed_agent_tools
     agent_config = dict(
@@ -88,7 +98,15 @@ async def build_agent(config,
         max_steps=agent_config.max_steps,
         name=agent_config.name,
         description=agent_config.description,
-        provide_run_summary=agent_config.provide_run_summary
+        provide_run_summary=agent_config.provide_run_summary,
+        stream_outputs=agent_config.get("stream_outputs", False),
+        pipeline_tool_calls=agent_config.get("pipeline_tool_calls", False),
+        tool_cache=agent_config.get("tool_cache", None),
+        time_limit=agent_config.get("time_limit", None),
+        memory_compactor=memory_compactor,
+        max_observation_chars=agent_config.get("max_observation_chars", None),
+        memoize_managed_agents=agent_config.get("memoize_managed_agents", False),
+        managed_agent_similarity=agent_config.get("managed_agent_similarity", None),
     )
     agent = AGENT.build(agent_config)
 
@@ -148,3 +166,21 @@ async def create_agent(config):
         )
 
         return agent
+
+
+class AgentFactory:
+    """
+    Builds the agent hierarchy described by `config` once, on first use, and hands out cheap per-task clones of it
+    that share the MCP tools, tools, models and prompts but have their own memory and state.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.prototype = None
+        self._lock = asyncio.Lock()
+
+    async def create(self):
+        async with self._lock:
+            if self.prototype is None:
+                self.prototype = await create_agent(self.config)
+        return self.prototype.clone()
@@ -1,5 +1,9 @@
 import asyncio
+import contextlib
+import copy
 import json
+import time
+import weakref
 from collections.abc import AsyncGenerator
 from typing import Any
 
@@ -16,12 +20,14 @@ from src.base.async_multistep_agent import (
     populate_template,
 )
 from src.exception import (
+    AgentDeadlineError,
     AgentGenerationError,
+    AgentMaxStepsError,
     AgentParsingError,
     AgentToolCallError,
     AgentToolExecutionError,
 )
-from src.logger import YELLOW_HEX, LogLevel
+from src.logger import YELLOW_HEX, LogLevel, Timing, metrics, model_ledger, tracer
 from src.memory import ActionStep, AgentMemory, ToolCall
 from src.models import (
     ChatMessage,
@@ -31,15 +37,43 @@ from src.models import (
     parse_json_if_needed,
 )
 from src.registry import AGENT
-from src.utils import assemble_project_path
+from src.tools.artifact_reader import ArtifactReaderTool
+from src.tools.artifacts import artifact_store
+from src.tools.cache import (
+    ManagedAgentCall,
+    ManagedAgentMemo,
+    ToolResultCache,
+    tool_result_cache,
+)
+from src.tools.planning import PlanningTool
+from src.tools.tools import ToolResult
+from src.utils import assemble_project_path, budget
 from src.utils.agent_types import (
     AgentAudio,
     AgentImage,
 )
 
 
+def _is_complete_json(text: str) -> bool:
+    """Whether `text` is a complete JSON object, i.e. streamed tool call arguments that have closed."""
+    text = text.strip()
+    if not text.endswith("}"):
+        return False
+    try:
+        json.loads(text)
+    except ValueError:
+        return False
+    return True
+
+
 @AGENT.register_module(name="general_agent", force=True)
 class GeneralAgent(AsyncMultiStepAgent):
+    # Per-tool semaphores enforcing `Tool.max_concurrency` across all agents of the process, by event loop since a
+    # semaphore can only be used in the loop it was first awaited in
+    _tool_semaphores: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[str, asyncio.Semaphore]] = (
+        weakref.WeakKeyDictionary()
+    )
+
     def __init__(
             self,
             config,
@@ -49,6 +83,12 @@ class GeneralAgent(AsyncMultiStepAgent):
             planning_interval: int | None = None,
             stream_outputs: bool = False,
             max_tool_threads: int | None = None,
+            pipeline_tool_calls: bool = False,
+            tool_cache: str | None = None,
+            max_observation_chars: int | None = None,
+            observation_preview_chars: int = 2000,
+            memoize_managed_agents: bool = False,
+            managed_agent_similarity: float | None = None,
             **kwargs,
     ):
         self.config = config
@@ -61,6 +101,18 @@ class GeneralAgent(AsyncMultiStepAgent):
             **kwargs,
         )
 
+        # Observations longer than `max_observation_chars` are stored in the artifact store, the model gets a
+        # preview of `observation_preview_chars` and reads the rest with the artifact reader tool
+        self.max_observation_chars = max_observation_chars
+        self.observation_preview_chars = observation_preview_chars
+        # The run summaries of managed agents also point to their full transcript in the artifact store
+        provides_run_summaries = any(
+            getattr(getattr(tool, "agent", None), "provide_run_summary", False) for tool in self.tools.values()
+        )
+        if self.max_observation_chars is not None or provides_run_summaries:
+            self.tools.setdefault(ArtifactReaderTool.name, ArtifactReaderTool())
+        self._bind_planning_tool()
+
         template_path = assemble_project_path(self.config.template_path)
         with open(template_path) as f:
             self.prompt_templates = yaml.safe_load(f)
@@ -76,6 +128,19 @@ class GeneralAgent(AsyncMultiStepAgent):
             )
         # Tool calling setup
         self.max_tool_threads = max_tool_threads
+        # Start tool calls while the model is still streaming the rest of its response
+        self.pipeline_tool_calls = pipeline_tool_calls
+        # Reuse the results of cacheable tools: None, "run" (shared by the whole agent hierarchy of a run) or "global"
+        if tool_cache not in (None, "run", "global"):
+            raise ValueError(f"Unknown tool cache scope: {tool_cache}")
+        self.tool_cache = tool_cache
+        # Reuse the calls to managed agents within a run: a repeated task gets the previous result back, or restarts
+        # from the previous memory if that call ended without an answer. Tasks at least `managed_agent_similarity`
+        # similar (between 0 and 1) count as repeated, otherwise only identical normalized tasks do.
+        self.memoize_managed_agents = memoize_managed_agents
+        self.managed_agent_similarity = managed_agent_similarity
+        # Tool calls in progress, cancelled when the agent is interrupted
+        self._running_tool_tasks: set[asyncio.Task] = set()
 
         self.memory = AgentMemory(
             system_prompt=self.system_prompt,
@@ -127,13 +192,13 @@ class GeneralAgent(AsyncMultiStepAgent):
         Yields ChatMessageStreamDelta during the run if streaming is enabled.
         At the end, yields either None if the step is not final, or the final answer.
         """
-        memory_messages = await self.write_memory_to_messages()
+        input_messages = await self.write_memory_to_messages()
 
-        input_messages = memory_messages.copy()
-
-        # Add new step in logs
-        memory_step.model_input_messages = input_messages
+        # Add new step in logs, keeping only a reference to its input messages
+        memory_step.model_input_reference = self.memory.reference_messages()
 
+        # Tool calls started during streaming, by tool call id
+        started_tool_calls: dict[str, tuple[str, Any, asyncio.Task, Timing]] = {}
         try:
             if self.stream_outputs and hasattr(self.model, "generate_stream"):
                 output_stream = self.model.generate_stream(
@@ -143,9 +208,12 @@ class GeneralAgent(AsyncMultiStepAgent):
                 )
 
                 chat_message_stream_deltas: list[ChatMessageStreamDelta] = []
+                partial_tool_calls: dict[int, dict[str, Any]] = {}
                 with Live("", console=self.logger.console, vertical_overflow="visible") as live:
-                    for event in output_stream:
+                    async for event in self._iterate_model_stream(output_stream):
                         chat_message_stream_deltas.append(event)
+                        if self.pipeline_tool_calls:
+                            self._dispatch_streamed_tool_calls(event, partial_tool_calls, started_tool_calls)
                         live.update(
                             Markdown(agglomerate_stream_deltas(chat_message_stream_deltas).render_as_markdown())
                         )
@@ -158,17 +226,20 @@ class GeneralAgent(AsyncMultiStepAgent):
                     tools_to_call_from=self.tools_and_managed_agents,
                 )
 
-                self.logger.log_markdown(
-                    content=chat_message.content if chat_message.content else str(chat_message.raw),
-                    title="Output message of the LLM:",
-                    level=LogLevel.DEBUG,
-                )
+                if self.logger.is_enabled(LogLevel.DEBUG):
+                    self.logger.log_markdown(
+                        content=chat_message.content if chat_message.content else str(chat_message.raw),
+                        title="Output message of the LLM:",
+                        level=LogLevel.DEBUG,
+                    )
 
             # Record model output
             memory_step.model_output_message = chat_message
             memory_step.model_output = chat_message.content
             memory_step.token_usage = chat_message.token_usage
         except Exception as e:
+            for _, _, task, _ in started_tool_calls.values():
+                task.cancel()
             raise AgentGenerationError(f"Error while generating output:\n{e}", self.logger) from e
 
         if chat_message.tool_calls is None or len(chat_message.tool_calls) == 0:
@@ -180,19 +251,116 @@ class GeneralAgent(AsyncMultiStepAgent):
             for tool_call in chat_message.tool_calls:
                 tool_call.function.arguments = parse_json_if_needed(tool_call.function.arguments)
 
-        async for event in self.process_tool_calls(chat_message, memory_step):
+        async for event in self.process_tool_calls(chat_message, memory_step, started_tool_calls):
             yield event
 
-    async def process_tool_calls(self, chat_message: ChatMessage, memory_step: ActionStep) -> AsyncGenerator[StreamEvent]:
+    async def _iterate_model_stream(self, output_stream):
+        """
+        Iterate over a model output stream. When tool calls are pipelined, each delta is pulled in a worker thread
+        so that the event loop can run the tool calls started meanwhile.
+        """
+        if not self.pipeline_tool_calls:
+            for event in output_stream:
+                yield event
+            return
+        sentinel = object()
+        while (event := await asyncio.to_thread(next, output_stream, sentinel)) is not sentinel:
+            yield event
+
+    def _dispatch_streamed_tool_calls(
+        self,
+        event: ChatMessageStreamDelta,
+        partial_tool_calls: dict[int, dict[str, Any]],
+        started_tool_calls: dict[str, tuple[str, Any, asyncio.Task, Timing]],
+    ):
+        """
+        Accumulate the tool call deltas of `event` and start every tool call whose arguments are complete: either
+        they parse as a JSON object or the model moved on to the next tool call.
+        """
+        if not event.tool_calls:
+            return
+        for delta in event.tool_calls:
+            partial = partial_tool_calls.setdefault(delta.index, {"id": None, "name": "", "arguments": ""})
+            if delta.id:
+                partial["id"] = delta.id
+            if delta.function:
+                if delta.function.name:
+                    partial["name"] = delta.function.name
+                if delta.function.arguments:
+                    partial["arguments"] += delta.function.arguments
+
+        last_index = max(partial_tool_calls)
+        for index in sorted(partial_tool_calls):
+            partial = partial_tool_calls[index]
+            if partial["name"] == "final_answer_tool":
+                break  # Nothing after the final answer is executed
+            if not partial["id"] or not partial["name"] or partial["id"] in started_tool_calls:
+                continue
+            if index < last_index or _is_complete_json(partial["arguments"]):
+                tool_arguments = parse_json_if_needed(partial["arguments"])
+                timing = Timing(start_time=time.time())
+                task = asyncio.create_task(self._process_single_tool_call(partial["name"], tool_arguments, timing))
+                started_tool_calls[partial["id"]] = (partial["name"], tool_arguments, task, timing)
+
+    async def _process_single_tool_call(self, tool_name: str, tool_arguments: Any, timing: Timing | None = None) -> str:
+        """Execute one tool call and return its observation. `timing`, if given, gets the end time of the call."""
+        try:
+            return await self._run_single_tool_call(tool_name, tool_arguments)
+        finally:
+            if timing is not None:
+                timing.end_time = time.time()
+
+    async def _run_single_tool_call(self, tool_name: str, tool_arguments: Any) -> str:
+        self.logger.log(
+            Panel(Text(f"Calling tool: '{tool_name}' with arguments: {tool_arguments}")),
+            level=LogLevel.INFO,
+        )
+        if tool_arguments is None:
+            tool_arguments = {}
+        tool_call_result = await self._execute_tool_call_with_limits(tool_name, tool_arguments)
+        tool_call_result_type = type(tool_call_result)
+        if tool_call_result_type in [AgentImage, AgentAudio]:
+            if tool_call_result_type == AgentImage:
+                observation_name = "image.png"
+            elif tool_call_result_type == AgentAudio:
+                observation_name = "audio.mp3"
+            # TODO: tool_call_result naming could allow for different names of same type
+            self.state[observation_name] = tool_call_result
+            observation = f"Stored '{observation_name}' in memory."
+        else:
+            observation = str(tool_call_result).strip()
+            if (
+                self.max_observation_chars is not None
+                and len(observation) > self.max_observation_chars
+                and tool_name != ArtifactReaderTool.name
+            ):
+                observation = await asyncio.to_thread(
+                    artifact_store.preview, observation, self.observation_preview_chars
+                )
+        self.logger.log(
+            f"Observations: {observation.replace('[', '|')}",  # escape potential rich-tag-like components
+            level=LogLevel.INFO,
+        )
+        return observation
+
+    async def process_tool_calls(
+        self,
+        chat_message: ChatMessage,
+        memory_step: ActionStep,
+        started_tool_calls: dict[str, tuple[str, Any, asyncio.Task, Timing]] | None = None,
+    ) -> AsyncGenerator[StreamEvent]:
         """Process tool calls from the model output and update agent memory.
 
         Args:
             chat_message (`ChatMessage`): Chat message containing tool calls from the model.
             memory_step (`ActionStep)`: Memory ActionStep to update with results.
+            started_tool_calls (`dict`, *optional*): Tool calls already started while streaming, by tool call id,
+                as (tool name, arguments, task). Their results are reused if the final call matches.
 
         Yields:
             `ActionOutput`: The final output of tool execution.
         """
+        started_tool_calls = started_tool_calls if started_tool_calls is not None else {}
         model_outputs = []
         tool_calls = []
         observations = []
@@ -211,34 +379,25 @@ class GeneralAgent(AsyncMultiStepAgent):
                 final_answer_call = (tool_name, tool_arguments)
                 break  # Stop: final answer reached, no further tool calls
             else:
-                parallel_calls.append((tool_name, tool_arguments))
-
-        # Helper function to process a single tool call
-        async def process_single_tool_call(call_info):
-            tool_name, tool_arguments = call_info
-            self.logger.log(
-                Panel(Text(f"Calling tool: '{tool_name}' with arguments: {tool_arguments}")),
-                level=LogLevel.INFO,
-            )
-            if tool_arguments is None:
-                tool_arguments = {}
-            tool_call_result = await self.execute_tool_call(tool_name, tool_arguments)
-            tool_call_result_type = type(tool_call_result)
-            if tool_call_result_type in [AgentImage, AgentAudio]:
-                if tool_call_result_type == AgentImage:
-                    observation_name = "image.png"
-                elif tool_call_result_type == AgentAudio:
-                    observation_name = "audio.mp3"
-                # TODO: tool_call_result naming could allow for different names of same type
-                self.state[observation_name] = tool_call_result
-                observation = f"Stored '{observation_name}' in memory."
-            else:
-                observation = str(tool_call_result).strip()
-            self.logger.log(
-                f"Observations: {observation.replace('[', '|')}",  # escape potential rich-tag-like components
-                level=LogLevel.INFO,
-            )
-            return observation
+                parallel_calls.append((tool_name, tool_arguments, tool_call.id, tool_calls[-1]))
+
+        # Helper function to process a single tool call, reusing the run started during streaming if any
+        def process_single_tool_call(call_info):
+            tool_name, tool_arguments, tool_call_id, memory_tool_call = call_info
+            started = started_tool_calls.pop(tool_call_id, None)
+            if started is not None:
+                if started[:2] == (tool_name, tool_arguments):
+                    memory_tool_call.timing = started[3]
+                    return started[2]
+                started[2].cancel()
+            memory_tool_call.timing = Timing(start_time=time.time())
+            return self._process_single_tool_call(tool_name, tool_arguments, memory_tool_call.timing)
+
+        # Tool calls started during streaming but not part of the final response are dropped
+        parallel_call_ids = {call_info[2] for call_info in parallel_calls}
+        for tool_call_id in list(started_tool_calls):
+            if tool_call_id not in parallel_call_ids:
+                started_tool_calls.pop(tool_call_id)[2].cancel()
 
         # Process tool calls in parallel
         if parallel_calls:
@@ -293,7 +452,189 @@ class GeneralAgent(AsyncMultiStepAgent):
         if observations:
             memory_step.observations = "\n".join(observations)
 
-    async def execute_tool_call(self, tool_name: str, arguments: dict[str, str] | str) -> Any:
+    def clone(self) -> "GeneralAgent":
+        """
+        Return a copy of this agent ready for a new task, see `AsyncMultiStepAgent.clone`. The copy also gets its own
+        running tool calls and a planning tool that runs plan steps on the copy's managed agents. The tool result
+        cache and the managed agent memo belong to the run rather than to the agent, so the clones of a run share
+        them.
+        """
+        agent = super().clone()
+        agent._running_tool_tasks = set()
+        agent._bind_planning_tool()
+        return agent
+
+    def _bind_planning_tool(self):
+        """Let the planning tool of this agent, if any, run plan steps on its managed agents."""
+        planning_tool = self.tools.get("planning_tool")
+        if isinstance(planning_tool, PlanningTool):
+            planning_tool.step_runner = self._run_plan_step
+
+    async def _run_plan_step(self, agent_name: str, task: str) -> str:
+        """Run a plan step on a fresh clone of the managed agent `agent_name`, so that steps can run concurrently."""
+        tool = self.tools.get(agent_name)
+        if getattr(tool, "agent", None) is None:
+            team_members = [name for name, tool in self.tools.items() if getattr(tool, "agent", None) is not None]
+            raise AgentToolExecutionError(
+                f"Unknown team member {agent_name}, should be one of: {', '.join(team_members)}.", self.logger
+            )
+        # Within the concurrency and time limits of the team member, like its calls by the model. A step that is
+        # cancelled fails, so that the plan blocks it rather than running its dependents on the cancellation notice
+        fork = tool.fork()
+        try:
+            result = await self._execute_tool_call_with_limits(
+                agent_name, {"task": task}, tool=fork, raise_on_cancel=True
+            )
+        finally:
+            # The run report finds the runs of the fork among those of the team member
+            if hasattr(tool, "runs"):
+                tool.runs.extend(fork.runs)
+        return str(result).strip()
+
+    def interrupt(self):
+        """Interrupts the agent execution, cancelling the tool calls in progress."""
+        super().interrupt()
+        for task in list(self._running_tool_tasks):
+            task.cancel()
+
+    async def _execute_tool_call_with_limits(
+        self, tool_name: str, tool_arguments: Any, tool: Any = None, raise_on_cancel: bool = False
+    ) -> Any:
+        """
+        Execute a tool call within the tool's `max_concurrency` and `timeout`. A call that times out or is
+        interrupted is cancelled and a structured observation describing it is returned instead of its result, or
+        raised as an `AgentToolExecutionError` if `raise_on_cancel`. `tool`, if given, is called instead of the tool
+        named `tool_name`, e.g. a fork of it, within the limits of the latter.
+        """
+        limited_tool = {**self.tools, **self.managed_agents}.get(tool_name)
+        max_concurrency = getattr(limited_tool, "max_concurrency", None)
+        timeout = budget(getattr(limited_tool, "timeout", None))
+        semaphore = None
+        if max_concurrency:
+            semaphores = self._tool_semaphores.setdefault(asyncio.get_running_loop(), {})
+            semaphore = semaphores.setdefault(tool_name, asyncio.Semaphore(max_concurrency))
+
+        queue_start_time = time.time()
+        async with semaphore if semaphore is not None else contextlib.nullcontext():
+            start_time = time.time()
+            metrics.histogram("tool_queue_seconds", "Wait of tool calls for a concurrency slot.").observe(
+                start_time - queue_start_time, tool=tool_name
+            )
+            in_flight = metrics.gauge("tool_calls_in_flight", "Tool calls running.")
+            in_flight.inc(tool=tool_name)
+            task = asyncio.create_task(self.execute_tool_call(tool_name, tool_arguments, tool=tool))
+            self._running_tool_tasks.add(task)
+            try:
+                done, _ = await asyncio.wait({task}, timeout=timeout)
+            except asyncio.CancelledError:
+                task.cancel()
+                raise
+            finally:
+                self._running_tool_tasks.discard(task)
+                in_flight.dec(tool=tool_name)
+
+            if task in done and not task.cancelled():
+                metrics.histogram("tool_call_seconds", "Duration of tool calls.").observe(
+                    time.time() - start_time, tool=tool_name, status="error" if task.exception() else "ok"
+                )
+                return task.result()
+
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError, Exception):
+                await task
+            status = "interrupted" if task in done else "timeout"
+            metrics.histogram("tool_call_seconds", "Duration of tool calls.").observe(
+                time.time() - start_time, tool=tool_name, status=status
+            )
+            self.logger.log(f"Tool call '{tool_name}' {status}, cancelled.", level=LogLevel.INFO)
+            details = {
+                "status": status,
+                "tool": tool_name,
+                "arguments": tool_arguments,
+                "elapsed_seconds": round(time.time() - start_time, 1),
+                "timeout_seconds": timeout,
+            }
+            observation = (
+                f"Tool call cancelled: {json.dumps(details, default=str)}\n"
+                "The tool did not return a result. Try a narrower request or another tool."
+            )
+            if raise_on_cancel:
+                raise AgentToolExecutionError(observation, self.logger)
+            return observation
+
+    def _get_tool_cache(self, tool: Any) -> ToolResultCache | None:
+        """Return the cache to use for `tool`, if the tool is cacheable and this agent has a tool cache."""
+        if not getattr(tool, "cacheable", False) or self.tool_cache is None:
+            return None
+        if self.tool_cache == "global":
+            return tool_result_cache
+        return ToolResultCache.current()
+
+    async def _call_managed_agent(self, tool_name: str, tool: Any, task: str, memo: ManagedAgentMemo) -> ToolResult:
+        """Run the managed agent of `tool` on `task`, reusing a previous call to it on the same task if any."""
+        previous, similarity = memo.find(tool_name, task, self.managed_agent_similarity)
+        memo_requests = metrics.counter("managed_agent_memo_requests_total", "Lookups of the managed agent memo.")
+        if previous is not None and previous.completed:
+            tracer.annotate(memo_hit=True, memo_similarity=similarity)
+            memo.hits[tool_name] += 1
+            memo_requests.inc(agent=tool_name, result="hit")
+            self.logger.log(
+                f"Managed agent memo hit for '{tool_name}' (similarity {similarity:.2f}), "
+                f"reusing the result of: {previous.task[:200]!r} (stats: {memo.stats()[tool_name]})",
+                level=LogLevel.INFO,
+            )
+            return previous.result
+
+        runner = tool
+        if previous is not None:
+            memo.warm_starts[tool_name] += 1
+            tracer.annotate(memo_warm_start=True, memo_similarity=similarity)
+            memo_requests.inc(agent=tool_name, result="warm_start")
+            self.logger.log(
+                f"Managed agent memo warm start for '{tool_name}' (similarity {similarity:.2f}), continuing "
+                f"from the {len(previous.steps)} steps of: {previous.task[:200]!r}",
+                level=LogLevel.INFO,
+            )
+            # Continue on a fork, from copies of the recorded memory: the run changes neither the managed agent
+            # shared by the calls nor the memo entry
+            runner = tool.fork()
+            agent = runner.agent
+            agent.memory.reset()
+            agent.memory.steps.extend(copy.deepcopy(previous.steps))
+            agent.memory.images = copy.deepcopy(previous.images)
+            run = agent.run(task, reset=False)
+        else:
+            memo.misses[tool_name] += 1
+            memo_requests.inc(agent=tool_name, result="miss")
+            agent = tool.agent
+            run = agent.run(task)
+        try:
+            output = await run
+        finally:
+            runner.record_run()
+            if runner is not tool:
+                # The run report finds the runs of the fork among those of the managed agent
+                tool.runs.extend(runner.runs)
+
+        # A run that ran out of steps or time ends with an action step carrying that error
+        last_step = agent.memory.steps[-1] if agent.memory.steps else None
+        completed = not isinstance(getattr(last_step, "error", None), (AgentMaxStepsError, AgentDeadlineError))
+        if agent.provide_run_summary:
+            output = await agent.summarize_run(output, brief=True)
+        result = ToolResult(output=output, error=None)
+        memo.record(
+            tool_name,
+            ManagedAgentCall(
+                task=task,
+                result=result,
+                completed=completed,
+                steps=list(agent.memory.steps),
+                images=agent.memory.images,
+            ),
+        )
+        return result
+
+    async def execute_tool_call(self, tool_name: str, arguments: dict[str, str] | str, tool: Any = None) -> Any:
         """
         Execute a tool or managed agent with the provided arguments.
 
@@ -302,6 +643,7 @@ class GeneralAgent(AsyncMultiStepAgent):
         Args:
             tool_name (`str`): Name of the tool or managed agent to execute.
             arguments (dict[str, str] | str): Arguments passed to the tool call.
+            tool (`Any`, *optional*): Tool to call instead of the one named `tool_name`, e.g. a fork of it.
         """
         # Check if the tool exists
         available_tools = {**self.tools, **self.managed_agents}
@@ -311,12 +653,15 @@ class GeneralAgent(AsyncMultiStepAgent):
             )
 
         # Get the tool and substitute state variables in arguments
-        tool = available_tools[tool_name]
+        tool = tool if tool is not None else available_tools[tool_name]
         arguments = self._substitute_state_variables(arguments)
         is_managed_agent = tool_name in self.managed_agents
 
-        try:
-            # Call tool with appropriate arguments
+        async def call_tool():
+            memo = ManagedAgentMemo.current() if self.memoize_managed_agents else None
+            task = arguments.get("task") if isinstance(arguments, dict) else arguments
+            if memo is not None and getattr(tool, "agent", None) is not None and isinstance(task, str):
+                return await self._call_managed_agent(tool_name, tool, task, memo)
             if isinstance(arguments, dict):
                 return await tool(**arguments) if is_managed_agent else await tool(**arguments, sanitize_inputs_outputs=True)
             elif isinstance(arguments, str):
@@ -324,6 +669,25 @@ class GeneralAgent(AsyncMultiStepAgent):
             else:
                 raise TypeError(f"Unsupported arguments type: {type(arguments)}")
 
+        try:
+            # Call tool with appropriate arguments, attributing its model calls to the tool
+            kind = "agent" if is_managed_agent or getattr(tool, "agent", None) is not None else "tool"
+            with model_ledger.caller(tool_name), tracer.span(tool_name, kind) as span:
+                cache = self._get_tool_cache(tool)
+                if cache is None:
+                    return await call_tool()
+                result, hit = await cache.get_or_call(tool, arguments, call_tool)
+                span.set(cache_hit=hit)
+                metrics.counter("tool_cache_requests_total", "Lookups of the tool result cache.").inc(
+                    tool=tool_name, result="hit" if hit else "miss"
+                )
+                if hit:
+                    self.logger.log(
+                        f"Tool cache hit for '{tool_name}' (hits/misses: {cache.stats()[tool_name]})",
+                        level=LogLevel.INFO,
+                    )
+                return result
+
         except TypeError as e:
             # Handle invalid arguments
             description = getattr(tool, "description", "No description")
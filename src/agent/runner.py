@@ -0,0 +1,503 @@
+import asyncio
+import itertools
+import multiprocessing
+import queue
+import signal
+import threading
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from typing import Any
+
+from src.logger import logger, metrics
+
+
+def _infrastructure_errors() -> tuple[type[BaseException], ...]:
+    errors: list[type[BaseException]] = [ConnectionError, TimeoutError]
+    try:
+        import openai
+
+        errors += [openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError]
+    except ImportError:
+        pass
+    try:
+        import httpx
+
+        errors.append(httpx.TransportError)
+    except ImportError:
+        pass
+    return tuple(errors)
+
+
+INFRASTRUCTURE_ERRORS = _infrastructure_errors()
+
+
+def is_infrastructure_error(
+    error: BaseException, errors: tuple[type[BaseException], ...] = INFRASTRUCTURE_ERRORS
+) -> bool:
+    """
+    Whether `error` was caused by the infrastructure (connection failures, rate limits, server errors) rather than
+    by the task itself, looking through the errors it was raised from.
+    """
+    seen = set()
+    while error is not None and id(error) not in seen:
+        if isinstance(error, errors):
+            return True
+        seen.add(id(error))
+        error = error.__cause__ or error.__context__
+    return False
+
+
+class ShardTaskError(Exception):
+    """A task failed in a shard process of a `ShardedBenchmarkRunner`."""
+
+
+class ShardInfrastructureError(ShardTaskError):
+    """A task failed on an infrastructure error in a shard process, or its shard process died: it can be retried."""
+
+
+@dataclass
+class TaskResult:
+    """How a task of a benchmark run ended: `done`, `failed`, `timeout` or `cancelled`."""
+
+    task_id: Any
+    status: str
+    attempts: int
+    seconds: float
+    result: Any = None
+    error: str | None = None
+
+
+class BenchmarkRunner:
+    """
+    Runs the tasks of a benchmark on a bounded pool of `concurrency` workers pulling from a queue, so that a slow
+    task only holds its own slot.
+
+    `solve` is called with each task and returns its answer, which is handed to `on_result` (to record it, e.g. in
+    the answers file) once the task is done. A task taking longer than
+    `task_timeout` seconds is cancelled. A task failing on an infrastructure error (see `is_infrastructure_error`)
+    is put back in the queue up to `max_retries` times, after `retry_backoff` seconds doubling at each attempt;
+    other errors fail it. Tasks that fail or time out are not retried further: they are left for the next run.
+
+    On SIGINT the runner drains: no new task is started and the tasks in flight finish. A second SIGINT cancels
+    them. Progress, throughput and ETA are logged every `report_interval` seconds.
+    """
+
+    def __init__(
+        self,
+        solve: Callable[[dict], Awaitable[Any]],
+        on_result: Callable[[dict, Any], None] | None = None,
+        concurrency: int = 4,
+        task_timeout: float | None = None,
+        max_retries: int = 2,
+        retry_backoff: float = 5.0,
+        retry_on: tuple[type[BaseException], ...] = INFRASTRUCTURE_ERRORS,
+        report_interval: float | None = 60.0,
+        task_id_key: str = "task_id",
+    ):
+        self.solve = solve
+        self.on_result = on_result
+        self.concurrency = max(concurrency, 1)
+        self.task_timeout = task_timeout
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.retry_on = retry_on
+        self.report_interval = report_interval
+        self.task_id_key = task_id_key
+
+        self.results: list[TaskResult] = []
+        self.total = 0
+        self.in_flight = 0
+        self.retries = 0
+        self.start_time: float | None = None
+        self._queue: asyncio.Queue | None = None
+        self._workers: list[asyncio.Task] = []
+        self._retry_tasks: set[asyncio.Task] = set()
+        self._unfinished = 0
+        self._draining = False
+
+    @property
+    def finished(self) -> int:
+        return len(self.results)
+
+    def _task_id(self, task: dict) -> Any:
+        return task.get(self.task_id_key) if isinstance(task, dict) else None
+
+    async def run(self, tasks: list[dict]) -> list[TaskResult]:
+        """Run `tasks` and return how each of them ended, in order of completion."""
+        self.results = []
+        self.total = self._unfinished = len(tasks)
+        self.retries = 0
+        self.start_time = time.monotonic()
+        self._draining = False
+        self._queue = asyncio.Queue()
+        for task in tasks:
+            self._queue.put_nowait((task, 1))
+        if not tasks:
+            return []
+
+        loop = asyncio.get_running_loop()
+        handles_sigint = self._add_signal_handler(loop)
+        reporter = asyncio.create_task(self._report_progress()) if self.report_interval else None
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"benchmark-worker-{i}") for i in range(self.concurrency)
+        ]
+        try:
+            await asyncio.gather(*self._workers, return_exceptions=True)
+        finally:
+            for retry_task in list(self._retry_tasks):
+                retry_task.cancel()
+            if reporter is not None:
+                reporter.cancel()
+            if handles_sigint:
+                loop.remove_signal_handler(signal.SIGINT)
+        logger.info(f"| {self.format_progress()}")
+        return self.results
+
+    def _add_signal_handler(self, loop: asyncio.AbstractEventLoop) -> bool:
+        try:
+            loop.add_signal_handler(signal.SIGINT, self.stop)
+            return True
+        except (NotImplementedError, RuntimeError):
+            # Not supported on this platform, or not in the main thread
+            return False
+
+    def stop(self):
+        """Stop starting new tasks and let the tasks in flight finish. Called again, cancel them."""
+        if self._draining:
+            logger.warning("| Cancelling the tasks in flight.")
+            for worker in self._workers:
+                worker.cancel()
+            return
+        self._draining = True
+        logger.warning(f"| Draining: waiting for {self.in_flight} tasks in flight, interrupt again to cancel them.")
+        for _ in self._workers:
+            self._queue.put_nowait(None)
+
+    def _finish(self, result: TaskResult):
+        self.results.append(result)
+        self._unfinished -= 1
+        metrics.counter("benchmark_tasks_total", "Finished benchmark tasks.").inc(status=result.status)
+        metrics.histogram("benchmark_task_seconds", "Benchmark task latency.").observe(
+            result.seconds, status=result.status
+        )
+        if self._unfinished == 0:
+            # Nothing left to run, nor to retry: wake the idle workers up
+            for _ in self._workers:
+                self._queue.put_nowait(None)
+
+    async def _worker(self):
+        while True:
+            item = await self._queue.get()
+            if item is None or self._draining:
+                return
+            task, attempt = item
+            task_id = self._task_id(task)
+            self.in_flight += 1
+            in_flight = metrics.gauge("benchmark_tasks_in_flight", "Benchmark tasks in flight.")
+            in_flight.inc()
+            start_time = time.monotonic()
+            output, error, timed_out = None, None, False
+            try:
+                async with asyncio.timeout(self.task_timeout) as timeout:
+                    output = await self.solve(task)
+                if self.on_result is not None:
+                    self.on_result(task, output)
+            except asyncio.CancelledError:
+                self._finish(TaskResult(task_id, "cancelled", attempt, time.monotonic() - start_time))
+                raise
+            except Exception as e:
+                error = e
+                timed_out = isinstance(e, TimeoutError) and timeout.expired()
+            finally:
+                self.in_flight -= 1
+                in_flight.dec()
+            seconds = time.monotonic() - start_time
+
+            if timed_out:
+                logger.warning(f"| Task {task_id} timed out after {self.task_timeout}s.")
+                self._finish(TaskResult(task_id, "timeout", attempt, seconds, error=f"Timed out after {seconds:.0f}s"))
+            elif error is not None:
+                retryable = attempt <= self.max_retries and not self._draining
+                if retryable and is_infrastructure_error(error, self.retry_on):
+                    backoff = self.retry_backoff * 2 ** (attempt - 1)
+                    logger.warning(
+                        f"| Task {task_id} failed on {type(error).__name__}: {error}. "
+                        f"Retrying in {backoff:.0f}s (attempt {attempt + 1}/{self.max_retries + 1})."
+                    )
+                    self._retry(task, attempt + 1, backoff)
+                    continue
+                logger.warning(f"| Task {task_id} failed on {type(error).__name__}: {error}")
+                self._finish(TaskResult(task_id, "failed", attempt, seconds, error=f"{type(error).__name__}: {error}"))
+            else:
+                self._finish(TaskResult(task_id, "done", attempt, seconds, result=output))
+
+    def _retry(self, task: dict, attempt: int, backoff: float):
+        self.retries += 1
+
+        async def requeue():
+            await asyncio.sleep(backoff)
+            self._retry_tasks.discard(asyncio.current_task())
+            self._queue.put_nowait((task, attempt))
+
+        retry_task = asyncio.create_task(requeue())
+        self._retry_tasks.add(retry_task)
+
+    async def _report_progress(self):
+        while True:
+            await asyncio.sleep(self.report_interval)
+            logger.info(f"| {self.format_progress()}")
+
+    def progress(self) -> dict[str, Any]:
+        """Return the counts of tasks by status, the throughput in tasks per minute and the ETA in seconds."""
+        elapsed = time.monotonic() - self.start_time if self.start_time is not None else 0.0
+        counts = {"done": 0, "failed": 0, "timeout": 0, "cancelled": 0}
+        for result in self.results:
+            counts[result.status] += 1
+        throughput = self.finished / elapsed * 60 if elapsed > 0 else 0.0
+        remaining = self.total - self.finished
+        return {
+            "total": self.total,
+            "finished": self.finished,
+            **counts,
+            "in_flight": self.in_flight,
+            "retries": self.retries,
+            "elapsed_seconds": round(elapsed, 1),
+            "tasks_per_minute": round(throughput, 2),
+            "eta_seconds": round(remaining / throughput * 60, 1) if throughput > 0 else None,
+        }
+
+    def format_progress(self) -> str:
+        progress = self.progress()
+        eta = f"{progress['eta_seconds'] / 60:.1f}min" if progress["eta_seconds"] is not None else "unknown"
+        return (
+            f"Progress: {progress['finished']}/{progress['total']} tasks "
+            f"({progress['done']} done, {progress['failed']} failed, {progress['timeout']} timed out, "
+            f"{progress['cancelled']} cancelled), "
+            f"{progress['in_flight']} in flight, {progress['retries']} retries, "
+            f"{progress['tasks_per_minute']:.2f} tasks/min, elapsed {progress['elapsed_seconds'] / 60:.1f}min, "
+            f"ETA {eta}"
+        )
+
+
+def _run_shard(shard: int, create_solve, shutdown_shard, inbox, outbox, retry_on):
+    """Entry point of a shard process: serve the tasks sent to `inbox` on its own event loop."""
+    # The parent process handles Ctrl-C for the whole pool
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(_serve_shard(shard, create_solve, shutdown_shard, inbox, outbox, retry_on))
+
+
+async def _serve_shard(shard: int, create_solve, shutdown_shard, inbox, outbox, retry_on):
+    try:
+        solve = await create_solve(shard)
+    except Exception as e:
+        outbox.put((shard, None, "init_error", f"{type(e).__name__}: {e}"))
+        return
+    outbox.put((shard, None, "ready", None))
+    running: dict[int, asyncio.Task] = {}
+
+    async def handle(request_id: int, task: dict):
+        try:
+            message = (shard, request_id, "done", await solve(task))
+        except asyncio.CancelledError:
+            message = (shard, request_id, "cancelled", None)
+        except Exception as e:
+            status = "infrastructure_error" if is_infrastructure_error(e, retry_on) else "error"
+            message = (shard, request_id, status, f"{type(e).__name__}: {e}")
+        finally:
+            running.pop(request_id, None)
+        try:
+            outbox.put(message)
+        except Exception as e:
+            # The answer could not be pickled
+            outbox.put((shard, request_id, "error", f"{type(e).__name__}: {e}"))
+
+    while True:
+        message = await asyncio.to_thread(inbox.get)
+        if message is None:
+            break
+        command, request_id, task = message
+        if command == "run":
+            running[request_id] = asyncio.create_task(handle(request_id, task))
+        elif command == "cancel" and request_id in running:
+            running[request_id].cancel()
+    await asyncio.gather(*running.values(), return_exceptions=True)
+    if shutdown_shard is not None:
+        await shutdown_shard(shard)
+
+
+class ShardedBenchmarkRunner(BenchmarkRunner):
+    """
+    A `BenchmarkRunner` spreading the tasks over `processes` shard processes, so that the agents are not limited to
+    the single core of one event loop.
+
+    Each shard process runs its own event loop and calls `create_solve(shard)` once, to set itself up (configuration,
+    models, a warm agent) and return its `solve` function. It runs up to `concurrency` tasks at a time. The
+    scheduling stays in this process: tasks go to the least busy shard as workers pull them from the queue, with the
+    timeouts, retries, draining and progress reporting of `BenchmarkRunner`, and the answers come back here to be
+    handed to `on_result`, so that a single process writes the answers file.
+
+    What the agents record in the process-wide model ledger, tracer and metrics registry stays in their shard
+    process: `shutdown_shard(shard)`, if given, is called in each shard process once its tasks are done, e.g. to
+    export those records to files of its own.
+
+    `create_solve`, `shutdown_shard` and the tasks are sent to the shard processes, which are spawned: they must be
+    picklable, e.g. module-level functions (or partials of them) of a script guarded by `if __name__ == "__main__"`.
+    A shard process that dies fails its tasks with a `ShardInfrastructureError`, so that they are retried on the
+    other shards.
+    """
+
+    def __init__(
+        self,
+        create_solve: Callable[[int], Awaitable[Callable[[dict], Awaitable[Any]]]],
+        shutdown_shard: Callable[[int], Awaitable[None]] | None = None,
+        processes: int = 2,
+        concurrency: int = 4,
+        retry_on: tuple[type[BaseException], ...] = INFRASTRUCTURE_ERRORS,
+        shutdown_timeout: float = 30.0,
+        **kwargs,
+    ):
+        super().__init__(
+            self._dispatch,
+            concurrency=max(processes, 1) * max(concurrency, 1),
+            retry_on=retry_on + (ShardInfrastructureError,),
+            **kwargs,
+        )
+        self.create_solve = create_solve
+        self.shutdown_shard = shutdown_shard
+        self.processes = max(processes, 1)
+        self.shard_retry_on = retry_on
+        self.shutdown_timeout = shutdown_timeout
+        self._context = multiprocessing.get_context("spawn")
+        self._shards: list[multiprocessing.process.BaseProcess] = []
+        self._inboxes: list = []
+        self._outbox = None
+        self._alive: set[int] = set()
+        self._load: dict[int, int] = {}
+        self._pending: dict[int, tuple[int, asyncio.Future]] = {}
+        self._ready: dict[int, asyncio.Future] = {}
+        self._request_ids = itertools.count()
+        self._listener: threading.Thread | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    async def run(self, tasks: list[dict]) -> list[TaskResult]:
+        if not tasks:
+            return await super().run(tasks)
+        await self._start_shards()
+        try:
+            return await super().run(tasks)
+        finally:
+            await self._stop_shards()
+
+    async def _start_shards(self):
+        self._loop = asyncio.get_running_loop()
+        self._outbox = self._context.Queue()
+        self._inboxes = [self._context.Queue() for _ in range(self.processes)]
+        self._ready = {shard: self._loop.create_future() for shard in range(self.processes)}
+        self._shards = [
+            self._context.Process(
+                target=_run_shard,
+                args=(
+                    shard,
+                    self.create_solve,
+                    self.shutdown_shard,
+                    self._inboxes[shard],
+                    self._outbox,
+                    self.shard_retry_on,
+                ),
+                name=f"benchmark-shard-{shard}",
+                daemon=True,
+            )
+            for shard in range(self.processes)
+        ]
+        for process in self._shards:
+            process.start()
+        self._alive = set(range(self.processes))
+        self._load = {shard: 0 for shard in range(self.processes)}
+        self._listener = threading.Thread(target=self._listen, name="benchmark-shards-listener", daemon=True)
+        self._listener.start()
+
+        for shard, ready in self._ready.items():
+            error = await ready
+            if error is not None:
+                logger.warning(f"| Shard {shard} failed to start: {error}")
+                self._alive.discard(shard)
+        if not self._alive:
+            await self._stop_shards()
+            raise RuntimeError("No shard process could start.")
+        logger.info(f"| Started {len(self._alive)} shard processes.")
+
+    async def _stop_shards(self):
+        for shard in range(self.processes):
+            self._inboxes[shard].put(None)
+        for process in self._shards:
+            await asyncio.to_thread(process.join, self.shutdown_timeout)
+            if process.is_alive():
+                process.terminate()
+        self._outbox.put(None)
+        await asyncio.to_thread(self._listener.join)
+
+    def _listen(self):
+        """Hand the messages of the shard processes over to the event loop, and watch for dead shards."""
+        while True:
+            try:
+                message = self._outbox.get(timeout=1.0)
+            except queue.Empty:
+                for shard, process in enumerate(self._shards):
+                    if shard in self._alive and not process.is_alive():
+                        self._loop.call_soon_threadsafe(self._lose_shard, shard, process.exitcode)
+                continue
+            if message is None:
+                return
+            self._loop.call_soon_threadsafe(self._receive, *message)
+
+    def _receive(self, shard: int, request_id: int | None, status: str, payload: Any):
+        if request_id is None:
+            ready = self._ready[shard]
+            if not ready.done():
+                ready.set_result(payload if status == "init_error" else None)
+            return
+        if request_id not in self._pending:
+            return
+        _, future = self._pending.pop(request_id)
+        self._load[shard] -= 1
+        if future.done():
+            return
+        if status == "done":
+            future.set_result(payload)
+        elif status == "infrastructure_error":
+            future.set_exception(ShardInfrastructureError(payload))
+        elif status == "cancelled":
+            future.set_exception(ShardTaskError(f"Cancelled in shard {shard}."))
+        else:
+            future.set_exception(ShardTaskError(payload))
+
+    def _lose_shard(self, shard: int, exitcode: int | None):
+        if shard not in self._alive:
+            return
+        self._alive.discard(shard)
+        logger.warning(f"| Shard {shard} died with exit code {exitcode}, {len(self._alive)} shards left.")
+        ready = self._ready[shard]
+        if not ready.done():
+            ready.set_result(f"Exited with code {exitcode}")
+        for request_id, (request_shard, future) in list(self._pending.items()):
+            if request_shard == shard:
+                del self._pending[request_id]
+                if not future.done():
+                    future.set_exception(ShardInfrastructureError(f"Shard {shard} died with exit code {exitcode}"))
+
+    async def _dispatch(self, task: dict) -> Any:
+        if not self._alive:
+            raise ShardTaskError("No shard process left.")
+        shard = min(self._alive, key=lambda shard: self._load[shard])
+        request_id = next(self._request_ids)
+        future = self._loop.create_future()
+        self._pending[request_id] = (shard, future)
+        self._load[shard] += 1
+        self._inboxes[shard].put(("run", request_id, task))
+        try:
+            return await future
+        except asyncio.CancelledError:
+            if request_id in self._pending:
+                self._inboxes[shard].put(("cancel", request_id, None))
+            raise
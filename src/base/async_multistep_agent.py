@@ -13,6 +13,8 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import asyncio
+import copy
 import importlib
 import inspect
 import json
@@ -39,7 +41,6 @@ from huggingface_hub import (
     snapshot_download,
     upload_folder,
 )
-from jinja2 import StrictUndefined, Template
 from rich.live import Live
 from rich.markdown import Markdown
 from rich.rule import Rule
@@ -50,6 +51,7 @@ if TYPE_CHECKING:
 
 from src.base.multistep_agent import ActionOutput, RunResult, ToolOutput
 from src.exception import (
+    AgentDeadlineError,
     AgentError,
     AgentGenerationError,
     AgentMaxStepsError,
@@ -62,15 +64,21 @@ from src.logger import (
     Timing,
     TokenUsage,
     logger,
+    model_ledger,
+    tracer,
 )
 from src.memory import (
     ActionStep,
     AgentMemory,
     FinalAnswerStep,
+    MemoryCheckpoint,
+    MemoryCompactor,
     PlanningStep,
     SystemPromptStep,
     TaskStep,
     UserPromptStep,
+    format_run_summary,
+    render_transcript,
 )
 from src.models import (
     ChatMessage,
@@ -79,16 +87,26 @@ from src.models import (
     Model,
 )
 from src.tools import AsyncTool
+from src.tools.artifacts import artifact_store
+from src.tools.cache import ManagedAgentMemo, ToolResultCache
 from src.tools.default_tools import TOOL_MAPPING
 from src.tools.executor.local_python_executor import BASE_BUILTIN_MODULES
 from src.tools.final_answer import FinalAnswerTool
 from src.utils import (
+    budget,
+    compile_template,
+    deadline_scope,
     handle_agent_output_types,
     is_valid_name,
     make_init_file,
-    truncate_content,
+    remaining_time,
 )
 
+# Seconds kept before the deadline of a run to produce the final answer, at most 10% of the run time
+DEADLINE_RESERVE = 30.0
+# Size cap of the run summary a managed agent hands over with `provide_run_summary`
+RUN_SUMMARY_MAX_CHARS = 4000
+
 
 def get_variable_names(self, template: str) -> set[str]:
     pattern = re.compile(r"\{\{([^{}]+)\}\}")
@@ -96,7 +114,7 @@ def get_variable_names(self, template: str) -> set[str]:
 
 
 def populate_template(template: str, variables: dict[str, Any]) -> str:
-    compiled_template = Template(template, undefined=StrictUndefined)
+    compiled_template = compile_template(template)
     try:
         return compiled_template.render(**variables)
     except Exception as e:
@@ -202,6 +220,10 @@ class AsyncMultiStepAgent(ABC):
             Each function should:
             - Take the final answer and the agent's memory as arguments.
             - Return a boolean indicating whether the final answer is valid.
+        time_limit (`float`, *optional*): Maximum number of seconds for a run. The deadline is shared with the managed
+            agents, tools and model calls of the run, and the agent answers with what it has before it is reached.
+        memory_compactor (`MemoryCompactor`, *optional*): Summarizes old observations before each step once the history
+            exceeds its token budget.
     """
 
     def __init__(
@@ -223,6 +245,8 @@ class AsyncMultiStepAgent(ABC):
         final_answer_checks: list[Callable] | None = None,
         return_full_result: bool = False,
         logger: AgentLogger | None = None,
+        time_limit: float | None = None,
+        memory_compactor: MemoryCompactor | None = None,
     ):
         self.agent_name = self.__class__.__name__
         self.model = model
@@ -255,6 +279,13 @@ class AsyncMultiStepAgent(ABC):
         self.final_answer_checks = final_answer_checks if final_answer_checks is not None else []
         self.return_full_result = return_full_result
         self.instructions = instructions
+        self.time_limit = time_limit
+        self.memory_compactor = memory_compactor
+        # Seconds kept before the deadline to produce the final answer, set at the start of each run
+        self.deadline_reserve = 0.0
+        # Checkpoint written after each step of the current run, and the one it resumed from
+        self.checkpoint: MemoryCheckpoint | None = None
+        self.resumed_from: MemoryCheckpoint | None = None
         self._setup_managed_agents(managed_agents)
         self._setup_tools(tools, add_base_tools)
         self._validate_tools_and_managed_agents(tools, managed_agents)
@@ -269,7 +300,7 @@ class AsyncMultiStepAgent(ABC):
         else:
             self.logger = logger
 
-        self.monitor = Monitor(self.model, self.logger)
+        self.monitor = Monitor(self.model, self.logger, agent_name=self.name)
         self.step_callbacks = step_callbacks if step_callbacks is not None else []
         self.step_callbacks.append(self.monitor.update_metrics)
         self.stream_outputs = False
@@ -331,6 +362,9 @@ class AsyncMultiStepAgent(ABC):
         images: list["PIL.Image.Image"] | None = None,
         additional_args: dict | None = None,
         max_steps: int | None = None,
+        time_limit: float | None = None,
+        checkpoint_path: str | None = None,
+        resume_from: str | None = None,
     ):
         """
         Run the agent for the given task.
@@ -344,6 +378,9 @@ class AsyncMultiStepAgent(ABC):
             images (`list[PIL.Image.Image]`, *optional*): Image(s) objects.
             additional_args (`dict`, *optional*): Any other variables that you want to pass to the agent run, for instance images or dataframes. Give them clear names!
             max_steps (`int`, *optional*): Maximum number of steps the agent can take to solve the task. if not provided, will use the agent's default value.
+            time_limit (`float`, *optional*): Maximum number of seconds for this run. if not provided, will use the agent's default value. An earlier deadline inherited from a managing agent always applies.
+            checkpoint_path (`str`, *optional*): File to which the memory, state and step number are appended after each step. Defaults to `resume_from` when resuming.
+            resume_from (`str`, *optional*): Checkpoint file of an interrupted run to continue. The task and steps of the checkpoint are used instead of `task`, completed steps are not run again and a finished run returns its final answer directly. Entries of `additional_args` that could not be checkpointed must be passed again.
 
         Example:
         ```py
@@ -353,21 +390,28 @@ class AsyncMultiStepAgent(ABC):
         ```
         """
         max_steps = max_steps or self.max_steps
-        self.task = task
         self.interrupt_switch = False
-        if additional_args is not None:
-            self.state.update(additional_args)
-            self.task += f"""
+        self.resumed_from = MemoryCheckpoint.load(resume_from) if resume_from is not None else None
+        if self.resumed_from is not None:
+            self.task = self.resumed_from.task
+            self.state.update(self.resumed_from.state)
+            if additional_args is not None:
+                self.state.update(additional_args)
+        else:
+            self.task = task
+            if additional_args is not None:
+                self.state.update(additional_args)
+                self.task += f"""
 You have been provided with these additional arguments, that you can access using the keys as variables in your python code:
 {str(additional_args)}."""
-        self.task = self.initialize_task_instruction()
+            self.task = self.initialize_task_instruction()
 
         self.system_prompt = self.initialize_system_prompt()
         self.memory.system_prompt = SystemPromptStep(system_prompt=self.system_prompt)
         self.user_prompt = self.initialize_user_prompt()
         self.memory.user_prompt = UserPromptStep(user_prompt=self.user_prompt)
 
-        if reset:
+        if reset or self.resumed_from is not None:
             self.memory.reset()
             self.monitor.reset()
 
@@ -377,7 +421,25 @@ You have been provided with these additional arguments, that you can access usin
             level=LogLevel.INFO,
             title=self.name if hasattr(self, "name") else None,
         )
-        self.memory.steps.append(TaskStep(task=self.task, task_images=images))
+        if self.resumed_from is not None:
+            self.memory.steps.extend(self.resumed_from.steps)
+        else:
+            self.memory.steps.append(TaskStep(task=self.task, task_images=images))
+
+        checkpoint_path = checkpoint_path or resume_from
+        if checkpoint_path is None:
+            self.checkpoint = None
+        elif resume_from is not None and os.path.abspath(checkpoint_path) == os.path.abspath(resume_from):
+            self.checkpoint = self.resumed_from
+        else:
+            self.checkpoint = MemoryCheckpoint(checkpoint_path)
+            await asyncio.to_thread(self.checkpoint.start, self.task)
+            await asyncio.to_thread(
+                self.checkpoint.save,
+                self.memory,
+                self.resumed_from.step_number if self.resumed_from is not None else 1,
+                self.state,
+            )
 
         if getattr(self, "python_executor", None):
             self.python_executor.send_variables(variables=self.state)
@@ -389,7 +451,17 @@ You have been provided with these additional arguments, that you can access usin
         run_start_time = time.time()
         # Outputs are returned only at the end. We only look at the last step.
 
-        steps = [step async for step in self._run_stream(task=self.task, max_steps=max_steps, images=images)]
+        with (
+            model_ledger.caller(self.name or self.agent_name),
+            ToolResultCache.run_scope(),
+            ManagedAgentMemo.run_scope(),
+            deadline_scope(time_limit if time_limit is not None else self.time_limit),
+            tracer.span(self.name or self.agent_name, "run", max_steps=max_steps) as run_span,
+        ):
+            remaining = remaining_time()
+            self.deadline_reserve = min(DEADLINE_RESERVE, 0.1 * remaining) if remaining is not None else 0.0
+            steps = [step async for step in self._run_stream(task=self.task, max_steps=max_steps, images=images)]
+            run_span.set(steps=self.step_number - 1, **self.monitor.get_total_token_counts().dict())
         assert isinstance(steps[-1], FinalAnswerStep)
         output = steps[-1].output
 
@@ -432,13 +504,24 @@ You have been provided with these additional arguments, that you can access usin
     ) -> AsyncGenerator[ActionStep | PlanningStep | FinalAnswerStep | ChatMessageStreamDelta]:
         self.step_number = 1
         returned_final_answer = False
+        final_answer = None
+        # A resumed run continues after its last checkpointed step, without making its last plan again
+        skip_planning = False
+        if self.resumed_from is not None:
+            self.step_number = self.resumed_from.step_number
+            returned_final_answer = self.resumed_from.finished
+            final_answer = self.resumed_from.final_answer
+            skip_planning = isinstance(self.memory.steps[-1], PlanningStep)
         while not returned_final_answer and self.step_number <= max_steps:
             if self.interrupt_switch:
                 raise AgentError("Agent interrupted.", self.logger)
+            if self._out_of_time():
+                break
 
-            # Run a planning step if scheduled
-            if self.planning_interval is not None and (
-                self.step_number == 1 or (self.step_number - 1) % self.planning_interval == 0
+            # Run a planning step if scheduled, skipping plan updates when time is short
+            if not skip_planning and self.planning_interval is not None and (
+                self.step_number == 1
+                or ((self.step_number - 1) % self.planning_interval == 0 and not self._out_of_time(margin=3))
             ):
                 planning_start_time = time.time()
                 planning_step = None
@@ -454,30 +537,45 @@ You have been provided with these additional arguments, that you can access usin
                     start_time=planning_start_time,
                     end_time=planning_end_time,
                 )
+                await self._save_checkpoint()
+            skip_planning = False
 
             # Start action step!
             action_step_start_time = time.time()
             action_step = ActionStep(
                 step_number=self.step_number,
                 timing=Timing(start_time=action_step_start_time),
-                observations_images=images,
             )
             self.logger.log_rule(f"Step {self.step_number}", level=LogLevel.INFO)
             try:
-                async for output in self._step_stream(action_step):
-                    # Yield streaming deltas
-                    if not isinstance(output, (ActionOutput, ToolOutput)):
-                        yield output
-
-                    if isinstance(output, (ActionOutput, ToolOutput)) and output.is_final_answer:
-                        if self.final_answer_checks:
-                            self._validate_final_answer(output.output)
-                        returned_final_answer = True
-                        action_step.is_final_answer = True
-                        final_answer = output.output
+                # The step must end before the time kept for the final answer
+                with (
+                    deadline_scope(budget(None, reserve=self.deadline_reserve)),
+                    tracer.span(f"step {self.step_number}", "step", step_number=self.step_number) as step_span,
+                ):
+                    if self.memory_compactor is not None:
+                        tokens_saved = await self.memory_compactor.compact(self.memory)
+                        if tokens_saved:
+                            step_span.set(compacted_tokens=tokens_saved)
+                            self.logger.log(f"Memory compacted: {tokens_saved} tokens saved.", level=LogLevel.INFO)
+                    async for output in self._step_stream(action_step):
+                        # Yield streaming deltas
+                        if not isinstance(output, (ActionOutput, ToolOutput)):
+                            yield output
+
+                        if isinstance(output, (ActionOutput, ToolOutput)) and output.is_final_answer:
+                            if self.final_answer_checks:
+                                self._validate_final_answer(output.output)
+                            returned_final_answer = True
+                            action_step.is_final_answer = True
+                            final_answer = output.output
+                    step_span.set(is_final_answer=action_step.is_final_answer)
             except AgentGenerationError as e:
                 # Agent generation errors are not caused by a Model error but an implementation error: so we should raise them and exit.
-                raise e
+                # A generation cut by the deadline is recorded instead, the run then ends with a best-effort answer.
+                if not self._out_of_time():
+                    raise e
+                action_step.error = e
             except AgentError as e:
                 # Other AgentError types are caused by the Model, so we should log them and iterate.
                 action_step.error = e
@@ -486,12 +584,37 @@ You have been provided with these additional arguments, that you can access usin
                 self.memory.steps.append(action_step)
                 yield action_step
                 self.step_number += 1
+            # Only steps that ran to completion are checkpointed, an interrupted step is run again on resume
+            await self._save_checkpoint()
 
         if not returned_final_answer and self.step_number == max_steps + 1:
             final_answer = await self._handle_max_steps_reached(task, images)
             yield action_step
+        elif not returned_final_answer:
+            # Out of time: answer with what has been gathered so far
+            final_answer = await self._handle_max_steps_reached(
+                task, images, error=AgentDeadlineError("Reached the time limit.", self.logger)
+            )
+        await self._save_checkpoint(final_answer=final_answer, finished=True)
         yield FinalAnswerStep(handle_agent_output_types(final_answer))
 
+    async def _save_checkpoint(self, final_answer: Any = None, finished: bool = False):
+        # Saving syncs the checkpoint file to disk, which must not block the event loop
+        if self.checkpoint is not None:
+            await asyncio.to_thread(
+                self.checkpoint.save,
+                self.memory,
+                self.step_number,
+                self.state,
+                final_answer=final_answer,
+                finished=finished,
+            )
+
+    def _out_of_time(self, margin: float = 1.0) -> bool:
+        """Whether less than `margin` times the final answer reserve is left before the deadline."""
+        remaining = remaining_time()
+        return remaining is not None and remaining <= margin * self.deadline_reserve
+
     def _validate_final_answer(self, final_answer: Any):
         for check_function in self.final_answer_checks:
             try:
@@ -507,12 +630,14 @@ You have been provided with these additional arguments, that you can access usin
                 memory_step, agent=self
             )
 
-    async def _handle_max_steps_reached(self, task: str, images: list["PIL.Image.Image"]) -> Any:
+    async def _handle_max_steps_reached(
+        self, task: str, images: list["PIL.Image.Image"], error: AgentError | None = None
+    ) -> Any:
         action_step_start_time = time.time()
         final_answer = await self.provide_final_answer(task, images)
         final_memory_step = ActionStep(
             step_number=self.step_number,
-            error=AgentMaxStepsError("Reached max steps.", self.logger),
+            error=error or AgentMaxStepsError("Reached max steps.", self.logger),
             timing=Timing(start_time=action_step_start_time, end_time=time.time()),
             token_usage=final_answer.token_usage,
         )
@@ -663,6 +788,39 @@ You have been provided with these additional arguments, that you can access usin
         """Interrupts the agent execution."""
         self.interrupt_switch = True
 
+    def clone(self) -> "AsyncMultiStepAgent":
+        """
+        Return a copy of this agent ready for a new task. The copy gets a fresh memory, state, step number, monitor
+        and checkpoint; stateful tools and managed agents are cloned as well.
+
+        The copy deliberately shares with this agent:
+            - the model and the logger, which serve concurrent calls;
+            - the prompt templates, system prompt, instructions and settings such as `max_steps` or `time_limit`;
+            - the stateless tools, i.e. those whose `fork` returns the tool itself;
+            - the step callbacks other than the monitor's and the final answer checks;
+            - the memory compactor, whose summaries are cached by observation and reusable across runs.
+        """
+        agent = copy.copy(self)
+        agent.task = None
+        agent.state = {}
+        agent.step_number = 0
+        agent.interrupt_switch = False
+        agent.checkpoint = None
+        agent.resumed_from = None
+        agent.memory = AgentMemory(
+            system_prompt=self.memory.system_prompt.system_prompt,
+            user_prompt=self.memory.user_prompt.user_prompt if self.memory.user_prompt is not None else None,
+            image_resend_policy=self.memory.image_resend_policy,
+            max_images=self.memory.max_images,
+        )
+        agent.monitor = Monitor(agent.model, agent.logger, agent_name=agent.name)
+        agent.step_callbacks = [
+            callback for callback in self.step_callbacks if callback != self.monitor.update_metrics
+        ] + [agent.monitor.update_metrics]
+        agent.tools = {name: tool.fork() for name, tool in self.tools.items()}
+        agent.managed_agents = {name: managed_agent.clone() for name, managed_agent in self.managed_agents.items()}
+        return agent
+
     async def write_memory_to_messages(
         self,
         summary_mode: bool = False,
@@ -672,11 +830,7 @@ You have been provided with these additional arguments, that you can access usin
         that can be used as input to the LLM. Adds a number of keywords (such as PLAN, error, etc) to help
         the LLM.
         """
-        messages = self.memory.system_prompt.to_messages(summary_mode=summary_mode)
-        for memory_step in self.memory.steps:
-            messages.extend(memory_step.to_messages(summary_mode=summary_mode))
-        messages.extend(self.memory.user_prompt.to_messages(summary_mode=summary_mode))
-        return messages
+        return self.memory.to_messages(summary_mode=summary_mode)
 
     @abstractmethod
     async def _step_stream(self, memory_step: ActionStep) -> AsyncGenerator[ChatMessageStreamDelta | ActionOutput | ToolOutput, None]:
@@ -793,15 +947,29 @@ You have been provided with these additional arguments, that you can access usin
             self.prompt_templates["managed_agent"]["report"], variables=dict(name=self.name, final_answer=report)
         )
         if self.provide_run_summary:
-            answer += "\n\nFor more detail, find below a summary of this agent's work:\n<summary_of_work>\n"
-
-            messages = await self.write_memory_to_messages(summary_mode=True)
-            for message in messages:
-                content = message.content
-                answer += "\n" + truncate_content(str(content)) + "\n---"
-            answer += "\n</summary_of_work>"
+            answer += "\n\nFor more detail, find below a summary of this agent's work:\n"
+            answer += await self.summarize_run(report)
         return answer
 
+    async def summarize_run(self, final_answer: Any, brief: bool = False) -> str:
+        """
+        Return a size-capped summary of the last run (final answer, key evidence and sources), to hand over to a
+        managing agent instead of the whole memory. The full transcript is stored in the artifact store. A `brief`
+        summary, handed over at every delegation, keeps only the last two pieces of evidence and the first three
+        sources.
+        """
+        transcript = render_transcript(self.memory)
+        handle = await asyncio.to_thread(artifact_store.put, transcript)
+        return format_run_summary(
+            self.memory,
+            final_answer,
+            name=self.name,
+            transcript_handle=handle,
+            max_chars=RUN_SUMMARY_MAX_CHARS,
+            max_evidence=2 if brief else 5,
+            max_sources=3 if brief else 10,
+        )
+
     def save(self, output_dir: str | Path, relative_path: str | None = None):
         """
         Saves the relevant code files for your agent. This will copy the code of your agent in `output_dir` as well as autogenerate:
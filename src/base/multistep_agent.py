@@ -42,7 +42,6 @@ from huggingface_hub import (
     snapshot_download,
     upload_folder,
 )
-from jinja2 import StrictUndefined, Template
 from rich.live import Live
 from rich.markdown import Markdown
 from rich.rule import Rule
@@ -84,6 +83,7 @@ from src.tools import Tool
 from src.tools.default_tools import TOOL_MAPPING, FinalAnswerTool
 from src.tools.executor.local_python_executor import BASE_BUILTIN_MODULES
 from src.utils import (
+    compile_template,
     handle_agent_output_types,
     is_valid_name,
     make_init_file,
@@ -97,7 +97,7 @@ def get_variable_names(self, template: str) -> set[str]:
 
 
 def populate_template(template: str, variables: dict[str, Any]) -> str:
-    compiled_template = Template(template, undefined=StrictUndefined)
+    compiled_template = compile_template(template)
     try:
         return compiled_template.render(**variables)
     except Exception as e:
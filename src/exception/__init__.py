@@ -1,4 +1,5 @@
 from src.exception.error import (
+    AgentDeadlineError,
     AgentError,
     AgentExecutionError,
     AgentGenerationError,
@@ -13,6 +14,7 @@ __all__ = [
     "AgentParsingError",
     "AgentExecutionError",
     "AgentMaxStepsError",
+    "AgentDeadlineError",
     "AgentToolCallError",
     "AgentToolExecutionError",
     "AgentGenerationError",
@@ -30,6 +30,12 @@ class AgentMaxStepsError(AgentError):
     pass
 
 
+class AgentDeadlineError(AgentError):
+    """Exception raised when the agent runs out of time before finishing its task"""
+
+    pass
+
+
 class AgentToolCallError(AgentExecutionError):
     """Exception raised for errors when incorrect arguments are passed to the tool"""
 
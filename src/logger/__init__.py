@@ -1,5 +1,9 @@
+from .ledger import ModelCallRecord, ModelLedger, get_cached_tokens, model_ledger
 from .logger import YELLOW_HEX, AgentLogger, LogLevel, logger
+from .loop_monitor import BlockingCallError, LoopMonitor, Stall
+from .metrics import Counter, Gauge, HdrHistogram, Histogram, MetricsRegistry, metrics
 from .monitor import Monitor, Timing, TokenUsage
+from .tracing import Span, Tracer, tracer
 
 __all__ = ["logger",
            "LogLevel",
@@ -7,4 +11,20 @@ __all__ = ["logger",
            "Monitor",
            "YELLOW_HEX",
            "Timing",
-           "TokenUsage"]
+           "TokenUsage",
+           "ModelCallRecord",
+           "ModelLedger",
+           "model_ledger",
+           "get_cached_tokens",
+           "Span",
+           "Tracer",
+           "tracer",
+           "LoopMonitor",
+           "Stall",
+           "BlockingCallError",
+           "Counter",
+           "Gauge",
+           "Histogram",
+           "HdrHistogram",
+           "MetricsRegistry",
+           "metrics"]
@@ -0,0 +1,250 @@
+import contextvars
+import json
+import statistics
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any
+
+from src.logger.metrics import metrics
+from src.logger.tracing import tracer
+from src.utils import Singleton
+
+# USD per 1M tokens: (input, cached input, output). Keys are model ids without the provider prefix.
+MODEL_PRICING: dict[str, tuple[float, float, float]] = {
+    "gpt-4o": (2.5, 1.25, 10.0),
+    "gpt-4o-search-preview": (2.5, 1.25, 10.0),
+    "gpt-4.1": (2.0, 0.5, 8.0),
+    "gpt-5": (1.25, 0.125, 10.0),
+    "o1": (15.0, 7.5, 60.0),
+    "o3": (2.0, 0.5, 8.0),
+    "o3-deep-research": (10.0, 2.5, 40.0),
+    "o4-mini": (1.1, 0.275, 4.4),
+}
+
+_current_caller: contextvars.ContextVar[tuple[str, ...]] = contextvars.ContextVar("ledger_caller", default=())
+_current_call: contextvars.ContextVar["ModelCallRecord | None"] = contextvars.ContextVar(
+    "ledger_model_call", default=None
+)
+
+
+@dataclass
+class ModelCallRecord:
+    """
+    Contains the accounting information for a single model request.
+
+    Latencies are in seconds: `queue_seconds` is the time spent before the request was dispatched (message
+    preparation and any waiting), `ttft_seconds` the time to the first streamed token and `total_seconds` the time
+    until the call returned. `queue_seconds` is None if the call failed before being dispatched.
+
+    `attempts` counts the HTTP requests sent through the httpx clients of `src.proxy.local_proxy`, whose event
+    hooks report them, so that SDK-level retries show up. Clients that do not go through them, such as the
+    `requests`-based RESTful models and LiteLLM, retry out of sight: their calls always record a single attempt.
+    """
+
+    model_id: str
+    caller: str
+    start_time: float
+    streamed: bool = False
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    queue_seconds: float | None = None
+    ttft_seconds: float | None = None
+    total_seconds: float = 0.0
+    attempts: int = 0
+    cost: float | None = None
+    error: str | None = None
+    _dispatch_time: float | None = field(default=None, repr=False)
+
+    @property
+    def retries(self) -> int:
+        return max(self.attempts - 1, 0)
+
+    def mark_dispatched(self):
+        """Mark the moment the request leaves the process."""
+        if self._dispatch_time is None:
+            self._dispatch_time = time.time()
+            self.queue_seconds = self._dispatch_time - self.start_time
+
+    def mark_first_token(self):
+        """Mark the arrival of the first streamed token."""
+        if self.ttft_seconds is None:
+            self.ttft_seconds = time.time() - self.start_time
+
+    def set_usage(self, prompt_tokens: int | None, completion_tokens: int | None, cached_tokens: int | None = 0):
+        self.prompt_tokens = prompt_tokens or 0
+        self.completion_tokens = completion_tokens or 0
+        self.cached_tokens = cached_tokens or 0
+
+    def dict(self):
+        record = {key: value for key, value in asdict(self).items() if not key.startswith("_")}
+        record["retries"] = self.retries
+        return record
+
+
+def get_cached_tokens(usage: Any) -> int:
+    """Read the number of cached prompt tokens from an OpenAI-style usage object, if reported."""
+    details = getattr(usage, "prompt_tokens_details", None)
+    if isinstance(details, dict):
+        return details.get("cached_tokens") or 0
+    return getattr(details, "cached_tokens", 0) or 0
+
+
+class ModelLedger(metaclass=Singleton):
+    """
+    Central, in-process ledger of every model request: tokens, latency breakdown, retries and estimated cost,
+    attributed to the agent/tool path that issued it.
+    """
+
+    def __init__(self):
+        self.records: list[ModelCallRecord] = []
+        self.pricing: dict[str, tuple[float, float, float]] = dict(MODEL_PRICING)
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self.records = []
+
+    def set_pricing(self, model_id: str, input_price: float, output_price: float, cached_input_price: float | None = None):
+        """Set the price of a model in USD per 1M tokens."""
+        cached_input_price = input_price if cached_input_price is None else cached_input_price
+        self.pricing[model_id.split("/")[-1]] = (input_price, cached_input_price, output_price)
+
+    def estimate_cost(self, record: ModelCallRecord) -> float | None:
+        prices = self.pricing.get(record.model_id.split("/")[-1])
+        if prices is None:
+            return None
+        input_price, cached_input_price, output_price = prices
+        uncached_tokens = max(record.prompt_tokens - record.cached_tokens, 0)
+        return (
+            uncached_tokens * input_price
+            + record.cached_tokens * cached_input_price
+            + record.completion_tokens * output_price
+        ) / 1_000_000
+
+    @staticmethod
+    @contextmanager
+    def caller(name: str | None):
+        """Attribute the model calls made inside this context to `name`, nested under the current caller."""
+        path = _current_caller.get()
+        if not name or (path and path[-1] == name):
+            yield
+            return
+        token = _current_caller.set(path + (name,))
+        try:
+            yield
+        finally:
+            _current_caller.reset(token)
+
+    @staticmethod
+    def current_caller() -> str:
+        return "/".join(_current_caller.get())
+
+    @contextmanager
+    def track(self, model_id: str | None, streamed: bool = False):
+        """Record a model call made inside this context. Yields the `ModelCallRecord` to fill in."""
+        record = ModelCallRecord(
+            model_id=model_id or "unknown",
+            caller=self.current_caller(),
+            start_time=time.time(),
+            streamed=streamed,
+        )
+        with tracer.span(record.model_id, "model", caller=record.caller, streamed=streamed) as span:
+            token = _current_call.set(record)
+            try:
+                yield record
+            except BaseException as e:
+                record.error = f"{type(e).__name__}: {e}"
+                raise
+            finally:
+                try:
+                    _current_call.reset(token)
+                except ValueError:
+                    # A streaming generator may be finalized from another context
+                    pass
+                record.total_seconds = time.time() - record.start_time
+                record.attempts = max(record.attempts, 1)
+                record.cost = self.estimate_cost(record)
+                labels = {"model": record.model_id, "status": "error" if record.error else "ok"}
+                metrics.histogram("model_call_seconds", "Duration of model calls.").observe(
+                    record.total_seconds, **labels
+                )
+                if record.queue_seconds is not None:
+                    metrics.histogram("model_queue_seconds", "Wait of model calls before dispatch.").observe(
+                        record.queue_seconds, **labels
+                    )
+                if record.ttft_seconds is not None:
+                    metrics.histogram("model_ttft_seconds", "Time to the first streamed token.").observe(
+                        record.ttft_seconds, model=record.model_id
+                    )
+                metrics.counter("model_retries_total", "Retried model requests.").inc(record.retries, **labels)
+                span.set(
+                    prompt_tokens=record.prompt_tokens,
+                    completion_tokens=record.completion_tokens,
+                    cached_tokens=record.cached_tokens,
+                    attempts=record.attempts,
+                    cost=record.cost,
+                )
+                with self._lock:
+                    self.records.append(record)
+
+    @staticmethod
+    def note_request_attempt(*args, **kwargs):
+        """Count an outgoing HTTP request for the active model call. Usable as an httpx request event hook."""
+        record = _current_call.get()
+        if record is not None:
+            record.mark_dispatched()
+            record.attempts += 1
+
+    @staticmethod
+    async def anote_request_attempt(*args, **kwargs):
+        """Async variant of `note_request_attempt`, for `httpx.AsyncClient` event hooks."""
+        ModelLedger.note_request_attempt()
+
+    def aggregate(self, key: str = "model_id") -> dict[str, dict[str, Any]]:
+        """Aggregate the records by `key` (e.g. "model_id" or "caller")."""
+        with self._lock:
+            records = list(self.records)
+        groups: dict[str, list[ModelCallRecord]] = defaultdict(list)
+        for record in records:
+            groups[str(getattr(record, key))].append(record)
+
+        summary = {}
+        for name, group in groups.items():
+            latencies = [record.total_seconds for record in group]
+            ttfts = [record.ttft_seconds for record in group if record.ttft_seconds is not None]
+            costs = [record.cost for record in group if record.cost is not None]
+            queues = [record.queue_seconds for record in group if record.queue_seconds is not None]
+            summary[name] = {
+                "calls": len(group),
+                "errors": sum(1 for record in group if record.error),
+                "retries": sum(record.retries for record in group),
+                "prompt_tokens": sum(record.prompt_tokens for record in group),
+                "completion_tokens": sum(record.completion_tokens for record in group),
+                "cached_tokens": sum(record.cached_tokens for record in group),
+                "total_seconds": sum(latencies),
+                "mean_seconds": statistics.fmean(latencies),
+                "p50_seconds": statistics.median(latencies),
+                "max_seconds": max(latencies),
+                "mean_queue_seconds": statistics.fmean(queues) if queues else None,
+                "mean_ttft_seconds": statistics.fmean(ttfts) if ttfts else None,
+                "cost": sum(costs) if costs else None,
+            }
+        return summary
+
+    def export_jsonl(self, path: str | Path, append: bool = False):
+        """Write one JSON line per recorded model call, replacing the file unless `append` is set."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            records = list(self.records)
+        with open(path, "a" if append else "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record.dict(), ensure_ascii=False) + "\n")
+
+
+model_ledger = ModelLedger()
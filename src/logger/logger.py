@@ -1,5 +1,9 @@
+import io
 import json
 import logging
+import queue
+import sys
+import threading
 from enum import IntEnum
 
 from rich import box
@@ -20,6 +24,125 @@ class LogLevel(IntEnum):
     INFO = 1  # Normal output (default)
     DEBUG = 2  # Detailed output
 
+_STOP = object()
+
+
+class _LogWriter:
+    """
+    Background thread writing the log records and Rich renderables queued by the logger to the console and the log
+    file, so that the event loop does not wait for rendering or disk writes. Items are written in the order they
+    were queued, and the file is flushed once per batch.
+    """
+
+    def __init__(self, console: Console, file, formatter: logging.Formatter, stream=None, batch_size: int = 256):
+        self.console = console
+        self.file = file
+        self.formatter = formatter
+        # Stream of the plain text records, the standard error if None
+        self.stream = stream
+        self.batch_size = batch_size
+        # Renders the Rich objects as plain text for the log file
+        self.file_console = Console(file=io.StringIO(), width=console.width)
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def put(self, item):
+        if self._thread.is_alive():
+            self._queue.put(item)
+        else:
+            # Closed: write directly, to the console only once the file is closed too
+            self._write(item)
+
+    def flush(self, timeout: float | None = 10.0):
+        """Wait until every item queued so far is written."""
+        if self._thread.is_alive() and threading.current_thread() is not self._thread:
+            written = threading.Event()
+            self._queue.put(written)
+            written.wait(timeout)
+
+    def close(self, timeout: float | None = 10.0):
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+        # Write what was queued while the thread was stopping
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is not _STOP:
+                self._write(item)
+        if not self.file.closed:
+            self.file.close()
+
+    def _write(self, item):
+        if isinstance(item, logging.LogRecord):
+            text = self.formatter.format(item) + "\n"
+            (self.stream or sys.stderr).write(text)
+        else:
+            self.console.print(item)
+            with self.file_console.capture() as capture:
+                self.file_console.print(item)
+            text = capture.get()
+        if not self.file.closed:
+            self.file.write(text)
+
+    def _run(self):
+        stopped = False
+        while not stopped:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            flushed = []
+            for item in batch:
+                if item is _STOP:
+                    stopped = True
+                elif isinstance(item, threading.Event):
+                    flushed.append(item)
+                else:
+                    try:
+                        self._write(item)
+                    except Exception as e:
+                        print(f"Failed to write a log message: {e}", file=sys.__stderr__)
+            try:
+                (self.stream or sys.stderr).flush()
+                self.file.flush()
+            except Exception as e:
+                print(f"Failed to flush the log: {e}", file=sys.__stderr__)
+            for event in flushed:
+                event.set()
+
+
+class _WriterHandler(logging.Handler):
+    """Logging handler queueing the records for a `_LogWriter`."""
+
+    def __init__(self, writer: _LogWriter, level=logging.NOTSET):
+        super().__init__(level)
+        self.writer = writer
+
+    def emit(self, record: logging.LogRecord):
+        # Merge the arguments now, they could change before the writer formats the record
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = record.exc_text or self.writer.formatter.formatException(record.exc_info)
+            record.exc_info = None
+        self.writer.put(record)
+
+    def flush(self):
+        self.writer.flush()
+
+    def close(self):
+        self.writer.close()
+        super().close()
+
+
 class AgentLogger(logging.Logger, metaclass=Singleton):
     def __init__(self, name="logger", level=logging.INFO):
         # Initialize the parent class
@@ -30,33 +153,49 @@ class AgentLogger(logging.Logger, metaclass=Singleton):
             fmt="\033[92m%(asctime)s - %(name)s:%(levelname)s\033[0m: %(filename)s:%(lineno)s - %(message)s",
             datefmt="%H:%M:%S",
         )
-
-    def init_logger(self, log_path: str, level=logging.INFO):
+        # Messages logged with a `LogLevel` above this one are dropped before being rendered
+        self.verbosity_level = LogLevel.INFO
+        self._writer: _LogWriter | None = None
+
+    def init_logger(
+        self,
+        log_path: str,
+        level=logging.INFO,
+        verbosity_level: LogLevel = LogLevel.INFO,
+        background: bool = True,
+    ):
         """
         Initialize the logger with a file path and optional main process check.
 
         Args:
             log_path (str): The log file path.
             level (int, optional): The logging level. Defaults to logging.INFO.
-            accelerator (Accelerator, optional): Accelerator instance to determine the main process.
+            verbosity_level (LogLevel, optional): The most detailed `LogLevel` to output. Defaults to LogLevel.INFO.
+            background (bool, optional): Whether to render and write the messages from a background thread, in
+                batches. Call `flush` to wait for the pending messages. Defaults to True.
         """
-
-        # Add a console handler for logging to the console
-        console_handler = logging.StreamHandler()
-        console_handler.setLevel(level)
-        console_handler.setFormatter(self.formatter)
-        self.addHandler(console_handler)
-
-        # Add a file handler for logging to the file
-        file_handler = logging.FileHandler(
-            log_path, mode="a"
-        )  # 'a' mode appends to the file
-        file_handler.setLevel(level)
-        file_handler.setFormatter(self.formatter)
-        self.addHandler(file_handler)
-
+        self.verbosity_level = verbosity_level
         self.console = Console(width=100)
-        self.file_console = Console(file=open(log_path, "a"), width=100)
+
+        if background:
+            self._writer = _LogWriter(self.console, open(log_path, "a", encoding="utf-8"), self.formatter)
+            self.addHandler(_WriterHandler(self._writer, level))
+        else:
+            # Add a console handler for logging to the console
+            console_handler = logging.StreamHandler()
+            console_handler.setLevel(level)
+            console_handler.setFormatter(self.formatter)
+            self.addHandler(console_handler)
+
+            # Add a file handler for logging to the file
+            file_handler = logging.FileHandler(
+                log_path, mode="a"
+            )  # 'a' mode appends to the file
+            file_handler.setLevel(level)
+            file_handler.setFormatter(self.formatter)
+            self.addHandler(file_handler)
+
+            self.file_console = Console(file=open(log_path, "a"), width=100)
 
         # Prevent duplicate logs from propagating to the root logger
         self.propagate = False
@@ -67,18 +206,32 @@ class AgentLogger(logging.Logger, metaclass=Singleton):
         Args:
             level (LogLevel, optional): Defaults to LogLevel.INFO.
         """
+        if self.is_enabled(level):
+            self.info(*args, **kwargs)
+
+    def is_enabled(self, level: int | str | LogLevel) -> bool:
+        """Whether messages of `level` are output, to check before building costly messages."""
         if isinstance(level, str):
             level = LogLevel[level.upper()]
-        if level <= self.level:
-            self.info(*args, **kwargs)
+        return level <= self.verbosity_level
+
+    def flush(self):
+        """Wait until the messages logged so far are written."""
+        if self._writer is not None:
+            self._writer.flush()
 
     def info(self, msg, *args, **kwargs):
         """
         Overridden info method with stacklevel adjustment for correct log location.
         """
         if isinstance(msg, (Rule, Panel, Group, Tree, Table, Syntax)):
-            self.console.print(msg)
-            self.file_console.print(msg)
+            if not self.is_enabled(kwargs.get("level", LogLevel.INFO)):
+                return
+            if self._writer is not None:
+                self._writer.put(msg)
+            else:
+                self.console.print(msg)
+                self.file_console.print(msg)
         else:
             kwargs.setdefault(
                 "stacklevel", 2
@@ -109,6 +262,8 @@ class AgentLogger(logging.Logger, metaclass=Singleton):
         self.info(escape_code_brackets(error_message), style="bold red", level=LogLevel.ERROR)
 
     def log_markdown(self, content: str, title: str | None = None, level=LogLevel.INFO, style=YELLOW_HEX) -> None:
+        if not self.is_enabled(level):
+            return
         markdown_content = Syntax(
             content,
             lexer="markdown",
@@ -131,6 +286,8 @@ class AgentLogger(logging.Logger, metaclass=Singleton):
             self.info(markdown_content, level=level)
 
     def log_code(self, title: str, content: str, level: int = LogLevel.INFO) -> None:
+        if not self.is_enabled(level):
+            return
         self.info(
             Panel(
                 Syntax(
@@ -147,6 +304,8 @@ class AgentLogger(logging.Logger, metaclass=Singleton):
         )
 
     def log_rule(self, title: str, level: int = LogLevel.INFO) -> None:
+        if not self.is_enabled(level):
+            return
         self.info(
             Rule(
                 "[bold]" + title,
@@ -157,6 +316,8 @@ class AgentLogger(logging.Logger, metaclass=Singleton):
         )
 
     def log_task(self, content: str, subtitle: str, title: str | None = None, level: LogLevel = LogLevel.INFO) -> None:
+        if not self.is_enabled(level):
+            return
         self.info(
             Panel(
                 f"\n[bold]{escape_code_brackets(content)}\n",
@@ -169,6 +330,8 @@ class AgentLogger(logging.Logger, metaclass=Singleton):
         )
 
     def log_messages(self, messages: list[dict], level: LogLevel = LogLevel.DEBUG) -> None:
+        if not self.is_enabled(level):
+            return
         messages_as_string = "\n".join([json.dumps(dict(message), indent=4, ensure_ascii=False) for message in messages])
         self.info(
             Syntax(
@@ -221,6 +384,7 @@ class AgentLogger(logging.Logger, metaclass=Singleton):
                 f"✅ [italic #1E90FF]Authorized imports:[/italic #1E90FF] {agent.additional_authorized_imports}"
             )
         build_agent_tree(main_tree, agent)
+        self.flush()
         self.console.print(main_tree)
 
 logger = AgentLogger()
@@ -0,0 +1,240 @@
+import asyncio
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+import traceback
+from collections import defaultdict, deque
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any
+
+from src.logger.tracing import tracer
+
+
+class BlockingCallError(AssertionError):
+    """Raised by `LoopMonitor.check` when the event loop was blocked at call sites missing from the baseline."""
+
+
+@dataclass
+class Stall:
+    """
+    A period during which the event loop did not run, with the stack of the code blocking it if it lasted long
+    enough to be caught in the act. `site` is the innermost frame of that stack within the project.
+    """
+
+    start_time: float
+    duration: float
+    site: str | None = None
+    task: str | None = None
+    span: str | None = None
+    stack: list[str] = field(default_factory=list)
+
+
+class LoopMonitor:
+    """
+    Opt-in monitor of the lag of an asyncio event loop, which catches the code blocking it.
+
+    A task on the loop wakes up every `interval` seconds and measures how late it is. A watchdog thread checks
+    that the loop keeps waking up: once it has been stuck for `threshold` seconds, the watchdog captures the stack
+    of the loop thread, the running task and, if tracing is enabled, the innermost span of that task.
+
+    With a `baseline` (a JSON list of known blocking sites, see `write_baseline`), `check` raises a
+    `BlockingCallError` for the blocking sites that are not in it, to fail local runs on new blocking calls.
+    """
+
+    def __init__(
+        self,
+        interval: float = 0.05,
+        threshold: float = 0.25,
+        root: str | None = None,
+        baseline: str | None = None,
+        max_stalls: int = 1000,
+        max_samples: int = 100000,
+    ):
+        self.interval = interval
+        self.threshold = threshold
+        self.root = os.path.abspath(root if root is not None else Path(__file__).resolve().parents[2])
+        self.baseline = baseline
+        self.max_stalls = max_stalls
+        self.stalls: list[Stall] = []
+        self.lags: deque[float] = deque(maxlen=max_samples)
+        self._heartbeat = 0.0
+        self._pending: Stall | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread_id: int | None = None
+        self._task: asyncio.Task | None = None
+        self._watchdog: threading.Thread | None = None
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Start monitoring the running event loop. Must be called from a coroutine running on it."""
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.perf_counter()
+        self._stopped.clear()
+        self._task = self._loop.create_task(self._measure_lag(), name="loop-monitor")
+        self._watchdog = threading.Thread(target=self._watch, name="loop-monitor-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        if not self.running:
+            return
+        self._stopped.set()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._watchdog.join()
+
+    async def __aenter__(self) -> "LoopMonitor":
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.stop()
+
+    async def _measure_lag(self):
+        while True:
+            self._heartbeat = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(time.perf_counter() - self._heartbeat - self.interval, 0.0)
+            self.lags.append(lag)
+            with self._lock:
+                stall, self._pending = self._pending, None
+            if lag < self.threshold:
+                continue
+            if stall is None:
+                # Over before the watchdog looked: the duration is known, not the culprit
+                stall = Stall(start_time=time.time() - lag, duration=lag)
+            stall.duration = lag
+            if len(self.stalls) < self.max_stalls:
+                self.stalls.append(stall)
+
+    def _watch(self):
+        caught_heartbeat = None
+        while not self._stopped.wait(min(self.interval, self.threshold) / 2):
+            heartbeat = self._heartbeat
+            late = time.perf_counter() - heartbeat - self.interval
+            if late < self.threshold or heartbeat == caught_heartbeat:
+                continue
+            caught_heartbeat = heartbeat
+            stall = self._capture(late)
+            with self._lock:
+                self._pending = stall
+
+    def _capture(self, late: float) -> Stall:
+        """Capture what the loop thread is doing, from the watchdog thread."""
+        frame = sys._current_frames().get(self._loop_thread_id)
+        frames = traceback.extract_stack(frame) if frame is not None else []
+        site = None
+        for frame_summary in reversed(frames):
+            filename = os.path.abspath(frame_summary.filename)
+            if filename.startswith(self.root) and filename != os.path.abspath(__file__):
+                site = f"{os.path.relpath(filename, self.root)}:{frame_summary.lineno} in {frame_summary.name}"
+                break
+
+        task = asyncio.tasks._current_tasks.get(self._loop)
+        span = tracer.active_span(task)
+        return Stall(
+            start_time=time.time() - late,
+            duration=late,
+            site=site,
+            task=task.get_name() if task is not None else None,
+            span=f"{span.kind}:{span.name}" if span is not None else None,
+            stack=traceback.format_list(frames[-20:]),
+        )
+
+    def report(self) -> dict[str, Any]:
+        """Summarize the lag samples and group the stalls by blocking site."""
+        sites: dict[str, dict[str, Any]] = defaultdict(
+            lambda: {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0, "spans": set()}
+        )
+        for stall in self.stalls:
+            site = sites[stall.site or "unknown"]
+            site["count"] += 1
+            site["total_seconds"] += stall.duration
+            site["max_seconds"] = max(site["max_seconds"], stall.duration)
+            if stall.span is not None:
+                site["spans"].add(stall.span)
+        lags = sorted(self.lags)
+        return {
+            "samples": len(lags),
+            "mean_lag_seconds": statistics.fmean(lags) if lags else 0.0,
+            "p99_lag_seconds": lags[int(0.99 * (len(lags) - 1))] if lags else 0.0,
+            "max_lag_seconds": lags[-1] if lags else 0.0,
+            "stalls": len(self.stalls),
+            "stalled_seconds": sum(stall.duration for stall in self.stalls),
+            "sites": {
+                name: {**site, "spans": sorted(site["spans"])}
+                for name, site in sorted(sites.items(), key=lambda item: item[1]["total_seconds"], reverse=True)
+            },
+        }
+
+    def format_report(self) -> str:
+        report = self.report()
+        lines = [
+            f"Event loop: {report['samples']} samples, lag mean {report['mean_lag_seconds'] * 1000:.1f}ms, "
+            f"p99 {report['p99_lag_seconds'] * 1000:.1f}ms, max {report['max_lag_seconds'] * 1000:.1f}ms, "
+            f"{report['stalls']} stalls over {self.threshold}s ({report['stalled_seconds']:.1f}s)"
+        ]
+        for name, site in report["sites"].items():
+            spans = f" [{', '.join(site['spans'])}]" if site["spans"] else ""
+            lines.append(
+                f"  {site['count']:>4}x {site['total_seconds']:>7.2f}s (max {site['max_seconds']:.2f}s) {name}{spans}"
+            )
+        return "\n".join(lines)
+
+    def export_json(self, path: str | Path):
+        """Write the report and every stall with its stack."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"report": self.report(), "stalls": [asdict(stall) for stall in self.stalls]},
+                f,
+                ensure_ascii=False,
+                indent=2,
+            )
+
+    def blocking_sites(self) -> set[str]:
+        return {stall.site for stall in self.stalls if stall.site is not None}
+
+    def write_baseline(self, path: str | Path | None = None):
+        """Record the blocking sites seen so far, together with those of the existing baseline, as known."""
+        path = Path(path or self.baseline)
+        known = set(self._load_baseline(path)) | self.blocking_sites()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(sorted(known), f, indent=2)
+
+    @staticmethod
+    def _load_baseline(path: Path) -> list[str]:
+        if not path.exists():
+            return []
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def check(self):
+        """Raise a `BlockingCallError` if the loop was blocked at sites missing from the baseline."""
+        known = set(self._load_baseline(Path(self.baseline))) if self.baseline else set()
+        new_stalls = [stall for stall in self.stalls if stall.site is not None and stall.site not in known]
+        if new_stalls:
+            details = "\n".join(
+                f"{stall.site} blocked the loop for {stall.duration:.2f}s"
+                + (f" in {stall.span}" if stall.span else "")
+                + "\n"
+                + "".join(stall.stack[-5:])
+                for stall in new_stalls
+            )
+            raise BlockingCallError(f"{len(new_stalls)} new blocking calls on the event loop:\n{details}")
@@ -0,0 +1,279 @@
+import json
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any
+
+from src.utils import Singleton
+
+LabelKey = tuple[tuple[str, str], ...]
+
+
+def _label_key(labels: dict[str, Any]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: dict[str, str] | None = None) -> str:
+    pairs = list(key) + list((extra or {}).items())
+    if not pairs:
+        return ""
+    escaped = (
+        (name, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for name, value in pairs
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+class Counter:
+    """A monotonically increasing value per label set."""
+
+    type = "counter"
+
+    def __init__(self, name: str, description: str = ""):
+        self.name = name
+        self.description = description
+        self.values: dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+    def get(self, **labels) -> float:
+        return self.values.get(_label_key(labels), 0.0)
+
+    def snapshot(self) -> list[dict[str, Any]]:
+        with self._lock:
+            return [{"labels": dict(key), "value": value} for key, value in self.values.items()]
+
+    def prometheus(self) -> list[str]:
+        with self._lock:
+            return [f"{self.name}{_format_labels(key)} {value}" for key, value in self.values.items()]
+
+
+class Gauge(Counter):
+    """A value per label set that can go up and down."""
+
+    type = "gauge"
+
+    def set(self, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self.values[key] = value
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+
+class HdrHistogram:
+    """
+    Distribution of positive values with a bounded relative error, in the manner of HdrHistogram: each power of two
+    of the range is split into `sub_buckets` linear buckets, so values are recorded within 1 / `sub_buckets` of
+    their magnitude whatever it is. Only the buckets in use are stored.
+    """
+
+    def __init__(self, sub_buckets: int = 128, lowest: float = 1e-6):
+        self.sub_buckets = sub_buckets
+        self.lowest = lowest
+        self.buckets: dict[int, int] = {}
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def _index(self, value: float) -> int:
+        mantissa, exponent = math.frexp(max(value, self.lowest) / self.lowest)
+        # mantissa is in [0.5, 1): split it linearly within its power of two
+        return exponent * self.sub_buckets + int((2 * mantissa - 1) * self.sub_buckets)
+
+    def _value(self, index: int) -> float:
+        """Return the middle of bucket `index`."""
+        exponent, sub_bucket = divmod(index, self.sub_buckets)
+        return math.ldexp(1 + (sub_bucket + 0.5) / self.sub_buckets, exponent - 1) * self.lowest
+
+    def record(self, value: float):
+        index = self._index(value)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float | None:
+        if self.count == 0:
+            return None
+        rank = max(math.ceil(q * self.count), 1)
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return min(max(self._value(index), self.min), self.max)
+        return self.max
+
+
+class Histogram:
+    """A latency (or any positive value) distribution per label set, reported with quantiles."""
+
+    type = "summary"
+    quantiles = (0.5, 0.9, 0.99)
+
+    def __init__(self, name: str, description: str = "", sub_buckets: int = 128):
+        self.name = name
+        self.description = description
+        self.sub_buckets = sub_buckets
+        self.values: dict[LabelKey, HdrHistogram] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            histogram = self.values.get(key)
+            if histogram is None:
+                histogram = self.values[key] = HdrHistogram(sub_buckets=self.sub_buckets)
+            histogram.record(value)
+
+    def get(self, **labels) -> HdrHistogram | None:
+        return self.values.get(_label_key(labels))
+
+    def snapshot(self) -> list[dict[str, Any]]:
+        with self._lock:
+            return [
+                {
+                    "labels": dict(key),
+                    "count": histogram.count,
+                    "sum": histogram.sum,
+                    "min": histogram.min,
+                    "max": histogram.max,
+                    **{f"p{round(q * 100)}": histogram.quantile(q) for q in self.quantiles},
+                }
+                for key, histogram in self.values.items()
+            ]
+
+    def prometheus(self) -> list[str]:
+        lines = []
+        with self._lock:
+            for key, histogram in self.values.items():
+                for q in self.quantiles:
+                    lines.append(f"{self.name}{_format_labels(key, {'quantile': str(q)})} {histogram.quantile(q)}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {histogram.sum}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {histogram.count}")
+        return lines
+
+
+class MetricsRegistry(metaclass=Singleton):
+    """
+    Process-wide registry of counters, gauges and histograms, e.g. step, model and tool latencies, queue waits and
+    cache hits. Metrics are created on first use and labelled per call.
+
+    They can be served in the Prometheus text format on localhost with `serve`, and written as periodic JSON
+    snapshots with `start_snapshots`, to watch long batch runs live.
+    """
+
+    def __init__(self):
+        self.metrics: dict[str, Counter | Histogram] = {}
+        self._lock = threading.Lock()
+        self._server: ThreadingHTTPServer | None = None
+        self._snapshot_stop: threading.Event | None = None
+
+    def _get(self, cls, name: str, description: str):
+        metric = self.metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self.metrics.setdefault(name, cls(name, description))
+        if type(metric) is not cls:
+            raise ValueError(f"Metric {name} is a {metric.type}, not a {cls.type}.")
+        return metric
+
+    def counter(self, name: str, description: str = "") -> Counter:
+        return self._get(Counter, name, description)
+
+    def gauge(self, name: str, description: str = "") -> Gauge:
+        return self._get(Gauge, name, description)
+
+    def histogram(self, name: str, description: str = "") -> Histogram:
+        return self._get(Histogram, name, description)
+
+    def reset(self):
+        with self._lock:
+            self.metrics = {}
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            metrics = list(self.metrics.values())
+        return {
+            "time": time.time(),
+            "metrics": {metric.name: {"type": metric.type, "values": metric.snapshot()} for metric in metrics},
+        }
+
+    def prometheus(self) -> str:
+        """Return the metrics in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in sorted(metrics, key=lambda metric: metric.name):
+            if metric.description:
+                lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.prometheus())
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int = 9464, host: str = "127.0.0.1") -> int:
+        """Serve the metrics at http://host:port/metrics from a background thread. Returns the port."""
+        if self._server is not None:
+            return self._server.server_address[1]
+        registry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = registry.prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), MetricsHandler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="metrics-server", daemon=True).start()
+        return self._server.server_address[1]
+
+    def start_snapshots(self, path: str | Path, interval: float = 60.0):
+        """Append a JSON snapshot of the metrics to `path` every `interval` seconds, from a background thread."""
+        self.stop_snapshots()
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        stop = self._snapshot_stop = threading.Event()
+
+        def write_snapshots():
+            while not stop.wait(interval):
+                self.write_snapshot(path)
+
+        threading.Thread(target=write_snapshots, name="metrics-snapshots", daemon=True).start()
+
+    def write_snapshot(self, path: str | Path):
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(self.snapshot(), default=str) + "\n")
+
+    def stop_snapshots(self):
+        if self._snapshot_stop is not None:
+            self._snapshot_stop.set()
+            self._snapshot_stop = None
+
+    def shutdown(self):
+        """Stop the metrics server and the snapshots."""
+        self.stop_snapshots()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+metrics = MetricsRegistry()
@@ -2,6 +2,8 @@ from dataclasses import dataclass, field
 
 from rich.text import Text
 
+from src.logger.metrics import metrics
+
 
 @dataclass
 class TokenUsage:
@@ -48,10 +50,16 @@ class Timing:
         return f"Timing(start_time={self.start_time}, end_time={self.end_time}, duration={self.duration})"
 
 class Monitor:
-    def __init__(self, tracked_model, logger):
+    """
+    Tracks the step durations and token counts of an agent run, and records them in the process-wide metrics
+    registry, labelled with the agent name and model, to follow them across runs.
+    """
+
+    def __init__(self, tracked_model, logger, agent_name: str | None = None):
         self.step_durations = []
         self.tracked_model = tracked_model
         self.logger = logger
+        self.agent_name = agent_name
         self.total_input_token_count = 0
         self.total_output_token_count = 0
 
@@ -76,9 +84,22 @@ class Monitor:
         self.step_durations.append(step_duration)
         console_outputs = f"[Step {len(self.step_durations)}: Duration {step_duration:.2f} seconds"
 
+        labels = {
+            "agent": self.agent_name or "agent",
+            "model": getattr(self.tracked_model, "model_id", None) or "unknown",
+        }
+        metrics.histogram("agent_step_seconds", "Duration of agent steps.").observe(step_duration, **labels)
+        if getattr(step_log, "error", None) is not None:
+            metrics.counter("agent_step_errors_total", "Agent steps ending with an error.").inc(
+                error=type(step_log.error).__name__, **labels
+            )
+
         if step_log.token_usage is not None:
             self.total_input_token_count += step_log.token_usage.input_tokens
             self.total_output_token_count += step_log.token_usage.output_tokens
+            tokens = metrics.counter("agent_tokens_total", "Tokens used by agent steps.")
+            tokens.inc(step_log.token_usage.input_tokens, direction="input", **labels)
+            tokens.inc(step_log.token_usage.output_tokens, direction="output", **labels)
             console_outputs += (
                 f"| Input tokens: {self.total_input_token_count:,} | Output tokens: {self.total_output_token_count:,}"
             )
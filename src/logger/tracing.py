@@ -0,0 +1,200 @@
+import asyncio
+import contextvars
+import itertools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from src.utils import Singleton
+
+_current_span: contextvars.ContextVar["Span | None"] = contextvars.ContextVar("tracing_span", default=None)
+
+
+@dataclass
+class Span:
+    """
+    A timed operation of a trace: a run, a step, a model call, a tool call or a managed agent call.
+
+    Spans started inside another span, including in the asyncio tasks it creates, are its children. `lane`
+    identifies the asyncio task (or thread) the span ran in, so that concurrent spans can be told apart.
+    """
+
+    name: str
+    kind: str
+    span_id: int
+    parent_id: int | None
+    trace_id: int
+    start_time: float
+    end_time: float | None = None
+    lane: int = 0
+    attributes: dict[str, Any] = field(default_factory=dict)
+    error: str | None = None
+
+    @property
+    def duration(self) -> float | None:
+        return self.end_time - self.start_time if self.end_time is not None else None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def dict(self):
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "trace_id": self.trace_id,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "duration": self.duration,
+            "lane": self.lane,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class _NoopSpan:
+    """Stands for a span when tracing is disabled: attributes are discarded."""
+
+    def set(self, **attributes):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Tracer(metaclass=Singleton):
+    """
+    In-process tracer of nested spans (run -> step -> model call / tool call -> managed agent run), exported to
+    JSONL or to the Chrome trace event format (viewable in chrome://tracing or Perfetto).
+
+    The current span is kept in a context variable, so asyncio tasks inherit the span that created them. Tracing is
+    disabled by default, and then only costs a flag check per span.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.spans: list[Span] = []
+        self._ids = itertools.count(1)
+        self._lanes: dict[int, int] = {}
+        # Innermost span opened by each asyncio task (or thread), for code observing the loop from another thread
+        self._active_spans: dict[int, Span] = {}
+        self._lock = threading.Lock()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        with self._lock:
+            self.spans = []
+            self._lanes = {}
+            self._active_spans = {}
+
+    @staticmethod
+    def _task_key() -> int:
+        try:
+            return id(asyncio.current_task())
+        except RuntimeError:
+            return threading.get_ident()
+
+    def _lane(self, key: int) -> int:
+        with self._lock:
+            return self._lanes.setdefault(key, len(self._lanes) + 1)
+
+    def active_span(self, task: asyncio.Task | None) -> Span | None:
+        """Return the innermost span opened by `task` and still open. Usable from any thread."""
+        return self._active_spans.get(id(task)) if task is not None else None
+
+    @staticmethod
+    def current_span() -> Span | None:
+        return _current_span.get()
+
+    def annotate(self, **attributes):
+        """Set attributes on the current span, if any."""
+        span = _current_span.get()
+        if self.enabled and span is not None:
+            span.set(**attributes)
+
+    @contextmanager
+    def span(self, name: str, kind: str, **attributes):
+        """Record the code run inside this context as a span. Yields the span, to set attributes on."""
+        if not self.enabled:
+            yield _NOOP_SPAN
+            return
+        parent = _current_span.get()
+        task_key = self._task_key()
+        span_id = next(self._ids)
+        span = Span(
+            name=name,
+            kind=kind,
+            span_id=span_id,
+            parent_id=parent.span_id if parent is not None else None,
+            trace_id=parent.trace_id if parent is not None else span_id,
+            start_time=time.time(),
+            lane=self._lane(task_key),
+            attributes=attributes,
+        )
+        token = _current_span.set(span)
+        outer_span = self._active_spans.get(task_key)
+        self._active_spans[task_key] = span
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            try:
+                _current_span.reset(token)
+            except ValueError:
+                # A streaming generator may be finalized from another context
+                pass
+            span.end_time = time.time()
+            if outer_span is not None:
+                self._active_spans[task_key] = outer_span
+            else:
+                self._active_spans.pop(task_key, None)
+            with self._lock:
+                self.spans.append(span)
+
+    def export_jsonl(self, path: str | Path, append: bool = False):
+        """Write one JSON line per finished span, replacing the file unless `append` is set."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            spans = list(self.spans)
+        with open(path, "a" if append else "w", encoding="utf-8") as f:
+            for span in spans:
+                f.write(json.dumps(span.dict(), ensure_ascii=False, default=str) + "\n")
+
+    def export_chrome_trace(self, path: str | Path):
+        """Write the finished spans as a Chrome trace event file, one row per asyncio task."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span.start_time)
+        events = [
+            {
+                "name": span.name,
+                "cat": span.kind,
+                "ph": "X",
+                "ts": span.start_time * 1e6,
+                "dur": span.duration * 1e6,
+                "pid": os.getpid(),
+                "tid": span.lane,
+                "args": {**span.attributes, **({"error": span.error} if span.error else {})},
+            }
+            for span in spans
+        ]
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, ensure_ascii=False, default=str)
+
+
+tracer = Tracer()
@@ -1,23 +1,40 @@
+from src.memory.checkpoint import MemoryCheckpoint
+from src.memory.compaction import MemoryCompactor, count_message_tokens
 from src.memory.memory import (
     ActionStep,
     AgentMemory,
     FinalAnswerStep,
+    ImageStore,
     MemoryStep,
+    MessageLog,
+    MessagesReference,
     PlanningStep,
     SystemPromptStep,
     TaskStep,
     ToolCall,
     UserPromptStep,
 )
+from src.memory.report import build_run_report, format_run_report
+from src.memory.run_summary import format_run_summary, render_transcript
 
 __all__ = [
     "AgentMemory",
     "MemoryStep",
+    "MessageLog",
+    "MessagesReference",
     "TaskStep",
     "ActionStep",
     "PlanningStep",
     "SystemPromptStep",
     "UserPromptStep",
     "FinalAnswerStep",
+    "ImageStore",
+    "MemoryCheckpoint",
+    "MemoryCompactor",
+    "count_message_tokens",
+    "build_run_report",
+    "format_run_report",
+    "format_run_summary",
+    "render_transcript",
     "ToolCall"
 ]
@@ -0,0 +1,281 @@
+import base64
+import io
+import json
+import os
+import time
+from dataclasses import asdict
+from typing import TYPE_CHECKING, Any
+
+import src.exception as exceptions
+from src.exception import AgentError
+from src.logger import Timing, TokenUsage
+from src.memory.memory import (
+    ActionStep,
+    AgentMemory,
+    ImageStore,
+    MemoryStep,
+    MessagesReference,
+    PlanningStep,
+    TaskStep,
+    ToolCall,
+)
+from src.models import ChatMessage
+from src.utils import make_json_serializable
+
+if TYPE_CHECKING:
+    import PIL.Image
+
+
+def _to_json(value: Any) -> Any:
+    """Return `value` if it is JSON serializable as is, a serializable conversion of it otherwise."""
+    try:
+        json.dumps(value)
+        return value
+    except (TypeError, ValueError):
+        return make_json_serializable(value)
+
+
+def _decode_error(data: dict | None) -> AgentError | None:
+    """Rebuild an agent error from its `dict()`, without logging it again."""
+    if data is None:
+        return None
+    error_class = getattr(exceptions, data["type"], AgentError)
+    if not (isinstance(error_class, type) and issubclass(error_class, AgentError)):
+        error_class = AgentError
+    error = error_class.__new__(error_class)
+    Exception.__init__(error, data["message"])
+    error.message = data["message"]
+    return error
+
+
+def _encode_message(message: ChatMessage | None) -> dict | None:
+    if message is None:
+        return None
+    return json.loads(message.model_dump_json())
+
+
+def _decode_message(data: dict | None) -> ChatMessage | None:
+    if data is None:
+        return None
+    token_usage = data.pop("token_usage", None)
+    if token_usage is not None:
+        token_usage = TokenUsage(input_tokens=token_usage["input_tokens"], output_tokens=token_usage["output_tokens"])
+    return ChatMessage.from_dict(data, token_usage=token_usage)
+
+
+def _encode_token_usage(token_usage: TokenUsage | None) -> list[int] | None:
+    return [token_usage.input_tokens, token_usage.output_tokens] if token_usage is not None else None
+
+
+def _decode_token_usage(data: list[int] | None) -> TokenUsage | None:
+    return TokenUsage(input_tokens=data[0], output_tokens=data[1]) if data is not None else None
+
+
+class MemoryCheckpoint:
+    """
+    Append-only checkpoint of an agent run on disk, in JSON lines: the memory steps, the JSON-serializable entries
+    of the agent state and the number of the next step, written after each step.
+
+    Records are only ever appended, so a crash can at worst leave a truncated last line, which is ignored on load:
+        - "run": start of a run and its task. Loading uses the records of the last run only.
+        - "image": an image, as PNG, written once and referenced by id by the steps.
+        - "step": a memory step at a given index. Each step is written once; if the memory was reset or
+          rewritten, the steps from the first changed index are written again and supersede the previous ones.
+        - "state": the number of steps, the next step number and the state at the end of a step.
+    Planning steps are stored without their model input messages.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.task: str | None = None
+        self.steps: list[MemoryStep] = []
+        self.step_number = 1
+        self.state: dict[str, Any] = {}
+        self.finished = False
+        self.final_answer: Any = None
+        self._images = ImageStore()
+        self._written_steps: list[MemoryStep] = []
+        # Whether the file ends with a line truncated by a crash, which must be terminated before appending
+        self._truncated = False
+
+    def _append(self, records: list[dict]):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            if self._truncated:
+                f.write("\n")
+                self._truncated = False
+            f.write("".join(json.dumps(record, separators=(",", ":"), default=str) + "\n" for record in records))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def start(self, task: str):
+        """Start a new run in the checkpoint file."""
+        self.task = task
+        self._images = ImageStore()
+        self._written_steps = []
+        self._append([{"type": "run", "task": task, "time": time.time()}])
+
+    def save(
+        self,
+        memory: AgentMemory,
+        step_number: int,
+        state: dict[str, Any],
+        final_answer: Any = None,
+        finished: bool = False,
+    ):
+        """Append the steps added or rewritten since the last save, then the step number and state."""
+        num_written = 0
+        for written_step, step in zip(self._written_steps, memory.steps):
+            if written_step is not step:
+                break
+            num_written += 1
+
+        records = []
+        for index, step in enumerate(memory.steps[num_written:], start=num_written):
+            records.append({"type": "step", "index": index, "step": self._encode_step(step, records)})
+        self._written_steps = list(memory.steps)
+
+        state_record = {
+            "type": "state",
+            "num_steps": len(memory.steps),
+            "step_number": step_number,
+            "state": {key: value for key, value in state.items() if self._is_serializable(value)},
+        }
+        if finished:
+            state_record["finished"] = True
+            state_record["final_answer"] = _to_json(final_answer)
+        records.append(state_record)
+        self._append(records)
+
+    @classmethod
+    def load(cls, path: str) -> "MemoryCheckpoint":
+        """Load the last run of a checkpoint file. New saves are appended to the same file and run."""
+        checkpoint = cls(path)
+        step_records: dict[int, dict] = {}
+        image_records: dict[str, str] = {}
+        state_record = None
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Truncated by a crash while writing
+                    checkpoint._truncated = not line.endswith("\n")
+                    continue
+                if record["type"] == "run":
+                    checkpoint.task = record["task"]
+                    step_records, image_records, state_record = {}, {}, None
+                elif record["type"] == "image":
+                    image_records[record["id"]] = record["png"]
+                elif record["type"] == "step":
+                    step_records[record["index"]] = record["step"]
+                elif record["type"] == "state":
+                    state_record = record
+        if checkpoint.task is None or state_record is None:
+            raise ValueError(f"No complete step to resume from in checkpoint {path}.")
+
+        for image_id, png in image_records.items():
+            checkpoint._load_image(image_id, png)
+        checkpoint.steps = [checkpoint._decode_step(step_records[index]) for index in range(state_record["num_steps"])]
+        checkpoint.step_number = state_record["step_number"]
+        checkpoint.state = state_record["state"]
+        checkpoint.finished = state_record.get("finished", False)
+        checkpoint.final_answer = state_record.get("final_answer")
+        checkpoint._written_steps = list(checkpoint.steps)
+        return checkpoint
+
+    @staticmethod
+    def _is_serializable(value: Any) -> bool:
+        try:
+            json.dumps(value)
+            return True
+        except (TypeError, ValueError):
+            return False
+
+    def _encode_images(self, images: list["PIL.Image.Image"] | None, records: list[dict]) -> list[str] | None:
+        if images is None:
+            return None
+        image_ids = []
+        for image in images:
+            image_id = self._images.image_id(image)
+            if image_id not in self._images.images:
+                self._images.add(image)
+                buffer = io.BytesIO()
+                image.save(buffer, format="PNG")
+                records.append({"type": "image", "id": image_id, "png": base64.b64encode(buffer.getvalue()).decode()})
+            image_ids.append(image_id)
+        return image_ids
+
+    def _load_image(self, image_id: str, png: str):
+        from PIL import Image
+
+        image = Image.open(io.BytesIO(base64.b64decode(png)))
+        image.load()
+        self._images.images[image_id] = image
+
+    def _decode_images(self, image_ids: list[str] | None) -> list["PIL.Image.Image"] | None:
+        if image_ids is None:
+            return None
+        return [self._images.get(image_id) for image_id in image_ids]
+
+    def _encode_step(self, step: MemoryStep, records: list[dict]) -> dict:
+        if isinstance(step, TaskStep):
+            return {"kind": "task", "task": step.task, "task_images": self._encode_images(step.task_images, records)}
+        if isinstance(step, PlanningStep):
+            return {
+                "kind": "planning",
+                "model_output_message": _encode_message(step.model_output_message),
+                "plan": step.plan,
+                "timing": [step.timing.start_time, step.timing.end_time],
+                "token_usage": _encode_token_usage(step.token_usage),
+            }
+        if isinstance(step, ActionStep):
+            return {
+                "kind": "action",
+                "step_number": step.step_number,
+                "timing": [step.timing.start_time, step.timing.end_time],
+                "model_input_reference": asdict(step.model_input_reference) if step.model_input_reference else None,
+                "tool_calls": [[tc.name, tc.arguments, tc.id] for tc in step.tool_calls]
+                if step.tool_calls is not None
+                else None,
+                "error": step.error.dict() if step.error else None,
+                "model_output_message": _encode_message(step.model_output_message),
+                "model_output": step.model_output,
+                "observations": step.observations,
+                "observations_summary": step.observations_summary,
+                "observations_images": self._encode_images(step.observations_images, records),
+                "action_output": _to_json(step.action_output),
+                "token_usage": _encode_token_usage(step.token_usage),
+                "is_final_answer": step.is_final_answer,
+            }
+        raise ValueError(f"Cannot checkpoint memory step of type {type(step).__name__}.")
+
+    def _decode_step(self, data: dict) -> MemoryStep:
+        if data["kind"] == "task":
+            return TaskStep(task=data["task"], task_images=self._decode_images(data["task_images"]))
+        if data["kind"] == "planning":
+            return PlanningStep(
+                model_input_messages=[],
+                model_output_message=_decode_message(data["model_output_message"]),
+                plan=data["plan"],
+                timing=Timing(*data["timing"]),
+                token_usage=_decode_token_usage(data["token_usage"]),
+            )
+        reference = data["model_input_reference"]
+        return ActionStep(
+            step_number=data["step_number"],
+            timing=Timing(*data["timing"]),
+            model_input_reference=MessagesReference(**reference) if reference else None,
+            tool_calls=[ToolCall(name=name, arguments=arguments, id=id) for name, arguments, id in data["tool_calls"]]
+            if data["tool_calls"] is not None
+            else None,
+            error=_decode_error(data["error"]),
+            model_output_message=_decode_message(data["model_output_message"]),
+            model_output=data["model_output"],
+            observations=data["observations"],
+            observations_summary=data.get("observations_summary"),
+            observations_images=self._decode_images(data["observations_images"]),
+            action_output=data["action_output"],
+            token_usage=_decode_token_usage(data["token_usage"]),
+            is_final_answer=data["is_final_answer"],
+        )
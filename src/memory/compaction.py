@@ -0,0 +1,156 @@
+import asyncio
+import hashlib
+from collections import OrderedDict
+from dataclasses import replace
+from functools import lru_cache
+from typing import Any
+
+from src.logger import model_ledger
+from src.memory.memory import ActionStep, AgentMemory
+from src.models import ChatMessage, MessageRole
+from src.utils import get_token_count
+
+SUMMARY_PROMPT = """Summarize the following observation of a tool called by an agent. Keep every fact, number, \
+name, date, URL and file path that could help complete a task, and drop boilerplate, navigation and repeated \
+content. Answer with the summary only, in at most {max_words} words.
+
+Observation:
+{observation}"""
+
+
+@lru_cache(maxsize=4096)
+def _count_tokens(text: str) -> int:
+    return get_token_count(text)
+
+
+def count_message_tokens(messages: list[ChatMessage]) -> int:
+    """Return the number of tokens of the text of `messages`. Images are not counted."""
+    total = 0
+    for message in messages:
+        if isinstance(message.content, list):
+            total += sum(_count_tokens(element["text"]) for element in message.content if element.get("type") == "text")
+        elif message.content is not None:
+            total += _count_tokens(str(message.content))
+    return total
+
+
+class MemoryCompactor:
+    """
+    Keeps the history sent to the model under a token budget.
+
+    Once the messages of the memory exceed `max_tokens`, the observations of the oldest action steps are replaced
+    by summaries from `model` (a cheap one) until the history is expected to fit in `target_tokens`. The last
+    `keep_recent_steps` action steps and the observations shorter than `min_observation_tokens` are kept verbatim.
+    Each distinct observation is summarized once: summaries are cached by content and shared by the agents using
+    this compactor.
+    """
+
+    def __init__(
+        self,
+        model: Any,
+        max_tokens: int = 64000,
+        target_tokens: int | None = None,
+        keep_recent_steps: int = 3,
+        min_observation_tokens: int = 512,
+        summary_max_words: int = 200,
+        max_entries: int = 1024,
+    ):
+        self.model = model
+        self.max_tokens = max_tokens
+        self.target_tokens = target_tokens if target_tokens is not None else int(0.75 * max_tokens)
+        self.keep_recent_steps = keep_recent_steps
+        self.min_observation_tokens = min_observation_tokens
+        self.summary_max_words = summary_max_words
+        self.max_entries = max_entries
+        self._summaries: OrderedDict[str, str] = OrderedDict()
+        self._in_flight: dict[str, asyncio.Task] = {}
+        self.metrics = {
+            "compactions": 0,
+            "summarized_steps": 0,
+            "summary_calls": 0,
+            "cache_hits": 0,
+            "failures": 0,
+            "tokens_before": 0,
+            "tokens_saved": 0,
+        }
+
+    def stats(self) -> dict[str, int]:
+        return dict(self.metrics)
+
+    async def _generate_summary(self, observation: str) -> str:
+        self.metrics["summary_calls"] += 1
+        prompt = SUMMARY_PROMPT.format(max_words=self.summary_max_words, observation=observation)
+        with model_ledger.caller("memory_compaction"):
+            chat_message = await self.model(
+                [ChatMessage(role=MessageRole.USER, content=[{"type": "text", "text": prompt}])]
+            )
+        return str(chat_message.content).strip()
+
+    async def summarize(self, observation: str) -> str | None:
+        """Return the summary of `observation`, or `None` if it could not be produced."""
+        key = hashlib.sha256(observation.encode()).hexdigest()
+        if key in self._summaries:
+            self.metrics["cache_hits"] += 1
+            self._summaries.move_to_end(key)
+            return self._summaries[key]
+        if key not in self._in_flight:
+            self._in_flight[key] = asyncio.create_task(self._generate_summary(observation))
+        else:
+            self.metrics["cache_hits"] += 1
+        task = self._in_flight[key]
+        try:
+            summary = await asyncio.shield(task)
+        except Exception:
+            self.metrics["failures"] += 1
+            return None
+        finally:
+            if task.done() and self._in_flight.get(key) is task:
+                del self._in_flight[key]
+        self._summaries[key] = summary
+        self._summaries.move_to_end(key)
+        while len(self._summaries) > self.max_entries:
+            self._summaries.popitem(last=False)
+        return summary
+
+    async def compact(self, memory: AgentMemory) -> int:
+        """Summarize old observations if the memory is over budget. Returns the number of tokens saved."""
+        total_tokens = count_message_tokens(memory.to_messages())
+        if total_tokens <= self.max_tokens:
+            return 0
+
+        action_steps = [(index, step) for index, step in enumerate(memory.steps) if isinstance(step, ActionStep)]
+        candidates = []
+        excess = total_tokens - self.target_tokens
+        for index, step in action_steps[: max(len(action_steps) - self.keep_recent_steps, 0)]:
+            if excess <= 0:
+                break
+            if step.observations is None or step.observations_summary is not None:
+                continue
+            observation_tokens = _count_tokens(step.observations)
+            if observation_tokens < self.min_observation_tokens:
+                continue
+            candidates.append((index, step, observation_tokens))
+            # Assume summaries use their whole length budget, about 4 tokens for 3 words
+            excess -= observation_tokens - self.summary_max_words * 4 // 3
+        if not candidates:
+            return 0
+
+        summaries = await asyncio.gather(*[self.summarize(step.observations) for _, step, _ in candidates])
+        tokens_saved = 0
+        first_index = None
+        for (index, step, observation_tokens), summary in zip(candidates, summaries):
+            if summary is None or _count_tokens(summary) >= observation_tokens:
+                continue
+            # Replace the step rather than edit it, so that checkpoints see it as rewritten
+            memory.steps[index] = replace(step, observations_summary=summary)
+            tokens_saved += observation_tokens - _count_tokens(summary)
+            first_index = index if first_index is None else first_index
+            self.metrics["summarized_steps"] += 1
+        if first_index is None:
+            return 0
+
+        memory.invalidate_messages(first_index)
+        self.metrics["compactions"] += 1
+        self.metrics["tokens_before"] += total_tokens
+        self.metrics["tokens_saved"] += tokens_saved
+        return tokens_saved
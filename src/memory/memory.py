@@ -1,5 +1,6 @@
-from dataclasses import asdict, dataclass
-from typing import TYPE_CHECKING, Any
+import hashlib
+from dataclasses import asdict, dataclass, replace
+from typing import TYPE_CHECKING, Any, Literal
 
 from src.exception import AgentError
 from src.logger import AgentLogger, LogLevel, Timing, TokenUsage
@@ -15,6 +16,8 @@ class ToolCall:
     name: str
     arguments: Any
     id: str
+    # When the call was started and returned its observation, if it was executed
+    timing: Timing | None = None
 
     def dict(self):
         return {
@@ -36,16 +39,35 @@ class MemoryStep:
         raise NotImplementedError
 
 
+@dataclass
+class MessagesReference:
+    """
+    Compact reference to the model input of a step: the messages `[start, end)` of the memory message log for
+    `summary_mode`, framed by the system and user prompts, and the log digest at `end` to detect later rewrites.
+    """
+
+    summary_mode: bool
+    start: int
+    end: int
+    digest: str
+
+    def dict(self):
+        return asdict(self)
+
+
 @dataclass
 class ActionStep(MemoryStep):
     step_number: int
     timing: Timing
     model_input_messages: list[ChatMessage] | None = None
+    model_input_reference: MessagesReference | None = None
     tool_calls: list[ToolCall] | None = None
     error: AgentError | None = None
     model_output_message: ChatMessage | None = None
     model_output: str | None = None
     observations: str | None = None
+    # Shorter version of the observations sent to the model instead, set by memory compaction
+    observations_summary: str | None = None
     observations_images: list["PIL.Image.Image"] | None = None
     action_output: Any = None
     token_usage: TokenUsage | None = None
@@ -57,11 +79,13 @@ class ActionStep(MemoryStep):
             "step_number": self.step_number,
             "timing": self.timing.dict(),
             "model_input_messages": self.model_input_messages,
+            "model_input_reference": self.model_input_reference.dict() if self.model_input_reference else None,
             "tool_calls": [tc.dict() for tc in self.tool_calls] if self.tool_calls else [],
             "error": self.error.dict() if self.error else None,
             "model_output_message": self.model_output_message.dict() if self.model_output_message else None,
             "model_output": self.model_output,
             "observations": self.observations,
+            "observations_summary": self.observations_summary,
             "observations_images": [image.tobytes() for image in self.observations_images]
             if self.observations_images
             else None,
@@ -104,7 +128,19 @@ class ActionStep(MemoryStep):
                 )
             )
 
-        if self.observations is not None:
+        if self.observations_summary is not None:
+            messages.append(
+                ChatMessage(
+                    role=MessageRole.TOOL_RESPONSE,
+                    content=[
+                        {
+                            "type": "text",
+                            "text": f"Observation (summarized):\n{self.observations_summary}",
+                        }
+                    ],
+                )
+            )
+        elif self.observations is not None:
             messages.append(
                 ChatMessage(
                     role=MessageRole.TOOL_RESPONSE,
@@ -186,21 +222,244 @@ class UserPromptStep(MemoryStep):
         return [ChatMessage(role=MessageRole.USER, content=[{"type": "text", "text": self.user_prompt}])]
 
 
+class ImageStore:
+    """
+    Content-addressed store of the images seen by the agent. Each distinct image is kept once under a short id
+    derived from its pixels, so that messages can reference it instead of carrying a copy.
+    """
+
+    def __init__(self):
+        self.images: dict[str, PIL.Image.Image] = {}
+        self.pinned: set[str] = set()
+
+    @staticmethod
+    def image_id(image: "PIL.Image.Image") -> str:
+        digest = hashlib.sha256(f"{image.mode}{image.size}".encode())
+        digest.update(image.tobytes())
+        return digest.hexdigest()[:16]
+
+    def add(self, image: "PIL.Image.Image") -> str:
+        image_id = self.image_id(image)
+        self.images.setdefault(image_id, image)
+        return image_id
+
+    def get(self, image_id: str) -> "PIL.Image.Image":
+        return self.images[image_id]
+
+    def pin(self, image_id: str):
+        """Always send this image to the model, whatever the resend policy."""
+        if image_id not in self.images:
+            raise KeyError(f"Unknown image id: {image_id}")
+        self.pinned.add(image_id)
+
+    def unpin(self, image_id: str):
+        self.pinned.discard(image_id)
+
+    def __len__(self):
+        return len(self.images)
+
+
+class MessageLog:
+    """
+    Append-only log of the messages materialized from the memory steps, for one summary mode.
+
+    Each step is converted with `to_messages` once, when it is first seen; `step_offsets[i]` is the index of the
+    first message of step `i` in `messages`. `digests[i]` is a running hash of the messages up to `i` included.
+    """
+
+    def __init__(self, summary_mode: bool = False, image_store: ImageStore | None = None):
+        self.summary_mode = summary_mode
+        self.image_store = image_store if image_store is not None else ImageStore()
+        self.messages: list[ChatMessage] = []
+        self.step_offsets: list[int] = []
+        self.digests: list[str] = []
+        # (message index, content index, image id, generation) of every image in `messages`
+        self.image_refs: list[tuple[int, int, str, int]] = []
+        # Incremented by every `sync` that adds steps
+        self.generation = 0
+        self._steps: list[MemoryStep] = []
+
+    def truncate(self, num_steps: int):
+        """Forget the messages of every step from index `num_steps` on."""
+        if num_steps >= len(self.step_offsets):
+            return
+        num_messages = self.step_offsets[num_steps]
+        del self.messages[num_messages:]
+        del self.digests[num_messages:]
+        del self.step_offsets[num_steps:]
+        del self._steps[num_steps:]
+        self.image_refs = [ref for ref in self.image_refs if ref[0] < num_messages]
+
+    def sync(self, steps: list[MemoryStep]):
+        """Materialize the messages of the steps appended since the last call."""
+        num_steps = len(self.step_offsets)
+        # The step list was reset or rewritten: rebuild from scratch
+        if num_steps > len(steps) or (num_steps and steps[num_steps - 1] is not self._steps[-1]):
+            self.truncate(0)
+            num_steps = 0
+        if num_steps < len(steps):
+            self.generation += 1
+        for step in steps[num_steps:]:
+            self.step_offsets.append(len(self.messages))
+            self._steps.append(step)
+            for message in step.to_messages(summary_mode=self.summary_mode):
+                digest = hashlib.sha256((self.digests[-1] if self.digests else "").encode())
+                digest.update(str(message.role).encode())
+                if isinstance(message.content, list):
+                    for content_index, element in enumerate(message.content):
+                        if element.get("type") == "image":
+                            image_id = self.image_store.add(element["image"])
+                            self.image_refs.append((len(self.messages), content_index, image_id, self.generation))
+                            digest.update(image_id.encode())
+                        else:
+                            digest.update(str(element.get("text")).encode())
+                else:
+                    digest.update(str(message.content).encode())
+                self.messages.append(message)
+                self.digests.append(digest.hexdigest())
+
+    def digest(self, end: int) -> str:
+        """Return the digest of the messages `[0, end)`."""
+        return self.digests[end - 1] if end > 0 else ""
+
+    def step_range(self, step_index: int) -> tuple[int, int]:
+        """Return the (start, end) indices of the messages of step `step_index`."""
+        start = self.step_offsets[step_index]
+        end = self.step_offsets[step_index + 1] if step_index + 1 < len(self.step_offsets) else len(self.messages)
+        return start, end
+
+
+ImageResendPolicy = Literal["all", "first_turn", "last_n", "on_demand"]
+
+
 class AgentMemory:
-    def __init__(self, system_prompt: str, user_prompt: str | None = None):
+    """
+    Memory of an agent run.
+
+    Images found in the step messages are kept once in `images` and the resend policy decides which of them are
+    sent to the model; the others are replaced by a short reference:
+        - "all": every distinct image, once, where it first appeared.
+        - "first_turn": only the images added since the previous model call.
+        - "last_n": the `max_images` most recent images.
+        - "on_demand": no image.
+    Images pinned with `images.pin(image_id)` are always sent.
+    """
+
+    def __init__(
+        self,
+        system_prompt: str,
+        user_prompt: str | None = None,
+        image_resend_policy: ImageResendPolicy = "all",
+        max_images: int = 3,
+    ):
         self.system_prompt = SystemPromptStep(system_prompt=system_prompt)
         if user_prompt is not None:
             self.user_prompt = UserPromptStep(user_prompt=user_prompt)
         else:
             self.user_prompt = None
         self.steps: list[TaskStep | ActionStep | PlanningStep] = []
+        self.images = ImageStore()
+        self.image_resend_policy = image_resend_policy
+        self.max_images = max_images
+        self.message_logs: dict[bool, MessageLog] = {}
 
     def reset(self):
         self.steps = []
+        self.images = ImageStore()
+        self.message_logs = {}
+
+    def get_message_log(self, summary_mode: bool = False) -> MessageLog:
+        """Return the message log for `summary_mode`, built lazily and brought up to date with the steps."""
+        if summary_mode not in self.message_logs:
+            self.message_logs[summary_mode] = MessageLog(summary_mode=summary_mode, image_store=self.images)
+        message_log = self.message_logs[summary_mode]
+        message_log.sync(self.steps)
+        return message_log
+
+    def invalidate_messages(self, from_step: int = 0):
+        """Drop the materialized messages of the steps from index `from_step` on. Call after editing those steps."""
+        for message_log in self.message_logs.values():
+            message_log.truncate(from_step)
+
+    def to_messages(self, summary_mode: bool = False) -> list[ChatMessage]:
+        """
+        Return the system prompt, the messages of every step and the user prompt. Only the steps added since the
+        previous call are converted, the returned list shares its messages with the log.
+        """
+        messages = self.system_prompt.to_messages(summary_mode=summary_mode)
+        messages.extend(self._apply_image_policy(self.get_message_log(summary_mode)))
+        if self.user_prompt is not None:
+            messages.extend(self.user_prompt.to_messages(summary_mode=summary_mode))
+        return messages
+
+    def reference_messages(self, summary_mode: bool = False) -> MessagesReference:
+        """Return a compact reference to the messages `to_messages(summary_mode)` currently returns."""
+        message_log = self.get_message_log(summary_mode)
+        end = len(message_log.messages)
+        return MessagesReference(summary_mode=summary_mode, start=0, end=end, digest=message_log.digest(end))
+
+    def get_model_input_messages(self, step: "ActionStep | PlanningStep") -> list[ChatMessage] | None:
+        """
+        Return the input messages of a step, rebuilding them from its `model_input_reference` if they were not
+        stored. Rebuilt messages carry the images as stored, before the resend policy is applied.
+        """
+        if step.model_input_messages is not None:
+            return step.model_input_messages
+        reference = getattr(step, "model_input_reference", None)
+        if reference is None:
+            return None
+        message_log = self.get_message_log(reference.summary_mode)
+        if reference.end > len(message_log.messages) or message_log.digest(reference.end) != reference.digest:
+            raise ValueError("The memory was modified since this step was run, its input cannot be rebuilt.")
+        messages = self.system_prompt.to_messages(summary_mode=reference.summary_mode)
+        messages.extend(message_log.messages[reference.start:reference.end])
+        if self.user_prompt is not None:
+            messages.extend(self.user_prompt.to_messages(summary_mode=reference.summary_mode))
+        return messages
+
+    def _apply_image_policy(self, message_log: MessageLog) -> list[ChatMessage]:
+        """Replace the images that should not be sent by a reference to their id."""
+        if not message_log.image_refs:
+            return message_log.messages
+
+        # Only the first occurrence of each image is a candidate
+        first_refs = {}
+        for ref in message_log.image_refs:
+            first_refs.setdefault(ref[2], ref)
+        if self.image_resend_policy == "all":
+            kept = set(first_refs)
+        elif self.image_resend_policy == "first_turn":
+            kept = {image_id for image_id, ref in first_refs.items() if ref[3] == message_log.generation}
+        elif self.image_resend_policy == "last_n":
+            kept = set(list(first_refs)[-self.max_images:]) if self.max_images > 0 else set()
+        elif self.image_resend_policy == "on_demand":
+            kept = set()
+        else:
+            raise ValueError(f"Unknown image resend policy: {self.image_resend_policy}")
+        kept |= self.images.pinned
+
+        replaced: dict[int, list[dict]] = {}
+        for message_index, content_index, image_id, _ in message_log.image_refs:
+            if image_id in kept and first_refs[image_id][:2] == (message_index, content_index):
+                continue
+            content = replaced.setdefault(message_index, list(message_log.messages[message_index].content))
+            content[content_index] = {"type": "text", "text": f"[image {image_id} not shown]"}
+        if not replaced:
+            return message_log.messages
+
+        messages = list(message_log.messages)
+        for message_index, content in replaced.items():
+            messages[message_index] = replace(messages[message_index], content=content)
+        return messages
 
     def get_succinct_steps(self) -> list[dict]:
         return [
-            {key: value for key, value in step.dict().items() if key != "model_input_messages"} for step in self.steps
+            {
+                key: value
+                for key, value in step.dict().items()
+                if key not in ("model_input_messages", "model_input_reference")
+            }
+            for step in self.steps
         ]
 
     def get_full_steps(self) -> list[dict]:
@@ -223,8 +482,14 @@ class AgentMemory:
                 logger.log_task(step.task, "", level=LogLevel.ERROR)
             elif isinstance(step, ActionStep):
                 logger.log_rule(f"Step {step.step_number}", level=LogLevel.ERROR)
-                if detailed and step.model_input_messages is not None:
-                    logger.log_messages(step.model_input_messages, level=LogLevel.ERROR)
+                if detailed:
+                    try:
+                        model_input_messages = self.get_model_input_messages(step)
+                    except ValueError:
+                        # The memory was compacted or edited since this step
+                        model_input_messages = None
+                    if model_input_messages is not None:
+                        logger.log_messages(model_input_messages, level=LogLevel.ERROR)
                 if step.model_output is not None:
                     logger.log_markdown(title="Agent output:", content=step.model_output, level=LogLevel.ERROR)
             elif isinstance(step, PlanningStep):
@@ -234,4 +499,4 @@ class AgentMemory:
                 logger.log_markdown(title="Agent output:", content=step.plan, level=LogLevel.ERROR)
 
 
-__all__ = ["AgentMemory"]
+__all__ = ["AgentMemory", "ImageStore", "MessageLog", "MessagesReference"]
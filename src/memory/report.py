@@ -0,0 +1,178 @@
+from collections import defaultdict
+from typing import Any
+
+from src.memory.memory import ActionStep, AgentMemory, PlanningStep
+
+
+def _union_seconds(intervals: list[tuple[float, float]]) -> float:
+    """Return the time covered by at least one of `intervals`."""
+    total, current_start, current_end = 0.0, None, None
+    for start, end in sorted(intervals):
+        if current_end is None or start > current_end:
+            if current_end is not None:
+                total += current_end - current_start
+            current_start, current_end = start, end
+        else:
+            current_end = max(current_end, end)
+    if current_end is not None:
+        total += current_end - current_start
+    return total
+
+
+def iter_agent_memories(
+    agent: Any, prefix: str = "", runs: list[AgentMemory] | None = None
+) -> list[tuple[str, Any, AgentMemory]]:
+    """
+    Return (path, agent, memory) for each run of `agent` and, recursively, of the agents it manages. `runs` are the
+    memories of the runs of `agent`, by default its current memory. Managed agents are listed once per run recorded
+    by their tool, including the runs of the forks made for plan steps, or else with the memory of their last run.
+    """
+    name = getattr(agent, "name", None) or type(agent).__name__
+    path = f"{prefix}/{name}" if prefix else name
+    memories = [(path, agent, memory) for memory in (runs if runs is not None else [agent.memory])]
+    for tool in getattr(agent, "tools", {}).values():
+        managed_agent = getattr(tool, "agent", None)
+        if managed_agent is None or managed_agent is agent:
+            continue
+        if not hasattr(tool, "runs"):
+            memories.extend(iter_agent_memories(managed_agent, prefix=path))
+            continue
+        # The runs of the same agent share its managed agents, whose runs are listed once
+        runs_by_agent: dict[int, tuple[Any, list[AgentMemory]]] = {}
+        for run_agent, memory in tool.runs:
+            runs_by_agent.setdefault(id(run_agent), (run_agent, []))[1].append(memory)
+        for run_agent, run_memories in runs_by_agent.values():
+            memories.extend(iter_agent_memories(run_agent, prefix=path, runs=run_memories))
+    return memories
+
+
+def build_run_report(agent: Any, slowest_steps: int = 5) -> dict[str, Any]:
+    """
+    Aggregate the durations and tokens recorded in the memory of `agent` and of its managed agents: by agent, step
+    type, tool and model, with the slowest steps.
+
+    The tool calls of a step run concurrently, so a step takes the time covered by its tool calls rather than their
+    sum. The longest call of each step is on the critical path: `critical_path_seconds` is the time the run would
+    take if the tool calls of every step ran fully in parallel, and `tool_parallelism` the ratio of the summed tool
+    time to the time the tool calls actually took. The totals are those of the top-level agent, whose steps
+    include the calls to its managed agents.
+    """
+    by_agent: dict[str, dict[str, float]] = defaultdict(lambda: defaultdict(float))
+    by_step_type: dict[str, dict[str, float]] = defaultdict(lambda: defaultdict(float))
+    by_tool: dict[str, dict[str, float]] = defaultdict(lambda: defaultdict(float))
+    by_model: dict[str, dict[str, float]] = defaultdict(lambda: defaultdict(float))
+    steps = []
+
+    for path, managed_agent, memory in iter_agent_memories(agent):
+        model_id = getattr(getattr(managed_agent, "model", None), "model_id", None) or "unknown"
+        # The runs of a managed agent add up under its path
+        totals = by_agent[path]
+        totals["runs"] += 1
+        for step in memory.steps:
+            if not isinstance(step, (ActionStep, PlanningStep)) or step.timing.duration is None:
+                continue
+            step_type = type(step).__name__
+            duration = step.timing.duration
+            input_tokens = step.token_usage.input_tokens if step.token_usage else 0
+            output_tokens = step.token_usage.output_tokens if step.token_usage else 0
+
+            tool_seconds, tool_wall_seconds, critical_tool = 0.0, 0.0, None
+            if isinstance(step, ActionStep):
+                timed_calls = [
+                    tool_call
+                    for tool_call in step.tool_calls or []
+                    if tool_call.timing is not None and tool_call.timing.duration is not None
+                ]
+                for tool_call in timed_calls:
+                    tool = by_tool[tool_call.name]
+                    tool["calls"] += 1
+                    tool["seconds"] += tool_call.timing.duration
+                    tool["max_seconds"] = max(tool["max_seconds"], tool_call.timing.duration)
+                    tool_seconds += tool_call.timing.duration
+                intervals = [(tool_call.timing.start_time, tool_call.timing.end_time) for tool_call in timed_calls]
+                tool_wall_seconds = min(_union_seconds(intervals), duration)
+                # The longest call is the one the step could not have avoided waiting for
+                if timed_calls:
+                    critical_tool = max(timed_calls, key=lambda tool_call: tool_call.timing.duration)
+                    by_tool[critical_tool.name]["critical_seconds"] += critical_tool.timing.duration
+
+            for aggregate in (by_step_type[step_type], totals):
+                aggregate["steps"] += 1
+                aggregate["seconds"] += duration
+                aggregate["input_tokens"] += input_tokens
+                aggregate["output_tokens"] += output_tokens
+            totals["tool_seconds"] += tool_seconds
+            totals["tool_wall_seconds"] += tool_wall_seconds
+            totals["critical_path_seconds"] += (
+                duration - tool_wall_seconds + (critical_tool.timing.duration if critical_tool else 0.0)
+            )
+            # The rest of a step is mostly its model call
+            model = by_model[model_id]
+            model["steps"] += 1
+            model["seconds"] += duration - tool_wall_seconds
+            model["input_tokens"] += input_tokens
+            model["output_tokens"] += output_tokens
+
+            steps.append(
+                {
+                    "agent": path,
+                    "type": step_type,
+                    "step_number": getattr(step, "step_number", None),
+                    "seconds": round(duration, 3),
+                    "tool_seconds": round(tool_seconds, 3),
+                    "tools": [tool_call.name for tool_call in getattr(step, "tool_calls", None) or []],
+                    "critical_tool": critical_tool.name if critical_tool else None,
+                    "error": type(step.error).__name__ if getattr(step, "error", None) is not None else None,
+                }
+            )
+
+    def rounded(groups):
+        return {name: {key: round(value, 3) for key, value in group.items()} for name, group in sorted(groups.items())}
+
+    by_agent = {path: {key: round(value, 3) for key, value in totals.items()} for path, totals in by_agent.items()}
+    main_totals = next(iter(by_agent.values()), {})
+    tool_seconds = main_totals.get("tool_seconds", 0.0)
+    tool_wall_seconds = main_totals.get("tool_wall_seconds", 0.0)
+    return {
+        "total_seconds": main_totals.get("seconds", 0.0),
+        "critical_path_seconds": main_totals.get("critical_path_seconds", 0.0),
+        "tool_seconds": tool_seconds,
+        "tool_wall_seconds": tool_wall_seconds,
+        "tool_parallelism": round(tool_seconds / tool_wall_seconds, 2) if tool_wall_seconds else None,
+        "by_agent": by_agent,
+        "by_step_type": rounded(by_step_type),
+        "by_tool": rounded(by_tool),
+        "by_model": rounded(by_model),
+        "slowest_steps": sorted(steps, key=lambda step: step["seconds"], reverse=True)[:slowest_steps],
+    }
+
+
+def format_run_report(report: dict[str, Any]) -> str:
+    """Return `report` as compact text tables."""
+    lines = [
+        f"Run: {report['total_seconds']:.1f}s (critical path {report['critical_path_seconds']:.1f}s), "
+        f"tools {report['tool_seconds']:.1f}s in {report['tool_wall_seconds']:.1f}s "
+        f"(parallelism {report['tool_parallelism'] or 1.0:.2f})"
+    ]
+
+    def table(title: str, rows: dict[str, dict[str, float]], count_key: str):
+        if not rows:
+            return
+        width = max(len(name) for name in rows)
+        lines.append(f"{title:<{width}}  {count_key:>6}  {'seconds':>9}  {'in tok':>9}  {'out tok':>8}")
+        for name, row in sorted(rows.items(), key=lambda item: item[1].get("seconds", 0.0), reverse=True):
+            lines.append(
+                f"{name:<{width}}  {int(row.get(count_key, 0)):>6}  {row.get('seconds', 0.0):>9.1f}  "
+                f"{int(row.get('input_tokens', 0)):>9}  {int(row.get('output_tokens', 0)):>8}"
+            )
+
+    table("agent", report["by_agent"], "steps")
+    table("step type", report["by_step_type"], "steps")
+    table("tool", report["by_tool"], "calls")
+    table("model", report["by_model"], "steps")
+    if report["slowest_steps"]:
+        lines.append("slowest steps:")
+        for step in report["slowest_steps"]:
+            tools = f" [{', '.join(step['tools'])}]" if step["tools"] else ""
+            lines.append(f"  {step['agent']} {step['type']} {step['step_number']}: {step['seconds']:.1f}s{tools}")
+    return "\n".join(lines)
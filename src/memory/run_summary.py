@@ -0,0 +1,96 @@
+import json
+import re
+from typing import Any
+
+from src.memory.memory import ActionStep, AgentMemory
+
+_URL_PATTERN = re.compile(r"https?://[^\s<>\"'`\])}]+")
+
+
+def render_transcript(memory: AgentMemory) -> str:
+    """Return the text of the messages of `memory`, one block per message. Images are left out."""
+    blocks = []
+    for message in memory.to_messages():
+        if isinstance(message.content, list):
+            text = "\n".join(element["text"] for element in message.content if element.get("type") == "text")
+        else:
+            text = str(message.content) if message.content is not None else ""
+        role = getattr(message.role, "value", message.role)
+        blocks.append(f"[{role}]\n{text}")
+    return "\n\n".join(blocks)
+
+
+def _shorten(text: str, max_chars: int) -> str:
+    text = re.sub(r"\s+", " ", text).strip()
+    return text if len(text) <= max_chars else text[: max_chars - 3].rstrip() + "..."
+
+
+def _extract_sources(steps: list[ActionStep], max_sources: int) -> list[str]:
+    sources = []
+    for step in steps:
+        texts = [json.dumps(tool_call.arguments, default=str) for tool_call in step.tool_calls or []]
+        texts.append(step.observations or "")
+        for text in texts:
+            for url in _URL_PATTERN.findall(text):
+                url = url.rstrip(".,;:!?")
+                if url not in sources:
+                    sources.append(url)
+                if len(sources) >= max_sources:
+                    return sources
+    return sources
+
+
+def format_run_summary(
+    memory: AgentMemory,
+    final_answer: Any,
+    name: str | None = None,
+    transcript_handle: str | None = None,
+    max_chars: int = 4000,
+    max_evidence: int = 5,
+    evidence_chars: int = 400,
+    max_sources: int = 10,
+) -> str:
+    """
+    Return a summary of the run recorded in `memory`, at most about `max_chars` long: the final answer, the
+    observations of the last successful tool calls as key evidence, and the URLs seen during the run as sources.
+
+    The full transcript is not included: `transcript_handle` points to where it was stored, if anywhere.
+    """
+    action_steps = [step for step in memory.steps if isinstance(step, ActionStep) and not step.is_final_answer]
+    evidence = []
+    for step in action_steps:
+        observation = step.observations_summary or step.observations
+        if step.error is not None or not observation:
+            continue
+        tool_names = ", ".join(tool_call.name for tool_call in step.tool_calls or []) or "observation"
+        evidence.append(f"- [step {step.step_number}, {tool_names}] {_shorten(observation, evidence_chars)}")
+    evidence = evidence[-max_evidence:] if max_evidence > 0 else []
+    sources = [f"- {url}" for url in _extract_sources(action_steps, max_sources)] if max_sources > 0 else []
+
+    header = f'<run_summary agent="{name}">' if name else "<run_summary>"
+    answer = f"Final answer: {_shorten(str(final_answer), max_chars // 2)}"
+    footer = []
+    if transcript_handle is not None:
+        footer.append(
+            f"Full transcript: artifact '{transcript_handle}' "
+            f"({len(action_steps)} steps, read it with the artifact_reader_tool if needed)."
+        )
+    footer.append("</run_summary>")
+
+    def assemble() -> str:
+        lines = [header, answer]
+        if evidence:
+            lines += ["Key evidence:", *evidence]
+        if sources:
+            lines += ["Sources:", *sources]
+        return "\n".join(lines + footer)
+
+    summary = assemble()
+    # Drop the oldest evidence first, then the last sources, to fit the cap
+    while len(summary) > max_chars and (evidence or sources):
+        if evidence:
+            evidence.pop(0)
+        else:
+            sources.pop()
+        summary = assemble()
+    return summary
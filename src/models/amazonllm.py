@@ -1,5 +1,6 @@
 from typing import Any
 
+from src.logger import model_ledger
 from src.models.base import ApiModel, ChatMessage, MessageRole, TokenUsage
 
 
@@ -153,32 +154,35 @@ class AmazonBedrockServerModel(ApiModel):
             tools_to_call_from: list[Any] | None = None,
             **kwargs,
     ) -> ChatMessage:
-        if response_format is not None:
-            raise ValueError("Amazon Bedrock does not support response_format")
-        completion_kwargs: dict = self._prepare_completion_kwargs(
-            messages=messages,
-            tools_to_call_from=tools_to_call_from,
-            custom_role_conversions=self.custom_role_conversions,
-            convert_images_to_image_urls=True,
-            **kwargs,
-        )
-
-        # self.client is created in ApiModel class
-        response = self.client.converse(**completion_kwargs)
-
-        # Get first message
-        response["output"]["message"]["content"] = response["output"]["message"]["content"][0]["text"]
-
-        self._last_input_token_count = response["usage"]["inputTokens"]
-        self._last_output_token_count = response["usage"]["outputTokens"]
-        return ChatMessage.from_dict(
-            response["output"]["message"],
-            raw=response,
-            token_usage=TokenUsage(
-                input_tokens=response["usage"]["inputTokens"],
-                output_tokens=response["usage"]["outputTokens"],
-            ),
-        )
+        with model_ledger.track(self.model_id) as call:
+            if response_format is not None:
+                raise ValueError("Amazon Bedrock does not support response_format")
+            completion_kwargs: dict = self._prepare_completion_kwargs(
+                messages=messages,
+                tools_to_call_from=tools_to_call_from,
+                custom_role_conversions=self.custom_role_conversions,
+                convert_images_to_image_urls=True,
+                **kwargs,
+            )
+
+            # self.client is created in ApiModel class
+            call.mark_dispatched()
+            response = self.client.converse(**completion_kwargs)
+
+            # Get first message
+            response["output"]["message"]["content"] = response["output"]["message"]["content"][0]["text"]
+
+            self._last_input_token_count = response["usage"]["inputTokens"]
+            self._last_output_token_count = response["usage"]["outputTokens"]
+            call.set_usage(response["usage"]["inputTokens"], response["usage"]["outputTokens"])
+            return ChatMessage.from_dict(
+                response["output"]["message"],
+                raw=response,
+                token_usage=TokenUsage(
+                    input_tokens=response["usage"]["inputTokens"],
+                    output_tokens=response["usage"]["outputTokens"],
+                ),
+            )
 
     async def __call__(self, *args, **kwargs) -> ChatMessage:
         """
@@ -17,16 +17,17 @@ import os
 import re
 import uuid
 import warnings
+from collections import OrderedDict
 from collections.abc import Generator
 from copy import deepcopy
 from dataclasses import asdict, dataclass
 from enum import Enum
-from threading import Thread
+from threading import Lock, Thread
 from typing import TYPE_CHECKING, Any
 
 import json5
 
-from src.logger import TokenUsage
+from src.logger import TokenUsage, model_ledger
 from src.utils import (
     _is_package_available,
     encode_image_base64,
@@ -358,6 +359,16 @@ def get_tool_call_from_text(text: str, tool_name_key: str, tool_arguments_key: s
     )
 
 
+def longest_common_prefix_length(first: list[int], second: list[int]) -> int:
+    """Return the number of leading tokens shared by two token id sequences."""
+    length = 0
+    for first_id, second_id in zip(first, second):
+        if first_id != second_id:
+            break
+        length += 1
+    return length
+
+
 def supports_stop_parameter(model_id: str) -> bool:
     """
     Check if the model supports the `stop` parameter.
@@ -781,6 +792,16 @@ class TransformersModel(Model):
             The torch_dtype to initialize your model with.
         trust_remote_code (bool, default `False`):
             Some models on the Hub require running remote code: for this model, you would have to set this flag to True.
+        prefix_cache (bool, default `False`):
+            Whether to keep the past-key-values cache between calls and only encode the token suffix that differs from
+            the previous prompt. Agent steps share the system prompt and all earlier steps, so this avoids re-encoding
+            the whole history on every step. A cache is kept per caller (the agent making the call, see
+            `model_ledger.caller`), so agents sharing the model do not evict each other's prefix. Only used for
+            text-only models.
+        prefix_cache_max_tokens (`int`, default `32768`):
+            Maximum number of tokens kept in a prefix cache. Longer caches are dropped after the call.
+        prefix_cache_size (`int`, default `8`):
+            Maximum number of callers whose prefix cache is kept, the least recently used one is dropped first.
         kwargs (dict, *optional*):
             Any additional keyword arguments that you want to use in model.generate(), for instance `max_new_tokens` or `device`.
         **kwargs:
@@ -809,6 +830,9 @@ class TransformersModel(Model):
         device_map: str | None = None,
         torch_dtype: str | None = None,
         trust_remote_code: bool = False,
+        prefix_cache: bool = False,
+        prefix_cache_max_tokens: int = 32768,
+        prefix_cache_size: int = 8,
         **kwargs,
     ):
         try:
@@ -871,8 +895,72 @@ class TransformersModel(Model):
                 raise e
         except Exception as e:
             raise ValueError(f"Failed to load tokenizer and model for {model_id=}: {e}") from e
+
+        # Prefix caches by caller, least recently used first: the cache object and the token ids whose keys/values
+        # it currently holds
+        self.prefix_cache = prefix_cache and not self._is_vlm
+        self.prefix_cache_max_tokens = prefix_cache_max_tokens
+        self.prefix_cache_size = prefix_cache_size
+        self._prefix_caches: OrderedDict[str, tuple[Any, list[int]]] = OrderedDict()
+        self._prefix_caches_lock = Lock()
+        self.prefix_cache_hit_tokens = 0
         super().__init__(flatten_messages_as_text=not self._is_vlm, model_id=model_id, **kwargs)
 
+    def reset_prefix_cache(self, caller: str | None = None):
+        """Drop the cached past-key-values of `caller`, or of every caller, e.g. after changing generation settings
+        or freeing memory."""
+        with self._prefix_caches_lock:
+            if caller is None:
+                self._prefix_caches.clear()
+            else:
+                self._prefix_caches.pop(caller, None)
+
+    def _new_prefix_cache(self) -> Any:
+        from transformers import DynamicCache
+
+        return DynamicCache()
+
+    def _attach_prefix_cache(self, generation_kwargs: dict[str, Any]) -> tuple[str, int]:
+        """Reuse the cached past-key-values of the current caller for the longest common token prefix with the new
+        prompt.
+
+        The cache is cropped to the shared prefix, so `model.generate()` only encodes the remaining suffix.
+        At least one prompt token is always left uncached, as generation needs it to produce the next logits.
+        The cache is taken out of the prefix caches for the duration of the call: it is only put back by
+        `_update_prefix_cache` once generation succeeded, so a failed generation never leaves a half-written cache.
+
+        Returns:
+            `tuple[str, int]`: The caller, and the number of prompt tokens served from the cache.
+        """
+        caller = model_ledger.current_caller()
+        with self._prefix_caches_lock:
+            cache, cache_ids = self._prefix_caches.pop(caller, (None, []))
+        prompt_ids = generation_kwargs["inputs"][0].tolist()
+        reused = min(longest_common_prefix_length(cache_ids, prompt_ids), len(prompt_ids) - 1)
+        if cache is None or reused <= 0:
+            cache = self._new_prefix_cache()
+            reused = 0
+        else:
+            cache.crop(reused)
+        self.prefix_cache_hit_tokens = reused
+        generation_kwargs["past_key_values"] = cache
+        return caller, reused
+
+    def _update_prefix_cache(self, caller: str, cache: Any, sequence_ids: list[int]):
+        """Put the cache of `caller` back after generation with the tokens it now holds, dropping it if it grew past
+        the bound, and the least recently used caches beyond `prefix_cache_size`."""
+        cached_length = cache.get_seq_length()
+        if cached_length > self.prefix_cache_max_tokens:
+            logger.info(
+                f"Prefix cache holds {cached_length} tokens, more than {self.prefix_cache_max_tokens}: dropping it."
+            )
+            return
+        with self._prefix_caches_lock:
+            self._prefix_caches[caller] = (cache, sequence_ids[:cached_length])
+            self._prefix_caches.move_to_end(caller)
+            while len(self._prefix_caches) > self.prefix_cache_size:
+                self._prefix_caches.popitem(last=False)
+
     def make_stopping_criteria(self, stop_sequences: list[str], tokenizer) -> "StoppingCriteriaList":
         from transformers import StoppingCriteria, StoppingCriteriaList
 
@@ -950,41 +1038,53 @@ class TransformersModel(Model):
         tools_to_call_from: list[Any] | None = None,
         **kwargs,
     ) -> ChatMessage:
-        if response_format is not None:
-            raise ValueError("Transformers does not support structured outputs, use VLLMModel for this.")
-        generation_kwargs = self._prepare_completion_args(
-            messages=messages,
-            stop_sequences=stop_sequences,
-            tools_to_call_from=tools_to_call_from,
-            **kwargs,
-        )
-        count_prompt_tokens = generation_kwargs["inputs"].shape[1]  # type: ignore
-        out = self.model.generate(
-            **generation_kwargs,
-        )
-        generated_tokens = out[0, count_prompt_tokens:]
-        if hasattr(self, "processor"):
-            output_text = self.processor.decode(generated_tokens, skip_special_tokens=True)
-        else:
-            output_text = self.tokenizer.decode(generated_tokens, skip_special_tokens=True)
+        with model_ledger.track(self.model_id) as call:
+            if response_format is not None:
+                raise ValueError("Transformers does not support structured outputs, use VLLMModel for this.")
+            generation_kwargs = self._prepare_completion_args(
+                messages=messages,
+                stop_sequences=stop_sequences,
+                tools_to_call_from=tools_to_call_from,
+                **kwargs,
+            )
+            count_prompt_tokens = generation_kwargs["inputs"].shape[1]  # type: ignore
+            if self.prefix_cache:
+                cache_caller, call.cached_tokens = self._attach_prefix_cache(generation_kwargs)
+            call.mark_dispatched()
+            # A failed generation may leave the cache partially updated: it is not put back, so never reused
+            out = self.model.generate(
+                **generation_kwargs,
+            )
+            if self.prefix_cache:
+                self._update_prefix_cache(cache_caller, generation_kwargs["past_key_values"], out[0].tolist())
+            generated_tokens = out[0, count_prompt_tokens:]
+            if hasattr(self, "processor"):
+                output_text = self.processor.decode(generated_tokens, skip_special_tokens=True)
+            else:
+                output_text = self.tokenizer.decode(generated_tokens, skip_special_tokens=True)
 
-        if stop_sequences is not None:
-            output_text = remove_stop_sequences(output_text, stop_sequences)
+            if stop_sequences is not None:
+                output_text = remove_stop_sequences(output_text, stop_sequences)
 
-        self._last_input_token_count = count_prompt_tokens
-        self._last_output_token_count = len(generated_tokens)
-        return ChatMessage(
-            role=MessageRole.ASSISTANT,
-            content=output_text,
-            raw={
-                "out": output_text,
-                "completion_kwargs": {key: value for key, value in generation_kwargs.items() if key != "inputs"},
-            },
-            token_usage=TokenUsage(
-                input_tokens=count_prompt_tokens,
-                output_tokens=len(generated_tokens),
-            ),
-        )
+            self._last_input_token_count = count_prompt_tokens
+            self._last_output_token_count = len(generated_tokens)
+            call.set_usage(count_prompt_tokens, len(generated_tokens), call.cached_tokens)
+            return ChatMessage(
+                role=MessageRole.ASSISTANT,
+                content=output_text,
+                raw={
+                    "out": output_text,
+                    "completion_kwargs": {
+                        key: value
+                        for key, value in generation_kwargs.items()
+                        if key not in ("inputs", "past_key_values")
+                    },
+                },
+                token_usage=TokenUsage(
+                    input_tokens=count_prompt_tokens,
+                    output_tokens=len(generated_tokens),
+                ),
+            )
 
     def generate_stream(
         self,
@@ -1004,8 +1104,23 @@ class TransformersModel(Model):
             **kwargs,
         )
         count_prompt_tokens = generation_kwargs["inputs"].shape[1]  # type: ignore
-
-        thread = Thread(target=self.model.generate, kwargs={"streamer": self.streamer, **generation_kwargs})
+        if self.prefix_cache:
+            # The streamer only yields text, so the generated ids are not known after the run: only the prompt
+            # prefix of the cache can be trusted for the next call.
+            cache_caller, _ = self._attach_prefix_cache(generation_kwargs)
+            prompt_ids = generation_kwargs["inputs"][0].tolist()
+
+        errors = []
+
+        def generate():
+            try:
+                self.model.generate(streamer=self.streamer, **generation_kwargs)
+            except Exception as e:
+                errors.append(e)
+                # Without its end, the streamer would wait for more text forever
+                self.streamer.end()
+
+        thread = Thread(target=generate)
         thread.start()
 
         # Generate with streaming
@@ -1018,6 +1133,13 @@ class TransformersModel(Model):
                 token_usage=TokenUsage(input_tokens=count_prompt_tokens, output_tokens=1),
             )
         thread.join()
+        if errors:
+            # The cache of a failed generation may be half written: it is not put back, so never reused
+            raise errors[0]
+        if self.prefix_cache:
+            cache = generation_kwargs["past_key_values"]
+            cache.crop(len(prompt_ids))
+            self._update_prefix_cache(cache_caller, cache, prompt_ids)
 
 
 class ApiModel(Model):
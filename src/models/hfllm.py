@@ -3,6 +3,7 @@ from collections.abc import Generator
 from dataclasses import asdict
 from typing import Any
 
+from src.logger import get_cached_tokens, model_ledger
 from src.models.base import (
     ApiModel,
     ChatMessage,
@@ -186,50 +187,54 @@ class InferenceClientModel(ApiModel):
         tools_to_call_from: list[Any] | None = None,
         **kwargs,
     ) -> Generator[ChatMessageStreamDelta]:
-        completion_kwargs = self._prepare_completion_kwargs(
-            messages=messages,
-            stop_sequences=stop_sequences,
-            response_format=response_format,
-            tools_to_call_from=tools_to_call_from,
-            model=self.model_id,
-            custom_role_conversions=self.custom_role_conversions,
-            http_client=self.http_client,
-            convert_images_to_image_urls=True,
-            **kwargs,
-        )
-        for event in self.client.chat.completions.create(
-            **completion_kwargs, stream=True, stream_options={"include_usage": True}
-        ):
-            if getattr(event, "usage", None):
-                self._last_input_token_count = event.usage.prompt_tokens
-                self._last_output_token_count = event.usage.completion_tokens
-                yield ChatMessageStreamDelta(
-                    content="",
-                    token_usage=TokenUsage(
-                        input_tokens=event.usage.prompt_tokens,
-                        output_tokens=event.usage.completion_tokens,
-                    ),
-                )
-            if event.choices:
-                choice = event.choices[0]
-                if choice.delta:
+        with model_ledger.track(self.model_id, streamed=True) as call:
+            completion_kwargs = self._prepare_completion_kwargs(
+                messages=messages,
+                stop_sequences=stop_sequences,
+                response_format=response_format,
+                tools_to_call_from=tools_to_call_from,
+                model=self.model_id,
+                custom_role_conversions=self.custom_role_conversions,
+                http_client=self.http_client,
+                convert_images_to_image_urls=True,
+                **kwargs,
+            )
+            call.mark_dispatched()
+            for event in self.client.chat.completions.create(
+                **completion_kwargs, stream=True, stream_options={"include_usage": True}
+            ):
+                if getattr(event, "usage", None):
+                    self._last_input_token_count = event.usage.prompt_tokens
+                    self._last_output_token_count = event.usage.completion_tokens
+                    call.set_usage(event.usage.prompt_tokens, event.usage.completion_tokens, get_cached_tokens(event.usage))
                     yield ChatMessageStreamDelta(
-                        content=choice.delta.content,
-                        tool_calls=[
-                            ChatMessageToolCallStreamDelta(
-                                index=delta.index,
-                                id=delta.id,
-                                type=delta.type,
-                                function=delta.function,
-                            )
-                            for delta in choice.delta.tool_calls
-                        ]
-                        if choice.delta.tool_calls
-                        else None,
+                        content="",
+                        token_usage=TokenUsage(
+                            input_tokens=event.usage.prompt_tokens,
+                            output_tokens=event.usage.completion_tokens,
+                        ),
                     )
-                else:
-                    if not getattr(choice, "finish_reason", None):
-                        raise ValueError(f"No content or tool calls in event: {event}")
+                if event.choices:
+                    choice = event.choices[0]
+                    if choice.delta:
+                        call.mark_first_token()
+                        yield ChatMessageStreamDelta(
+                            content=choice.delta.content,
+                            tool_calls=[
+                                ChatMessageToolCallStreamDelta(
+                                    index=delta.index,
+                                    id=delta.id,
+                                    type=delta.type,
+                                    function=delta.function,
+                                )
+                                for delta in choice.delta.tool_calls
+                            ]
+                            if choice.delta.tool_calls
+                            else None,
+                        )
+                    else:
+                        if not getattr(choice, "finish_reason", None):
+                            raise ValueError(f"No content or tool calls in event: {event}")
 
     async def generate(
         self,
@@ -239,33 +244,36 @@ class InferenceClientModel(ApiModel):
         tools_to_call_from: list[Any] | None = None,
         **kwargs,
     ) -> ChatMessage:
-        if response_format is not None and self.client_kwargs["provider"] not in STRUCTURED_GENERATION_PROVIDERS:
-            raise ValueError(
-                "InferenceClientModel only supports structured outputs with these providers:"
-                + ", ".join(STRUCTURED_GENERATION_PROVIDERS)
+        with model_ledger.track(self.model_id) as call:
+            if response_format is not None and self.client_kwargs["provider"] not in STRUCTURED_GENERATION_PROVIDERS:
+                raise ValueError(
+                    "InferenceClientModel only supports structured outputs with these providers:"
+                    + ", ".join(STRUCTURED_GENERATION_PROVIDERS)
+                )
+            completion_kwargs = self._prepare_completion_kwargs(
+                messages=messages,
+                stop_sequences=stop_sequences,
+                tools_to_call_from=tools_to_call_from,
+                # response_format=response_format,
+                convert_images_to_image_urls=True,
+                http_client=self.http_client,
+                custom_role_conversions=self.custom_role_conversions,
+                **kwargs,
             )
-        completion_kwargs = self._prepare_completion_kwargs(
-            messages=messages,
-            stop_sequences=stop_sequences,
-            tools_to_call_from=tools_to_call_from,
-            # response_format=response_format,
-            convert_images_to_image_urls=True,
-            http_client=self.http_client,
-            custom_role_conversions=self.custom_role_conversions,
-            **kwargs,
-        )
-        response = self.client.chat_completion(**completion_kwargs)
+            call.mark_dispatched()
+            response = self.client.chat_completion(**completion_kwargs)
 
-        self._last_input_token_count = response.usage.prompt_tokens
-        self._last_output_token_count = response.usage.completion_tokens
-        return ChatMessage.from_dict(
-            asdict(response.choices[0].message),
-            raw=response,
-            token_usage=TokenUsage(
-                input_tokens=response.usage.prompt_tokens,
-                output_tokens=response.usage.completion_tokens,
-            ),
-        )
+            self._last_input_token_count = response.usage.prompt_tokens
+            self._last_output_token_count = response.usage.completion_tokens
+            call.set_usage(response.usage.prompt_tokens, response.usage.completion_tokens, get_cached_tokens(response.usage))
+            return ChatMessage.from_dict(
+                asdict(response.choices[0].message),
+                raw=response,
+                token_usage=TokenUsage(
+                    input_tokens=response.usage.prompt_tokens,
+                    output_tokens=response.usage.completion_tokens,
+                ),
+            )
 
     async def __call__(self, *args, **kwargs) -> ChatMessage:
         """
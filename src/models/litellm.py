@@ -2,6 +2,7 @@ import warnings
 from collections.abc import Generator
 from typing import Any
 
+from src.logger import get_cached_tokens, model_ledger
 from src.models.base import (
     ApiModel,
     ChatMessage,
@@ -11,6 +12,7 @@ from src.models.base import (
     tool_role_conversions,
 )
 from src.models.message_manager import MessageManager
+from src.utils import remaining_time
 
 
 class LiteLLMModel(ApiModel):
@@ -131,6 +133,11 @@ class LiteLLMModel(ApiModel):
                 tools_config["tool_choice"] = tool_choice
             completion_kwargs.update(tools_config)
 
+        # Bound the request by the deadline of the run, if any
+        timeout = remaining_time()
+        if timeout is not None:
+            completion_kwargs["timeout"] = max(timeout, 1.0)
+
         # Finally, use the passed-in kwargs to override all settings
         completion_kwargs.update(kwargs)
 
@@ -149,51 +156,55 @@ class LiteLLMModel(ApiModel):
                         **kwargs,
                         )-> Generator[ChatMessageStreamDelta]:
 
-        completion_kwargs = self._prepare_completion_kwargs(
-            messages=messages,
-            stop_sequences=stop_sequences,
-            response_format=response_format,
-            tools_to_call_from=tools_to_call_from,
-            model=self.model_id,
-            api_base=self.api_base,
-            api_key=self.api_key,
-            http_client=self.http_client,
-            custom_role_conversions=self.custom_role_conversions,
-            convert_images_to_image_urls=True,
-            **kwargs,
-        )
+        with model_ledger.track(self.model_id, streamed=True) as call:
+            completion_kwargs = self._prepare_completion_kwargs(
+                messages=messages,
+                stop_sequences=stop_sequences,
+                response_format=response_format,
+                tools_to_call_from=tools_to_call_from,
+                model=self.model_id,
+                api_base=self.api_base,
+                api_key=self.api_key,
+                http_client=self.http_client,
+                custom_role_conversions=self.custom_role_conversions,
+                convert_images_to_image_urls=True,
+                **kwargs,
+            )
 
-        for event in self.client.completion(**completion_kwargs, stream=True, stream_options={"include_usage": True}):
-            if getattr(event, "usage", None):
-                self._last_input_token_count = event.usage.prompt_tokens
-                self._last_output_token_count = event.usage.completion_tokens
-                yield ChatMessageStreamDelta(
-                    content="",
-                    token_usage=TokenUsage(
-                        input_tokens=event.usage.prompt_tokens,
-                        output_tokens=event.usage.completion_tokens,
-                    ),
-                )
-            if event.choices:
-                choice = event.choices[0]
-                if choice.delta:
+            call.mark_dispatched()
+            for event in self.client.completion(**completion_kwargs, stream=True, stream_options={"include_usage": True}):
+                if getattr(event, "usage", None):
+                    self._last_input_token_count = event.usage.prompt_tokens
+                    self._last_output_token_count = event.usage.completion_tokens
+                    call.set_usage(event.usage.prompt_tokens, event.usage.completion_tokens, get_cached_tokens(event.usage))
                     yield ChatMessageStreamDelta(
-                        content=choice.delta.content,
-                        tool_calls=[
-                            ChatMessageToolCallStreamDelta(
-                                index=delta.index,
-                                id=delta.id,
-                                type=delta.type,
-                                function=delta.function,
-                            )
-                            for delta in choice.delta.tool_calls
-                        ]
-                        if choice.delta.tool_calls
-                        else None,
+                        content="",
+                        token_usage=TokenUsage(
+                            input_tokens=event.usage.prompt_tokens,
+                            output_tokens=event.usage.completion_tokens,
+                        ),
                     )
-                else:
-                    if not getattr(choice, "finish_reason", None):
-                        raise ValueError(f"No content or tool calls in event: {event}")
+                if event.choices:
+                    choice = event.choices[0]
+                    if choice.delta:
+                        call.mark_first_token()
+                        yield ChatMessageStreamDelta(
+                            content=choice.delta.content,
+                            tool_calls=[
+                                ChatMessageToolCallStreamDelta(
+                                    index=delta.index,
+                                    id=delta.id,
+                                    type=delta.type,
+                                    function=delta.function,
+                                )
+                                for delta in choice.delta.tool_calls
+                            ]
+                            if choice.delta.tool_calls
+                            else None,
+                        )
+                    else:
+                        if not getattr(choice, "finish_reason", None):
+                            raise ValueError(f"No content or tool calls in event: {event}")
 
 
     async def generate(
@@ -205,33 +216,36 @@ class LiteLLMModel(ApiModel):
         **kwargs,
     ) -> ChatMessage:
 
-        completion_kwargs = self._prepare_completion_kwargs(
-            messages=messages,
-            stop_sequences=stop_sequences,
-            response_format=response_format,
-            tools_to_call_from=tools_to_call_from,
-            model=self.model_id,
-            api_base=self.api_base,
-            api_key=self.api_key,
-            http_client=self.http_client,
-            convert_images_to_image_urls=True,
-            custom_role_conversions=self.custom_role_conversions,
-            **kwargs,
-        )
+        with model_ledger.track(self.model_id) as call:
+            completion_kwargs = self._prepare_completion_kwargs(
+                messages=messages,
+                stop_sequences=stop_sequences,
+                response_format=response_format,
+                tools_to_call_from=tools_to_call_from,
+                model=self.model_id,
+                api_base=self.api_base,
+                api_key=self.api_key,
+                http_client=self.http_client,
+                convert_images_to_image_urls=True,
+                custom_role_conversions=self.custom_role_conversions,
+                **kwargs,
+            )
 
-        # Async call to the LiteLLM client for completion
-        response = await self.client.acompletion(**completion_kwargs)
-
-        self._last_input_token_count = response.usage.prompt_tokens
-        self._last_output_token_count = response.usage.completion_tokens
-        return ChatMessage.from_dict(
-            response.choices[0].message.model_dump(include={"role", "content", "tool_calls"}),
-            raw=response,
-            token_usage=TokenUsage(
-                input_tokens=response.usage.prompt_tokens,
-                output_tokens=response.usage.completion_tokens,
-            ),
-        )
+            # Async call to the LiteLLM client for completion
+            call.mark_dispatched()
+            response = await self.client.acompletion(**completion_kwargs)
+
+            self._last_input_token_count = response.usage.prompt_tokens
+            self._last_output_token_count = response.usage.completion_tokens
+            call.set_usage(response.usage.prompt_tokens, response.usage.completion_tokens, get_cached_tokens(response.usage))
+            return ChatMessage.from_dict(
+                response.choices[0].message.model_dump(include={"role", "content", "tool_calls"}),
+                raw=response,
+                token_usage=TokenUsage(
+                    input_tokens=response.usage.prompt_tokens,
+                    output_tokens=response.usage.completion_tokens,
+                ),
+            )
 
     async def __call__(self, *args, **kwargs) -> ChatMessage:
         """
@@ -7,7 +7,7 @@ import requests
 from openai.types.chat import ChatCompletion
 from PIL import Image
 
-from src.logger import TokenUsage, logger
+from src.logger import TokenUsage, get_cached_tokens, logger, model_ledger
 from src.models.base import (
     ApiModel,
     ChatMessage,
@@ -415,48 +415,52 @@ class RestfulModel(ApiModel):
                         **kwargs,
                         )-> Generator[ChatMessageStreamDelta]:
 
-        completion_kwargs = self._prepare_completion_kwargs(
-            messages=messages,
-            stop_sequences=stop_sequences,
-            response_format=response_format,
-            tools_to_call_from=tools_to_call_from,
-            model=self.model_id,
-            custom_role_conversions=self.custom_role_conversions,
-            convert_images_to_image_urls=True,
-            **kwargs,
-        )
-
-        for event in self.client.completion(**completion_kwargs, stream=True, stream_options={"include_usage": True}):
-            if getattr(event, "usage", None):
-                self._last_input_token_count = event.usage.prompt_tokens
-                self._last_output_token_count = event.usage.completion_tokens
-                yield ChatMessageStreamDelta(
-                    content="",
-                    token_usage=TokenUsage(
-                        input_tokens=event.usage.prompt_tokens,
-                        output_tokens=event.usage.completion_tokens,
-                    ),
-                )
-            if event.choices:
-                choice = event.choices[0]
-                if choice.delta:
+        with model_ledger.track(self.model_id, streamed=True) as call:
+            completion_kwargs = self._prepare_completion_kwargs(
+                messages=messages,
+                stop_sequences=stop_sequences,
+                response_format=response_format,
+                tools_to_call_from=tools_to_call_from,
+                model=self.model_id,
+                custom_role_conversions=self.custom_role_conversions,
+                convert_images_to_image_urls=True,
+                **kwargs,
+            )
+
+            call.mark_dispatched()
+            for event in self.client.completion(**completion_kwargs, stream=True, stream_options={"include_usage": True}):
+                if getattr(event, "usage", None):
+                    self._last_input_token_count = event.usage.prompt_tokens
+                    self._last_output_token_count = event.usage.completion_tokens
+                    call.set_usage(event.usage.prompt_tokens, event.usage.completion_tokens, get_cached_tokens(event.usage))
                     yield ChatMessageStreamDelta(
-                        content=choice.delta.content,
-                        tool_calls=[
-                            ChatMessageToolCallStreamDelta(
-                                index=delta.index,
-                                id=delta.id,
-                                type=delta.type,
-                                function=delta.function,
-                            )
-                            for delta in choice.delta.tool_calls
-                        ]
-                        if choice.delta.tool_calls
-                        else None,
+                        content="",
+                        token_usage=TokenUsage(
+                            input_tokens=event.usage.prompt_tokens,
+                            output_tokens=event.usage.completion_tokens,
+                        ),
                     )
-                else:
-                    if not getattr(choice, "finish_reason", None):
-                        raise ValueError(f"No content or tool calls in event: {event}")
+                if event.choices:
+                    choice = event.choices[0]
+                    if choice.delta:
+                        call.mark_first_token()
+                        yield ChatMessageStreamDelta(
+                            content=choice.delta.content,
+                            tool_calls=[
+                                ChatMessageToolCallStreamDelta(
+                                    index=delta.index,
+                                    id=delta.id,
+                                    type=delta.type,
+                                    function=delta.function,
+                                )
+                                for delta in choice.delta.tool_calls
+                            ]
+                            if choice.delta.tool_calls
+                            else None,
+                        )
+                    else:
+                        if not getattr(choice, "finish_reason", None):
+                            raise ValueError(f"No content or tool calls in event: {event}")
 
 
     async def generate(
@@ -468,32 +472,35 @@ class RestfulModel(ApiModel):
         **kwargs,
     ) -> ChatMessage:
 
-        completion_kwargs = self._prepare_completion_kwargs(
-            messages=messages,
-            stop_sequences=stop_sequences,
-            response_format=response_format,
-            tools_to_call_from=tools_to_call_from,
-            model=self.model_id,
-            convert_images_to_image_urls=True,
-            custom_role_conversions=self.custom_role_conversions,
-            **kwargs,
-        )
-
-        # Async call to the LiteLLM client for completion
-        response = self.client.completion(**completion_kwargs)
-
-        response = ChatCompletion.model_validate(response)
-
-        self._last_input_token_count = response.usage.prompt_tokens
-        self._last_output_token_count = response.usage.completion_tokens
-        return ChatMessage.from_dict(
-            response.choices[0].message.model_dump(include={"role", "content", "tool_calls"}),
-            raw=response,
-            token_usage=TokenUsage(
-                input_tokens=response.usage.prompt_tokens,
-                output_tokens=response.usage.completion_tokens,
-            ),
-        )
+        with model_ledger.track(self.model_id) as call:
+            completion_kwargs = self._prepare_completion_kwargs(
+                messages=messages,
+                stop_sequences=stop_sequences,
+                response_format=response_format,
+                tools_to_call_from=tools_to_call_from,
+                model=self.model_id,
+                convert_images_to_image_urls=True,
+                custom_role_conversions=self.custom_role_conversions,
+                **kwargs,
+            )
+
+            # Async call to the LiteLLM client for completion
+            call.mark_dispatched()
+            response = self.client.completion(**completion_kwargs)
+
+            response = ChatCompletion.model_validate(response)
+
+            self._last_input_token_count = response.usage.prompt_tokens
+            self._last_output_token_count = response.usage.completion_tokens
+            call.set_usage(response.usage.prompt_tokens, response.usage.completion_tokens, get_cached_tokens(response.usage))
+            return ChatMessage.from_dict(
+                response.choices[0].message.model_dump(include={"role", "content", "tool_calls"}),
+                raw=response,
+                token_usage=TokenUsage(
+                    input_tokens=response.usage.prompt_tokens,
+                    output_tokens=response.usage.completion_tokens,
+                ),
+            )
 
     async def __call__(self, *args, **kwargs) -> ChatMessage:
         """
@@ -923,48 +930,52 @@ class RestfulResponseModel(ApiModel):
                         **kwargs,
                         )-> Generator[ChatMessageStreamDelta]:
 
-        completion_kwargs = self._prepare_completion_kwargs(
-            messages=messages,
-            stop_sequences=stop_sequences,
-            response_format=response_format,
-            tools_to_call_from=tools_to_call_from,
-            model=self.model_id,
-            custom_role_conversions=self.custom_role_conversions,
-            convert_images_to_image_urls=True,
-            **kwargs,
-        )
-
-        for event in self.client.completion(**completion_kwargs, stream=True, stream_options={"include_usage": True}):
-            if getattr(event, "usage", None):
-                self._last_input_token_count = event.usage.prompt_tokens
-                self._last_output_token_count = event.usage.completion_tokens
-                yield ChatMessageStreamDelta(
-                    content="",
-                    token_usage=TokenUsage(
-                        input_tokens=event.usage.prompt_tokens,
-                        output_tokens=event.usage.completion_tokens,
-                    ),
-                )
-            if event.choices:
-                choice = event.choices[0]
-                if choice.delta:
+        with model_ledger.track(self.model_id, streamed=True) as call:
+            completion_kwargs = self._prepare_completion_kwargs(
+                messages=messages,
+                stop_sequences=stop_sequences,
+                response_format=response_format,
+                tools_to_call_from=tools_to_call_from,
+                model=self.model_id,
+                custom_role_conversions=self.custom_role_conversions,
+                convert_images_to_image_urls=True,
+                **kwargs,
+            )
+
+            call.mark_dispatched()
+            for event in self.client.completion(**completion_kwargs, stream=True, stream_options={"include_usage": True}):
+                if getattr(event, "usage", None):
+                    self._last_input_token_count = event.usage.prompt_tokens
+                    self._last_output_token_count = event.usage.completion_tokens
+                    call.set_usage(event.usage.prompt_tokens, event.usage.completion_tokens, get_cached_tokens(event.usage))
                     yield ChatMessageStreamDelta(
-                        content=choice.delta.content,
-                        tool_calls=[
-                            ChatMessageToolCallStreamDelta(
-                                index=delta.index,
-                                id=delta.id,
-                                type=delta.type,
-                                function=delta.function,
-                            )
-                            for delta in choice.delta.tool_calls
-                        ]
-                        if choice.delta.tool_calls
-                        else None,
+                        content="",
+                        token_usage=TokenUsage(
+                            input_tokens=event.usage.prompt_tokens,
+                            output_tokens=event.usage.completion_tokens,
+                        ),
                     )
-                else:
-                    if not getattr(choice, "finish_reason", None):
-                        raise ValueError(f"No content or tool calls in event: {event}")
+                if event.choices:
+                    choice = event.choices[0]
+                    if choice.delta:
+                        call.mark_first_token()
+                        yield ChatMessageStreamDelta(
+                            content=choice.delta.content,
+                            tool_calls=[
+                                ChatMessageToolCallStreamDelta(
+                                    index=delta.index,
+                                    id=delta.id,
+                                    type=delta.type,
+                                    function=delta.function,
+                                )
+                                for delta in choice.delta.tool_calls
+                            ]
+                            if choice.delta.tool_calls
+                            else None,
+                        )
+                    else:
+                        if not getattr(choice, "finish_reason", None):
+                            raise ValueError(f"No content or tool calls in event: {event}")
 
 
     async def generate(
@@ -976,35 +987,38 @@ class RestfulResponseModel(ApiModel):
         **kwargs,
     ) -> ChatMessage:
 
-        completion_kwargs = self._prepare_completion_kwargs(
-            messages=messages,
-            stop_sequences=stop_sequences,
-            response_format=response_format,
-            tools_to_call_from=tools_to_call_from,
-            model=self.model_id,
-            convert_images_to_image_urls=True,
-            custom_role_conversions=self.custom_role_conversions,
-            **kwargs,
-        )
-
-        # Async call to the LiteLLM client for completion
-        response = self.client.completion(**completion_kwargs)
-
-        self._last_input_token_count = response["usage"]["input_tokens"]
-        self._last_output_token_count = response["usage"]["output_tokens"]
-
-        res_dict = response["output"][-1]
-        res_dict['content'] = res_dict['content'][-1]['text']
-        res_dict['tool_calls'] = []
-
-        return ChatMessage.from_dict(
-            res_dict,
-            raw=response,
-            token_usage=TokenUsage(
-                input_tokens=response["usage"]["input_tokens"],
-                output_tokens=response["usage"]["output_tokens"],
-            ),
-        )
+        with model_ledger.track(self.model_id) as call:
+            completion_kwargs = self._prepare_completion_kwargs(
+                messages=messages,
+                stop_sequences=stop_sequences,
+                response_format=response_format,
+                tools_to_call_from=tools_to_call_from,
+                model=self.model_id,
+                convert_images_to_image_urls=True,
+                custom_role_conversions=self.custom_role_conversions,
+                **kwargs,
+            )
+
+            # Async call to the LiteLLM client for completion
+            call.mark_dispatched()
+            response = self.client.completion(**completion_kwargs)
+
+            self._last_input_token_count = response["usage"]["input_tokens"]
+            self._last_output_token_count = response["usage"]["output_tokens"]
+            call.set_usage(response["usage"]["input_tokens"], response["usage"]["output_tokens"])
+
+            res_dict = response["output"][-1]
+            res_dict['content'] = res_dict['content'][-1]['text']
+            res_dict['tool_calls'] = []
+
+            return ChatMessage.from_dict(
+                res_dict,
+                raw=response,
+                token_usage=TokenUsage(
+                    input_tokens=response["usage"]["input_tokens"],
+                    output_tokens=response["usage"]["output_tokens"],
+                ),
+            )
 
     async def __call__(self, *args, **kwargs) -> ChatMessage:
         """
@@ -4,16 +4,23 @@ import os
 import httpx
 from dotenv import load_dotenv
 
+from src.logger import model_ledger
+
 load_dotenv(verbose=True)
 
 PROXY_URL = os.getenv('LOCAL_PROXY_BASE', None)
 
+# Every outgoing request is counted against the active model call, so SDK-level retries show up in the ledger
+HOOKS = {"request": [model_ledger.note_request_attempt]}
+ASYNC_HOOKS = {"request": [model_ledger.anote_request_attempt]}
+
 if PROXY_URL:
-    HTTP_CLIENT = httpx.Client(proxy=PROXY_URL, timeout=httpx.Timeout(600.0, connect=60.0))
-    ASYNC_HTTP_CLIENT = httpx.AsyncClient(proxy=PROXY_URL, timeout=httpx.Timeout(600.0, connect=60.0))
+    HTTP_CLIENT = httpx.Client(proxy=PROXY_URL, timeout=httpx.Timeout(600.0, connect=60.0), event_hooks=HOOKS)
+    ASYNC_HTTP_CLIENT = httpx.AsyncClient(proxy=PROXY_URL, timeout=httpx.Timeout(600.0, connect=60.0),
+                                          event_hooks=ASYNC_HOOKS)
 else:
-    HTTP_CLIENT = httpx.Client()
-    ASYNC_HTTP_CLIENT = httpx.AsyncClient()
+    HTTP_CLIENT = httpx.Client(event_hooks=HOOKS)
+    ASYNC_HTTP_CLIENT = httpx.AsyncClient(event_hooks=ASYNC_HOOKS)
 
 @contextlib.contextmanager
 def proxy_env(proxy_url: str = PROXY_URL):
@@ -1,4 +1,7 @@
+from src.tools.artifact_reader import ArtifactReaderTool
+from src.tools.artifacts import ArtifactStore, artifact_store
 from src.tools.auto_browser import AutoBrowserUseTool
+from src.tools.cache import ManagedAgentMemo, ToolResultCache, tool_result_cache
 from src.tools.deep_analyzer import DeepAnalyzerTool
 from src.tools.deep_researcher import DeepResearcherTool
 from src.tools.file_reader import FileReaderTool
@@ -13,6 +16,12 @@ __all__ = [
     "Tool",
     "ToolResult",
     "AsyncTool",
+    "ToolResultCache",
+    "tool_result_cache",
+    "ManagedAgentMemo",
+    "ArtifactStore",
+    "artifact_store",
+    "ArtifactReaderTool",
     "DeepAnalyzerTool",
     "DeepResearcherTool",
     "PythonInterpreterTool",
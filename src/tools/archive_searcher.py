@@ -26,6 +26,7 @@ class ArchiveSearcherTool(AsyncTool):
         "required": ["url", "date"],
     }
     output_type = "any"
+    cacheable = True
 
     content_fetcher: WebFetcherTool = WebFetcherTool()
 
@@ -0,0 +1,49 @@
+from src.registry import TOOL
+from src.tools.artifacts import artifact_store
+from src.tools.tools import AsyncTool, ToolResult
+
+_ARTIFACT_READER_DESCRIPTION = """Read a large observation that was truncated and stored as an artifact.
+Give the artifact handle and either a `page` number to read that page, or a `pattern` to list the matching lines with their line numbers.
+"""
+
+
+@TOOL.register_module(name="artifact_reader_tool", force=True)
+class ArtifactReaderTool(AsyncTool):
+    name = "artifact_reader_tool"
+    description = _ARTIFACT_READER_DESCRIPTION
+    parameters = {
+        "type": "object",
+        "properties": {
+            "handle": {
+                "type": "string",
+                "description": "The artifact handle, e.g. 'artifact_0123456789abcdef'.",
+            },
+            "page": {
+                "type": "integer",
+                "description": "The page to read, starting at 1. Defaults to 1.",
+                "nullable": True,
+            },
+            "pattern": {
+                "type": "string",
+                "description": "A regular expression to search the artifact for, case-insensitive.",
+                "nullable": True,
+            },
+        },
+        "required": ["handle"],
+        "additionalProperties": False,
+    }
+    output_type = "any"
+
+    def __init__(self, page_size: int = 4000):
+        super().__init__()
+        self.page_size = page_size
+
+    async def forward(self, handle: str, page: int | None = None, pattern: str | None = None) -> ToolResult:
+        try:
+            if pattern:
+                output = artifact_store.grep(handle.strip(), pattern)
+            else:
+                output = artifact_store.page(handle.strip(), page or 1, page_size=self.page_size)
+        except KeyError as e:
+            return ToolResult(output=None, error=e.args[0])
+        return ToolResult(output=output, error=None)
@@ -0,0 +1,91 @@
+import hashlib
+import os
+import re
+import tempfile
+
+# Handles are derived from the content, so that they can never point outside the store
+_HANDLE_PATTERN = re.compile(r"^artifact_[0-9a-f]{16}$")
+
+
+class ArtifactStore:
+    """
+    Local store of large texts, such as oversized tool observations, kept out of the agent memory.
+
+    Each text is written once to `root` under a handle derived from its content. The model only receives a
+    preview and the handle, and reads the rest by pages or by searching it with the `artifact_reader_tool`.
+    """
+
+    def __init__(self, root: str | None = None):
+        self.root = root if root is not None else os.path.join(tempfile.gettempdir(), "artifacts")
+
+    def set_root(self, root: str):
+        self.root = root
+
+    def _path(self, handle: str) -> str:
+        if not _HANDLE_PATTERN.match(handle):
+            raise KeyError(f"Invalid artifact handle: {handle}")
+        return os.path.join(self.root, f"{handle}.txt")
+
+    def put(self, content: str) -> str:
+        """Store `content` and return its handle."""
+        handle = "artifact_" + hashlib.sha256(content.encode()).hexdigest()[:16]
+        path = self._path(handle)
+        if not os.path.exists(path):
+            os.makedirs(self.root, exist_ok=True)
+            # Write to a temporary file first so that readers never see a partial artifact
+            fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        return handle
+
+    def get(self, handle: str) -> str:
+        path = self._path(handle)
+        if not os.path.exists(path):
+            raise KeyError(f"Unknown artifact handle: {handle}")
+        with open(path, encoding="utf-8") as f:
+            return f.read()
+
+    def preview(self, content: str, max_chars: int = 2000) -> str:
+        """Store `content` and return its first `max_chars` characters followed by its handle."""
+        handle = self.put(content)
+        return (
+            f"{content[:max_chars]}\n...\n"
+            f"[Observation truncated: {len(content)} characters in total, stored as artifact '{handle}'. "
+            f"Use the artifact_reader_tool with this handle to read the next pages or search it.]"
+        )
+
+    def page(self, handle: str, page: int = 1, page_size: int = 4000) -> str:
+        """Return page `page` (1-based) of the artifact, `page_size` characters long."""
+        content = self.get(handle)
+        num_pages = max((len(content) + page_size - 1) // page_size, 1)
+        page = min(max(page, 1), num_pages)
+        start = (page - 1) * page_size
+        end = min(start + page_size, len(content))
+        return (
+            f"[Artifact '{handle}', page {page}/{num_pages}, characters {start}-{end} of {len(content)}]\n"
+            f"{content[start:end]}"
+        )
+
+    def grep(self, handle: str, pattern: str, context: int = 1, max_matches: int = 20) -> str:
+        """Return the lines of the artifact matching `pattern` (a regular expression, case-insensitive)."""
+        lines = self.get(handle).splitlines()
+        try:
+            regex = re.compile(pattern, re.IGNORECASE)
+        except re.error:
+            regex = re.compile(re.escape(pattern), re.IGNORECASE)
+
+        matches = [index for index, line in enumerate(lines) if regex.search(line)]
+        if not matches:
+            return f"[Artifact '{handle}': no line matches '{pattern}']"
+
+        blocks = []
+        for index in matches[:max_matches]:
+            start, end = max(index - context, 0), min(index + context + 1, len(lines))
+            blocks.append("\n".join(f"{number + 1}: {lines[number]}" for number in range(start, end)))
+        header = f"[Artifact '{handle}': {len(matches)} matching lines"
+        header += f", showing the first {max_matches}]" if len(matches) > max_matches else "]"
+        return header + "\n" + "\n--\n".join(blocks)
+
+
+artifact_store = ArtifactStore()
@@ -31,6 +31,8 @@ class AutoBrowserUseTool(AsyncTool):
         "required": ["task"],
     }
     output_type = "any"
+    max_concurrency = 2
+    timeout = 900
 
     def __init__(self,
                  model_id: str = "gpt-4.1",
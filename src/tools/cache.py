@@ -0,0 +1,236 @@
+import asyncio
+import contextvars
+import json
+import re
+import time
+from collections import OrderedDict, defaultdict
+from collections.abc import Awaitable, Callable
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from difflib import SequenceMatcher
+from typing import Any
+
+_current_run_cache: contextvars.ContextVar["ToolResultCache | None"] = contextvars.ContextVar(
+    "tool_result_cache", default=None
+)
+
+
+def canonicalize_arguments(arguments: Any) -> str:
+    """Return a stable string for tool arguments: sorted keys and stripped string values."""
+    if isinstance(arguments, str):
+        return arguments.strip()
+
+    def normalize(value):
+        if isinstance(value, dict):
+            return {str(key): normalize(item) for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [normalize(item) for item in value]
+        if isinstance(value, str):
+            return value.strip()
+        return value
+
+    return json.dumps(normalize(arguments), sort_keys=True, ensure_ascii=False, default=str)
+
+
+class ToolResultCache:
+    """
+    Cache of tool results keyed by tool name and canonicalized arguments, for tools that declare `cacheable = True`.
+
+    Entries expire after the tool's `cache_ttl` seconds (never if `None`) and the least recently used entries are
+    evicted beyond `max_entries`. Concurrent identical calls share a single execution.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple[str, str], tuple[Any, float | None]] = OrderedDict()
+        self._in_flight: dict[tuple[str, str], asyncio.Future] = {}
+        self.hits: dict[str, int] = defaultdict(int)
+        self.misses: dict[str, int] = defaultdict(int)
+
+    def clear(self):
+        self._entries.clear()
+        self.hits.clear()
+        self.misses.clear()
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        return {
+            tool_name: {"hits": self.hits[tool_name], "misses": self.misses[tool_name]}
+            for tool_name in sorted(set(self.hits) | set(self.misses))
+        }
+
+    def _lookup(self, key: tuple[str, str]) -> tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        result, expires_at = entry
+        if expires_at is not None and expires_at < time.time():
+            del self._entries[key]
+            return False, None
+        self._entries.move_to_end(key)
+        return True, result
+
+    def _store(self, key: tuple[str, str], result: Any, ttl: float | None):
+        self._entries[key] = (result, time.time() + ttl if ttl is not None else None)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_or_call(
+        self,
+        tool: Any,
+        arguments: Any,
+        call: Callable[[], Awaitable[Any]],
+    ) -> tuple[Any, bool]:
+        """
+        Return the cached result of `tool` for `arguments`, or await `call()` and cache its result if the tool
+        accepts it. Returns the result and whether it was a hit.
+        """
+        key = (tool.name, canonicalize_arguments(arguments))
+        found, result = self._lookup(key)
+        if not found and key in self._in_flight:
+            in_flight = self._in_flight[key]
+            try:
+                found, result = True, await asyncio.shield(in_flight)
+            except asyncio.CancelledError:
+                # Only run the call ourselves if the shared execution was cancelled, not us
+                if not in_flight.cancelled():
+                    raise
+        if found:
+            self.hits[tool.name] += 1
+            return result, True
+
+        self.misses[tool.name] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            result = await call()
+        except Exception as e:
+            future.set_exception(e)
+            # Waiters receive the exception, the future itself does not need to be retrieved
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            if tool.is_cacheable_result(result):
+                self._store(key, result, tool.cache_ttl)
+            return result, False
+        finally:
+            if not future.done():
+                future.cancel()
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+
+    @staticmethod
+    def current() -> "ToolResultCache | None":
+        """Return the cache of the agent run in progress, if any."""
+        return _current_run_cache.get()
+
+    @staticmethod
+    @contextmanager
+    def run_scope():
+        """
+        Provide a fresh per-run cache for the duration of the context, unless an enclosing run (e.g. the parent of
+        a managed agent) already provides one, which is then shared.
+        """
+        if _current_run_cache.get() is not None:
+            yield _current_run_cache.get()
+            return
+        cache = ToolResultCache()
+        token = _current_run_cache.set(cache)
+        try:
+            yield cache
+        finally:
+            _current_run_cache.reset(token)
+
+
+tool_result_cache = ToolResultCache()
+
+
+_current_run_memo: contextvars.ContextVar["ManagedAgentMemo | None"] = contextvars.ContextVar(
+    "managed_agent_memo", default=None
+)
+
+
+def normalize_task(task: str) -> str:
+    """Return `task` lowercased, with collapsed whitespace and without trailing punctuation."""
+    return re.sub(r"\s+", " ", task).strip().rstrip(".!?;:").strip().lower()
+
+
+@dataclass
+class ManagedAgentCall:
+    """A call to a managed agent recorded by the `ManagedAgentMemo`."""
+
+    task: str
+    result: Any
+    completed: bool
+    steps: list = field(default_factory=list)
+    images: Any = None
+
+
+class ManagedAgentMemo:
+    """
+    Memo of the calls to managed agents during a run, keyed by agent name and normalized task.
+
+    A task matching a completed call gets its result back. A task matching a call that ended without an answer
+    (e.g. out of steps) restarts from the memory of that call instead of from scratch. With a
+    `similarity_threshold`, tasks whose normalized forms are at least that similar also match.
+    """
+
+    def __init__(self):
+        self._calls: dict[str, dict[str, ManagedAgentCall]] = defaultdict(dict)
+        self.hits: dict[str, int] = defaultdict(int)
+        self.warm_starts: dict[str, int] = defaultdict(int)
+        self.misses: dict[str, int] = defaultdict(int)
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        return {
+            agent_name: {
+                "hits": self.hits[agent_name],
+                "warm_starts": self.warm_starts[agent_name],
+                "misses": self.misses[agent_name],
+            }
+            for agent_name in sorted(set(self.hits) | set(self.warm_starts) | set(self.misses))
+        }
+
+    def find(
+        self, agent_name: str, task: str, similarity_threshold: float | None = None
+    ) -> tuple[ManagedAgentCall | None, float]:
+        """Return the recorded call of `agent_name` matching `task` best, if any, and its similarity."""
+        calls = self._calls.get(agent_name, {})
+        key = normalize_task(task)
+        if key in calls:
+            return calls[key], 1.0
+        best, best_ratio = None, 0.0
+        if similarity_threshold is not None:
+            for other_key, call in calls.items():
+                matcher = SequenceMatcher(None, key, other_key, autojunk=False)
+                # The quick ratios are upper bounds of the ratio, and much cheaper
+                if matcher.real_quick_ratio() < similarity_threshold or matcher.quick_ratio() < similarity_threshold:
+                    continue
+                ratio = matcher.ratio()
+                if ratio >= similarity_threshold and ratio > best_ratio:
+                    best, best_ratio = call, ratio
+        return best, best_ratio
+
+    def record(self, agent_name: str, call: ManagedAgentCall):
+        """Record `call`, replacing any previous call of `agent_name` with the same normalized task."""
+        self._calls[agent_name][normalize_task(call.task)] = call
+
+    @staticmethod
+    def current() -> "ManagedAgentMemo | None":
+        """Return the memo of the agent run in progress, if any."""
+        return _current_run_memo.get()
+
+    @staticmethod
+    @contextmanager
+    def run_scope():
+        """Provide a fresh per-run memo for the duration of the context, shared with the managed agents."""
+        if _current_run_memo.get() is not None:
+            yield _current_run_memo.get()
+            return
+        memo = ManagedAgentMemo()
+        token = _current_run_memo.set(memo)
+        try:
+            yield memo
+        finally:
+            _current_run_memo.reset(token)
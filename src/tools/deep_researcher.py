@@ -9,6 +9,7 @@ from src.models import ChatMessage, model_manager
 from src.registry import TOOL
 from src.tools.tools import AsyncTool, ToolResult
 from src.tools.web_searcher import SearchResult, WebSearcherTool
+from src.utils import budget
 
 _DEEP_RESEARCHER_DESCRIPTION = """Performs comprehensive research on a topic through multi-level web searches and content analysis. 
 Returns a structured summary of findings with source attribution and relevance ratings."""
@@ -242,6 +243,7 @@ class DeepResearcherTool(AsyncTool):
         "additionalProperties": False,
     }
     output_type = "any"
+    timeout = 1200
 
     def __init__(self,
                  *args,
@@ -272,9 +274,15 @@ class DeepResearcherTool(AsyncTool):
         # Normalize parameters
         max_depth = max(1, min(self.max_depth, 5))
 
+        # Budget the research by the deadline of the run, keeping time for the summary,
+        # and only go one level deep when less than half of the usual time is left
+        time_limit = budget(self.time_limit_seconds, reserve=30)
+        if time_limit < self.time_limit_seconds / 2:
+            max_depth = 1
+
         # Initialize research context and set deadline
         context = ResearchContext(query=query, max_depth=max_depth)
-        deadline = time.time() + self.time_limit_seconds
+        deadline = time.time() + time_limit
 
         try:
             optimized_query, filter_year = await self._generate_optimized_query(query)
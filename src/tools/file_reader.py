@@ -24,6 +24,8 @@ class FileReaderTool(AsyncTool):
         "additionalProperties": False,
     }
     output_type = "any"
+    cacheable = True
+    cache_ttl = 3600
 
     def __init__(self, text_limit: int = 50000):
         super().__init__()
@@ -4,7 +4,12 @@ from dotenv import load_dotenv
 
 load_dotenv(verbose=True)
 
+import hashlib
+import io
 import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
 import os
 
@@ -16,6 +21,8 @@ import pymupdf
 import pdfplumber
 from PIL import Image
 import pillow_heif
+from pydub import AudioSegment
+from pydub.silence import detect_silence
 
 # Register HEIF opener for PIL
 pillow_heif.register_heif_opener()
@@ -31,6 +38,8 @@ def read_tables_from_stream(file_stream):
         tables = camelot.read_pdf(temp_pdf.name, flavor="lattice")
         return tables
 
+NO_TRANSCRIPTION = "No transcription available."
+
 def transcribe_audio(file_stream, audio_format):
 
     if "whisper" in model_manager.registered_models:
@@ -41,12 +50,145 @@ def transcribe_audio(file_stream, audio_format):
         )
     else:
         response = transcription(model="gpt-4o-transcribe", file=file_stream).json()
-        result = response.get("text", "No transcription available.")
+        result = response.get("text", NO_TRANSCRIPTION)
 
     return result
 
+def _format_timestamp(milliseconds: int) -> str:
+    seconds = milliseconds // 1000
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+def _merge_overlap(previous: str, current: str, max_words: int = 50) -> str:
+    """Drop from `current` the leading words (at least two) already transcribed at the end of `previous`."""
+    previous_words = previous.split()
+    current_words = current.split()
+    previous_tail = [word.strip(".,!?;:\"'").lower() for word in previous_words[-max_words:]]
+    current_head = [word.strip(".,!?;:\"'").lower() for word in current_words[:max_words]]
+    for size in range(min(len(previous_tail), len(current_head)), 1, -1):
+        if previous_tail[-size:] == current_head[:size]:
+            return " ".join(current_words[size:])
+    return current
+
 class AudioWhisperConverter:
-    """Custom audio converter using transcription service"""
+    """Custom audio converter using transcription service.
+
+    Files up to `direct_max_bytes` are sent to the transcription service as they are. Longer recordings are decoded
+    and split on silence into overlapping segments which are transcribed concurrently and stitched back together
+    with timestamps. Complete transcripts are cached by the content hash of the audio file, for the last
+    `cache_size` files.
+    """
+
+    cache_size = 128
+    _cache: OrderedDict[str, str] = OrderedDict()
+    _cache_lock = threading.Lock()
+
+    def __init__(self,
+                 direct_max_bytes: int = 5 * 1024 * 1024,
+                 segment_length_ms: int = 5 * 60 * 1000,
+                 overlap_ms: int = 2000,
+                 silence_search_ms: int = 30 * 1000,
+                 min_silence_len_ms: int = 500,
+                 max_workers: int = 4):
+        self.direct_max_bytes = direct_max_bytes
+        self.segment_length_ms = segment_length_ms
+        self.overlap_ms = overlap_ms
+        self.silence_search_ms = silence_search_ms
+        self.min_silence_len_ms = min_silence_len_ms
+        self.max_workers = max_workers
+
+    @staticmethod
+    def _file_hash(local_path: str) -> str:
+        digest = hashlib.sha256()
+        with open(local_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def _find_cut(self, audio: AudioSegment, target: int, silence_thresh: float) -> int:
+        """Return the middle of the silence closest before `target`, or `target` itself if there is none."""
+        window_start = max(target - self.silence_search_ms, 0)
+        silences = detect_silence(audio[window_start:target],
+                                  min_silence_len=self.min_silence_len_ms,
+                                  silence_thresh=silence_thresh,
+                                  seek_step=10)
+        if not silences:
+            return target
+        start, end = silences[-1]
+        return window_start + (start + end) // 2
+
+    def split(self, audio: AudioSegment) -> list[tuple[int, int]]:
+        """Split the audio into (start, end) millisecond ranges cut on silence, each overlapping the previous one."""
+        duration = len(audio)
+        if duration <= self.segment_length_ms:
+            return [(0, duration)]
+
+        silence_thresh = audio.dBFS - 16 if audio.dBFS != float("-inf") else -50
+        ranges = []
+        start = 0
+        while start < duration:
+            target = start + self.segment_length_ms
+            if target >= duration:
+                end = duration
+            else:
+                end = self._find_cut(audio, target, silence_thresh)
+                if end <= start + self.overlap_ms:
+                    end = target
+            ranges.append((max(start - self.overlap_ms, 0) if ranges else start, end))
+            start = end
+        return ranges
+
+    def _transcribe_segment(self, audio: AudioSegment, start: int, end: int) -> str | None:
+        # Runs in a worker thread: any failure marks the segment as failed rather than escaping the worker
+        try:
+            buffer = io.BytesIO()
+            audio[start:end].set_channels(1).set_frame_rate(16000).export(buffer, format="wav")
+            buffer.name = f"segment_{start}.wav"
+            buffer.seek(0)
+            transcript = transcribe_audio(buffer, audio_format="wav")
+        except Exception as e:
+            logger.warning(f"Audio transcription failed for segment {_format_timestamp(start)}: {e}")
+            return None
+        if not transcript or transcript == NO_TRANSCRIPTION:
+            logger.warning(f"No transcription for segment {_format_timestamp(start)}.")
+            return None
+        return transcript
+
+    @staticmethod
+    def _transcribe_file(local_path: str, audio_format: str) -> tuple[str, bool]:
+        with open(local_path, 'rb') as file_stream:
+            transcript = transcribe_audio(file_stream, audio_format=audio_format)
+        return transcript, bool(transcript) and transcript != NO_TRANSCRIPTION
+
+    def transcribe(self, local_path: str, audio_format: str) -> tuple[str, bool]:
+        """Return the transcript of the file, and whether it is complete (no segment failed)."""
+        if os.path.getsize(local_path) <= self.direct_max_bytes:
+            return self._transcribe_file(local_path, audio_format)
+        try:
+            with open(local_path, 'rb') as file_stream:
+                audio = AudioSegment.from_file(file_stream, format=audio_format)
+        except Exception as e:
+            # e.g. ffmpeg is missing: the service may still take the file whole
+            logger.warning(f"Could not decode the audio to split it, sending it whole: {e}")
+            return self._transcribe_file(local_path, audio_format)
+        ranges = self.split(audio)
+        if len(ranges) == 1:
+            return self._transcribe_file(local_path, audio_format)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            transcripts = list(executor.map(lambda r: self._transcribe_segment(audio, *r), ranges))
+        if not any(transcripts):
+            raise RuntimeError("All audio segments failed to transcribe.")
+
+        lines = []
+        previous = ""
+        for (start, end), transcript in zip(ranges, transcripts):
+            if transcript is None:
+                text = "[transcription failed]"
+            else:
+                text = _merge_overlap(previous, transcript).strip()
+                previous = transcript
+            lines.append(f"[{_format_timestamp(start)} - {_format_timestamp(end)}] {text}")
+        return "\n".join(lines), all(transcript is not None for transcript in transcripts)
 
     def convert(self, local_path: str, **kwargs: Any) -> DocumentConverterResult:
         md_content = ""
@@ -65,10 +207,20 @@ class AudioWhisperConverter:
         # Transcribe
         if audio_format:
             try:
-                with open(local_path, 'rb') as file_stream:
-                    transcript = transcribe_audio(file_stream, audio_format=audio_format)
-                    if transcript:
-                        md_content += "### Audio Transcript:\n" + transcript
+                key = self._file_hash(local_path)
+                with self._cache_lock:
+                    transcript = self._cache.get(key)
+                    if transcript is not None:
+                        self._cache.move_to_end(key)
+                if transcript is None:
+                    transcript, complete = self.transcribe(local_path, audio_format)
+                    if complete:
+                        with self._cache_lock:
+                            self._cache[key] = transcript
+                            while len(self._cache) > self.cache_size:
+                                self._cache.popitem(last=False)
+                if transcript:
+                    md_content += "### Audio Transcript:\n" + transcript
             except (FileNotFoundError, Exception) as e:
                 logger.warning(f"Audio transcription failed: {e}")
                 md_content = "Audio file detected but transcription failed."
@@ -1,4 +1,6 @@
 
+import asyncio
+from collections.abc import Awaitable, Callable
 from typing import Literal
 
 from src.logger import logger
@@ -10,6 +12,8 @@ NOTE:
 - You must base your plan on the available tools and team members, and explicitly use them in your steps.
 - You must solve the complex task in ≤ 5 steps.
 - `create`: Create a new plan must include a unique plan_id.
+- `dependencies` and `assignees` (optional, one entry per step): the indices of the steps each step depends on, and the team member that carries it out.
+- `execute`: Run every step whose dependencies are completed on its assigned team member, independent steps concurrently, until no step is ready, and record the results in the plan.
 """
 
 @TOOL.register_module(name="planning_tool", force=True)
@@ -24,7 +28,7 @@ class PlanningTool(AsyncTool):
         "type": "object",
         "properties": {
             "action": {
-                "description": "The action to execute. Available actions: create, update, list, get, set_active, mark_step, delete.",
+                "description": "The action to execute. Available actions: create, update, list, get, set_active, mark_step, delete, execute.",
                 "enum": [
                     "create",
                     "update",
@@ -33,6 +37,7 @@ class PlanningTool(AsyncTool):
                     "set_active",
                     "mark_step",
                     "delete",
+                    "execute",
                 ],
                 "type": "string",
             },
@@ -52,6 +57,18 @@ class PlanningTool(AsyncTool):
                 "items": {"type": "string"},
                 "nullable": True,
             },
+            "dependencies": {
+                "description": "For each step, the list of the indices (0-based) of the steps it depends on. Optional for create and update actions.",
+                "type": "array",
+                "items": {"type": "array", "items": {"type": "integer"}},
+                "nullable": True,
+            },
+            "assignees": {
+                "description": "For each step, the name of the team member that carries it out, or an empty string if you do it yourself. Optional for create and update actions.",
+                "type": "array",
+                "items": {"type": "string"},
+                "nullable": True,
+            },
             "step_index": {
                 "description": "Index of the step to update (0-based). Required for mark_step action.",
                 "type": "integer",
@@ -78,18 +95,59 @@ class PlanningTool(AsyncTool):
     plans: dict = {}  # Dictionary to store plans by plan_id
     _current_plan_id: str | None = None  # Track the current active plan
 
-    def __init__(self):
+    def __init__(self, max_parallel_steps: int = 3):
         super(PlanningTool, self).__init__()
 
         # Initialize plans dictionary
         self.plans = {}
         self._current_plan_id = None
 
+        # Maximum number of plan steps run at the same time by `execute`
+        self.max_parallel_steps = max_parallel_steps
+        # Runs a plan step on a team member, set by the agent owning the tool: (team member, task) -> result
+        self.step_runner: Callable[[str, str], Awaitable[str]] | None = None
+
+    def fork(self) -> "PlanningTool":
+        # Plans belong to a single task
+        return type(self)(max_parallel_steps=self.max_parallel_steps)
+
+    @staticmethod
+    def _validate_step_graph(
+        num_steps: int,
+        dependencies: list[list[int]],
+        assignees: list[str],
+    ) -> str | None:
+        """Return an error message if the dependencies or assignees of the steps are invalid."""
+        if len(dependencies) != num_steps or len(assignees) != num_steps:
+            return "Parameters `dependencies` and `assignees` must have one entry per step"
+        for index, step_dependencies in enumerate(dependencies):
+            for dependency in step_dependencies:
+                if not isinstance(dependency, int) or not 0 <= dependency < num_steps or dependency == index:
+                    return f"Invalid dependency {dependency} of step {index}"
+
+        # Kahn's algorithm: every step must be reachable without a cycle
+        remaining = [len(set(step_dependencies)) for step_dependencies in dependencies]
+        ready = [index for index, count in enumerate(remaining) if count == 0]
+        num_sorted = 0
+        while ready:
+            index = ready.pop()
+            num_sorted += 1
+            for dependent, step_dependencies in enumerate(dependencies):
+                if index in step_dependencies:
+                    remaining[dependent] -= 1
+                    if remaining[dependent] == 0:
+                        ready.append(dependent)
+        if num_sorted != num_steps:
+            return "The step dependencies contain a cycle"
+        return None
+
     async def _create_plan(
         self,
         plan_id: str | None,
         title: str | None,
-        steps: list[str] | None
+        steps: list[str] | None,
+        dependencies: list[list[int]] | None = None,
+        assignees: list[str] | None = None,
     ):
         """Create a new plan with the given ID, title, and steps."""
         if not plan_id:
@@ -128,6 +186,17 @@ class PlanningTool(AsyncTool):
                 error=res,
             )
 
+        dependencies = dependencies if dependencies is not None else [[] for _ in steps]
+        assignees = assignees if assignees is not None else [""] * len(steps)
+        error = self._validate_step_graph(len(steps), dependencies, assignees)
+        if error:
+            res = f"{error} for action: create"
+            logger.error(res)
+            return ToolResult(
+                output=None,
+                error=res,
+            )
+
         # Create a new plan with initialized step statuses
         plan = {
             "plan_id": plan_id,
@@ -135,6 +204,8 @@ class PlanningTool(AsyncTool):
             "steps": steps,
             "step_statuses": ["not_started"] * len(steps),
             "step_notes": [""] * len(steps),
+            "step_dependencies": [sorted(set(step_dependencies)) for step_dependencies in dependencies],
+            "step_assignees": [assignee or "" for assignee in assignees],
         }
 
         self.plans[plan_id] = plan
@@ -152,7 +223,9 @@ class PlanningTool(AsyncTool):
         self,
         plan_id: str | None,
         title: str | None,
-        steps: list[str] | None
+        steps: list[str] | None,
+        dependencies: list[list[int]] | None = None,
+        assignees: list[str] | None = None,
     ) -> ToolResult:
         """Update an existing plan with new title or steps."""
         if not plan_id:
@@ -176,6 +249,33 @@ class PlanningTool(AsyncTool):
         if title:
             plan["title"] = title
 
+        old_dependencies = plan.get("step_dependencies", [[] for _ in plan["steps"]])
+        old_assignees = plan.get("step_assignees", [""] * len(plan["steps"]))
+        new_dependencies, new_assignees = old_dependencies, old_assignees
+        if steps or dependencies is not None or assignees is not None:
+            # Unchanged steps keep their dependencies and assignee unless new ones are given
+            new_steps = steps or plan["steps"]
+            if dependencies is None:
+                dependencies = [
+                    old_dependencies[i] if i < len(plan["steps"]) and step == plan["steps"][i] else []
+                    for i, step in enumerate(new_steps)
+                ]
+            if assignees is None:
+                assignees = [
+                    old_assignees[i] if i < len(plan["steps"]) and step == plan["steps"][i] else ""
+                    for i, step in enumerate(new_steps)
+                ]
+            error = self._validate_step_graph(len(new_steps), dependencies, assignees)
+            if error:
+                res = f"{error} for action: update"
+                logger.error(res)
+                return ToolResult(
+                    output=None,
+                    error=res,
+                )
+            new_dependencies = [sorted(set(step_dependencies)) for step_dependencies in dependencies]
+            new_assignees = [assignee or "" for assignee in assignees]
+
         if steps:
             if not isinstance(steps, list) or not all(
                 isinstance(step, str) for step in steps
@@ -209,6 +309,9 @@ class PlanningTool(AsyncTool):
             plan["step_statuses"] = new_statuses
             plan["step_notes"] = new_notes
 
+        plan["step_dependencies"] = new_dependencies
+        plan["step_assignees"] = new_assignees
+
         res = f"Plan updated successfully: {plan_id}\n\n{self._format_plan(plan)}"
         logger.info(res)
         return ToolResult(
@@ -402,6 +505,111 @@ class PlanningTool(AsyncTool):
             error=None,
         )
 
+    def _step_task(self, plan: dict, step_index: int) -> str:
+        """Return the task given to the team member of a step, with the results of the steps it depends on."""
+        task = plan["steps"][step_index]
+        dependencies = plan["step_dependencies"][step_index]
+        if dependencies:
+            task += "\n\nResults of the steps this one depends on:\n" + "\n".join(
+                f"- Step {dependency} ({plan['steps'][dependency]}): {plan['step_notes'][dependency]}"
+                for dependency in dependencies
+            )
+        return task
+
+    async def _execute_plan(self, plan_id: str | None) -> ToolResult:
+        """Run the ready steps of a plan on their team members, concurrently, until no step is ready."""
+        if not plan_id:
+            # If no plan_id is provided, use the current active plan
+            if not self._current_plan_id:
+                res = "No active plan. Please specify a plan_id or set an active plan."
+                logger.error(res)
+                return ToolResult(
+                    output=None,
+                    error=res,
+                )
+            plan_id = self._current_plan_id
+
+        if plan_id not in self.plans:
+            res = f"No plan found with ID: {plan_id}"
+            logger.error(res)
+            return ToolResult(
+                output=None,
+                error=res,
+            )
+
+        if self.step_runner is None:
+            res = "Plan execution is not available: there is no team member to run the steps."
+            logger.error(res)
+            return ToolResult(
+                output=None,
+                error=res,
+            )
+
+        plan = self.plans[plan_id]
+        statuses = plan["step_statuses"]
+        semaphore = asyncio.Semaphore(self.max_parallel_steps)
+
+        def ready_steps() -> list[int]:
+            return [
+                index
+                for index, status in enumerate(statuses)
+                if status == "not_started"
+                and plan["step_assignees"][index]
+                and all(statuses[dependency] == "completed" for dependency in plan["step_dependencies"][index])
+            ]
+
+        async def run_step(step_index: int) -> str:
+            async with semaphore:
+                logger.info(f"| Running step {step_index} of plan '{plan_id}' on {plan['step_assignees'][step_index]}")
+                return await self.step_runner(plan["step_assignees"][step_index], self._step_task(plan, step_index))
+
+        results: dict[int, str] = {}
+        running: dict[asyncio.Task, int] = {}
+        try:
+            while True:
+                for index in ready_steps():
+                    statuses[index] = "in_progress"
+                    running[asyncio.create_task(run_step(index))] = index
+                if not running:
+                    break
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    index = running.pop(task)
+                    try:
+                        results[index] = str(task.result())
+                        statuses[index] = "completed"
+                    except Exception as e:
+                        results[index] = f"Failed: {e}"
+                        statuses[index] = "blocked"
+                    plan["step_notes"][index] = results[index]
+        finally:
+            # Steps still running when the execution is cancelled can be run again
+            for task, index in running.items():
+                task.cancel()
+                statuses[index] = "not_started"
+
+        if not results:
+            res = (
+                f"No step of plan '{plan_id}' is ready to run: a step runs once it is not started, has an assignee "
+                f"and all its dependencies are completed.\n\n{self._format_plan(plan)}"
+            )
+            logger.error(res)
+            return ToolResult(
+                output=None,
+                error=res,
+            )
+
+        res = f"Executed {len(results)} steps of plan '{plan_id}':\n\n"
+        res += "\n\n".join(
+            f"Step {index} ({plan['step_assignees'][index]}): {result}" for index, result in sorted(results.items())
+        )
+        res += f"\n\n{self._format_plan(plan)}"
+        logger.info(res)
+        return ToolResult(
+            output=res,
+            error=None,
+        )
+
     def _format_plan(self, plan: dict) -> str:
         """Format a plan for display."""
         output = f"Plan: {plan['title']} (ID: {plan['plan_id']})\n"
@@ -439,7 +647,12 @@ class PlanningTool(AsyncTool):
                 "blocked": "[!]",
             }.get(status, "[ ]")
 
-            output += f"{i}. {status_symbol} {step}\n"
+            output += f"{i}. {status_symbol} {step}"
+            if plan.get("step_dependencies") and plan["step_dependencies"][i]:
+                output += f" (depends on: {', '.join(str(dependency) for dependency in plan['step_dependencies'][i])})"
+            if plan.get("step_assignees") and plan["step_assignees"][i]:
+                output += f" [{plan['step_assignees'][i]}]"
+            output += "\n"
             if notes:
                 output += f"   Notes: {notes}\n"
 
@@ -448,11 +661,13 @@ class PlanningTool(AsyncTool):
     async def forward(
         self,
         action: Literal[
-            "create", "update", "list", "get", "set_active", "mark_step", "delete"
+            "create", "update", "list", "get", "set_active", "mark_step", "delete", "execute"
         ],
         plan_id: str | None = None,
         title: str | None = None,
         steps: list[str] | None = None,
+        dependencies: list[list[int]] | None = None,
+        assignees: list[str] | None = None,
         step_index: int | None = None,
         step_status: Literal["not_started", "in_progress", "completed", "blocked"] | None = None,
         step_notes: str | None = None,
@@ -465,15 +680,17 @@ class PlanningTool(AsyncTool):
         - plan_id: Unique identifier for the plan
         - title: Title for the plan (used with create action)
         - steps: List of steps for the plan (used with create action)
+        - dependencies: Indices of the steps each step depends on (used with create and update actions)
+        - assignees: Team member carrying out each step (used with create and update actions)
         - step_index: Index of the step to update (used with mark_step action)
         - step_status: Status to set for a step (used with mark_step action)
         - step_notes: Additional notes for a step (used with mark_step action)
         """
 
         if action == "create":
-            return await self._create_plan(plan_id, title, steps)
+            return await self._create_plan(plan_id, title, steps, dependencies, assignees)
         elif action == "update":
-            return await self._update_plan(plan_id, title, steps)
+            return await self._update_plan(plan_id, title, steps, dependencies, assignees)
         elif action == "list":
             return await self._list_plans()
         elif action == "get":
@@ -484,8 +701,10 @@ class PlanningTool(AsyncTool):
             return await self._mark_step(plan_id, step_index, step_status, step_notes)
         elif action == "delete":
             return await self._delete_plan(plan_id)
+        elif action == "execute":
+            return await self._execute_plan(plan_id)
         else:
-            res = f"Unrecognized action: {action}. Allowed actions are: create, update, list, get, set_active, mark_step, delete"
+            res = f"Unrecognized action: {action}. Allowed actions are: create, update, list, get, set_active, mark_step, delete, execute"
             logger.error(res)
             return ToolResult(
                 output=None,
@@ -14,6 +14,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 import ast
+import copy
 import inspect
 import json
 import os
@@ -149,12 +150,23 @@ class Tool:
     You can also override the method [`~Tool.setup`] if your tool has an expensive operation to perform before being
     usable (such as loading a model). [`~Tool.setup`] will be called the first time you use your tool, but not at
     instantiation.
+
+    Tools whose result only depends on their arguments can set **cacheable** (`bool`) to `True`, so that agents with a
+    tool cache reuse their results, and **cache_ttl** (`float`) to the number of seconds a result stays valid (`None`
+    for the whole cache lifetime). Override [`~Tool.is_cacheable_result`] to keep failures out of the cache.
+
+    Agents enforce **max_concurrency** (`int`), the maximum number of calls of the tool running at once in the process,
+    and **timeout** (`float`), the number of seconds after which a call is cancelled. Both default to `None` (no limit).
     """
 
     name: str
     description: str
     parameters: dict[str, dict[str, str | type | bool]]
     output_type: str
+    cacheable: bool = False
+    cache_ttl: float | None = None
+    max_concurrency: int | None = None
+    timeout: float | None = None
 
     def __init__(self, *args, **kwargs):
         self.is_initialized = False
@@ -163,6 +175,10 @@ class Tool:
         super().__init_subclass__(**kwargs)
         validate_after_init(cls)
 
+    def is_cacheable_result(self, result: Any) -> bool:
+        """Whether `result` may be cached. By default, errors reported in a `ToolResult` are not."""
+        return not (isinstance(result, ToolResult) and result.error)
+
     def validate_arguments(self):
         required_attributes = {
             "description": str,
@@ -263,6 +279,13 @@ class Tool:
         """
         self.is_initialized = True
 
+    def fork(self) -> "Tool":
+        """
+        Return the instance to give to a clone of the agent owning this tool. Stateless tools are shared between
+        clones; overwrite this method in tools that keep per-task state to return a fresh instance.
+        """
+        return self
+
     def to_dict(self) -> dict:
         """Returns a dictionary representing the tool"""
         class_name = self.__class__.__name__
@@ -1255,9 +1278,24 @@ def make_tool_instance(agent):
     }
     output_type = "any"
     async def forward(self, task: Any) -> ToolResult:
-        result = await agent.run(task)
+        try:
+            result = await self.agent.run(task)
+        finally:
+            self.record_run()
+        if getattr(self.agent, "provide_run_summary", False):
+            # The managing agent gets the answer with a little evidence and where to read the full run, more
+            # evidence would needlessly grow its memory at every delegation
+            result = await self.agent.summarize_run(result, brief=True)
         return ToolResult(output=result, error=None)
 
+    def fork(self):
+        # Each clone of the managing agent gets its own clone of the managed agent
+        return make_tool_instance(self.agent.clone())
+
+    def record_run(self):
+        # Keep the memory of the last run for the run report, the next run of the agent starts a new memory
+        self.runs.append((self.agent, copy.copy(self.agent.memory)))
+
     tool_cls = type(
         f"{agnet_name}",
         (AsyncTool,),
@@ -1267,10 +1305,15 @@ def make_tool_instance(agent):
             "parameters": parameters,
             "output_type": output_type,
             "forward": forward,
+            "fork": fork,
+            "record_run": record_run,
         }
     )
 
     tool_instance = tool_cls()
+    tool_instance.agent = agent
+    # (agent, memory) of each run of the managed agent through this tool
+    tool_instance.runs = []
 
     return tool_instance
 
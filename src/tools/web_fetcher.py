@@ -24,10 +24,16 @@ class WebFetcherTool(AsyncTool):
         "additionalProperties": False
     }
     output_type = "any"
+    cacheable = True
+    cache_ttl = 3600
+    timeout = 120
 
     def __init__(self):
         super(WebFetcherTool, self).__init__()
 
+    def is_cacheable_result(self, result) -> bool:
+        return result is not None and result.title != "Error"
+
     async def forward(self, url: str) -> DocumentConverterResult | None:
         """Fetch content from a given URL."""
 
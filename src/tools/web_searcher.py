@@ -118,6 +118,9 @@ class WebSearcherTool(AsyncTool):
         "required": ["query"],
     }
     output_type = 'any'
+    cacheable = True
+    cache_ttl = 3600
+    timeout = 120
 
     def __init__(self,
                  *args,
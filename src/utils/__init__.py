@@ -6,6 +6,7 @@ from .agent_types import (
                              handle_agent_input_types,
                              handle_agent_output_types,
 )
+from .deadline import budget, deadline_scope, get_deadline, remaining_time
 from .function_utils import (
                              _convert_type_hints_to_json_schema,
                              get_imports,
@@ -14,6 +15,7 @@ from .function_utils import (
 from .image_utils import download_image
 from .path_utils import assemble_project_path
 from .singleton import Singleton
+from .template_utils import compile_template
 from .token_utils import get_token_count
 from .url_utils import fetch_url
 from .utils import (
@@ -62,4 +64,9 @@ __all__ = [
     "handle_agent_output_types",
     "handle_agent_input_types",
     "fetch_url",
+    "deadline_scope",
+    "get_deadline",
+    "remaining_time",
+    "budget",
+    "compile_template",
 ]
@@ -0,0 +1,50 @@
+"""Deadline propagation through the agent hierarchy, tools and model calls."""
+
+import contextvars
+import time
+from contextlib import contextmanager
+
+_current_deadline: contextvars.ContextVar[float | None] = contextvars.ContextVar("deadline", default=None)
+
+
+@contextmanager
+def deadline_scope(time_limit: float | None):
+    """
+    Set a deadline `time_limit` seconds from now for the code run inside the context, including the tasks it
+    starts. An enclosing deadline that is earlier is kept. Yields the effective deadline (a `time.time()` value,
+    or `None` if there is none).
+    """
+    deadline = _current_deadline.get()
+    if time_limit is not None:
+        new_deadline = time.time() + time_limit
+        deadline = new_deadline if deadline is None else min(deadline, new_deadline)
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+
+def get_deadline() -> float | None:
+    """Return the current deadline, if any."""
+    return _current_deadline.get()
+
+
+def remaining_time() -> float | None:
+    """Return the number of seconds left before the current deadline, `None` if there is no deadline."""
+    deadline = _current_deadline.get()
+    if deadline is None:
+        return None
+    return max(deadline - time.time(), 0.0)
+
+
+def budget(limit: float | None, reserve: float = 0.0) -> float | None:
+    """
+    Return the smaller of `limit` and the time left before the deadline minus `reserve`, or `None` if neither
+    bounds it.
+    """
+    remaining = remaining_time()
+    if remaining is None:
+        return limit
+    remaining = max(remaining - reserve, 0.0)
+    return remaining if limit is None else min(limit, remaining)
@@ -0,0 +1,12 @@
+from functools import lru_cache
+
+from jinja2 import Environment, StrictUndefined, Template
+
+# Every template is compiled by this environment, with the settings of `jinja2.Template`
+_environment = Environment(undefined=StrictUndefined)
+
+
+@lru_cache(maxsize=512)
+def compile_template(source: str) -> Template:
+    """Return the compiled template for `source`. Templates are compiled once and shared by every agent."""
+    return _environment.from_string(source)
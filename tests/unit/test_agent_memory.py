@@ -0,0 +1,150 @@
+import unittest
+
+from PIL import Image
+
+from src.logger import Timing
+from src.memory import ActionStep, AgentMemory, PlanningStep, TaskStep
+
+
+class CountingActionStep(ActionStep):
+    calls = 0
+
+    def to_messages(self, summary_mode: bool = False):
+        CountingActionStep.calls += 1
+        return super().to_messages(summary_mode=summary_mode)
+
+
+def _action_step(step_number):
+    return CountingActionStep(
+        step_number=step_number,
+        timing=Timing(start_time=0.0),
+        model_output=f"Thought {step_number}",
+        observations=f"Observation {step_number}",
+    )
+
+
+class TestAgentMemoryMessageLog(unittest.TestCase):
+
+    def setUp(self):
+        CountingActionStep.calls = 0
+        self.memory = AgentMemory(system_prompt="system", user_prompt="user")
+        self.memory.steps.append(TaskStep(task="task"))
+
+    def test_matches_full_rebuild(self):
+        for step_number in range(1, 4):
+            self.memory.steps.append(_action_step(step_number))
+            for summary_mode in (False, True):
+                expected = self.memory.system_prompt.to_messages(summary_mode=summary_mode)
+                for step in self.memory.steps:
+                    expected.extend(step.to_messages(summary_mode=summary_mode))
+                expected.extend(self.memory.user_prompt.to_messages(summary_mode=summary_mode))
+                self.assertEqual(self.memory.to_messages(summary_mode=summary_mode), expected)
+
+    def test_each_step_is_materialized_once(self):
+        for step_number in range(1, 6):
+            self.memory.steps.append(_action_step(step_number))
+            self.memory.to_messages()
+        self.assertEqual(CountingActionStep.calls, 5)
+
+    def test_summary_view_is_lazy(self):
+        self.memory.steps.append(_action_step(1))
+        self.memory.to_messages()
+        self.assertNotIn(True, self.memory.message_logs)
+
+    def test_reset_and_invalidate(self):
+        step = _action_step(1)
+        self.memory.steps.append(step)
+        self.memory.to_messages()
+
+        step.observations = "Edited observation"
+        self.memory.invalidate_messages(1)
+        self.assertIn("Edited observation", str(self.memory.to_messages()[-2].content))
+
+        self.memory.reset()
+        self.memory.steps.append(TaskStep(task="other task"))
+        self.assertEqual(len(self.memory.to_messages()), 3)
+
+    def test_step_range(self):
+        self.memory.steps.append(
+            PlanningStep(model_input_messages=[], model_output_message=None, plan="plan", timing=Timing(start_time=0.0))
+        )
+        self.memory.steps.append(_action_step(1))
+        message_log = self.memory.get_message_log()
+        self.assertEqual(message_log.step_range(0), (0, 1))
+        self.assertEqual(message_log.step_range(1), (1, 3))
+        self.assertEqual(message_log.step_range(2), (3, 5))
+
+    def test_model_input_reference(self):
+        self.memory.steps.append(_action_step(1))
+        expected = self.memory.to_messages()
+        step = _action_step(2)
+        step.model_input_reference = self.memory.reference_messages()
+        self.memory.steps.append(step)
+        self.memory.steps.append(_action_step(3))
+
+        self.assertIsNone(step.model_input_messages)
+        self.assertEqual(self.memory.get_model_input_messages(step), expected)
+
+        self.memory.steps[1].observations = "Rewritten"
+        self.memory.invalidate_messages(1)
+        with self.assertRaises(ValueError):
+            self.memory.get_model_input_messages(step)
+
+
+def _image_count(messages):
+    return sum(
+        1
+        for message in messages
+        if isinstance(message.content, list)
+        for element in message.content
+        if element["type"] == "image"
+    )
+
+
+class TestAgentMemoryImages(unittest.TestCase):
+
+    def setUp(self):
+        self.red = Image.new("RGB", (8, 8), "red")
+        self.blue = Image.new("RGB", (8, 8), "blue")
+
+    def _memory(self, policy, max_images=1):
+        memory = AgentMemory(system_prompt="system", image_resend_policy=policy, max_images=max_images)
+        memory.steps.append(TaskStep(task="task", task_images=[self.red]))
+        return memory
+
+    def test_duplicate_images_sent_once(self):
+        memory = self._memory("all")
+        step = _action_step(1)
+        step.observations_images = [self.red.copy(), self.blue]
+        memory.steps.append(step)
+        messages = memory.to_messages()
+        self.assertEqual(_image_count(messages), 2)
+        self.assertEqual(len(memory.images), 2)
+        self.assertIn(f"[image {memory.images.image_id(self.red)} not shown]", str(messages))
+
+    def test_first_turn(self):
+        memory = self._memory("first_turn")
+        self.assertEqual(_image_count(memory.to_messages()), 1)
+        memory.steps.append(_action_step(1))
+        self.assertEqual(_image_count(memory.to_messages()), 0)
+
+    def test_last_n(self):
+        memory = self._memory("last_n", max_images=1)
+        step = _action_step(1)
+        step.observations_images = [self.blue]
+        memory.steps.append(step)
+        messages = memory.to_messages()
+        self.assertEqual(_image_count(messages), 1)
+        self.assertIs(messages[-2].content[0]["image"], self.blue)
+
+    def test_on_demand_with_pin(self):
+        memory = self._memory("on_demand")
+        self.assertEqual(_image_count(memory.to_messages()), 0)
+        memory.images.pin(memory.images.image_id(self.red))
+        self.assertEqual(_image_count(memory.to_messages()), 1)
+        # The shared log itself is never modified
+        self.assertEqual(_image_count(memory.get_message_log().messages), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
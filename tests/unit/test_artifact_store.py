@@ -0,0 +1,61 @@
+import asyncio
+import tempfile
+import unittest
+
+from src.tools.artifact_reader import ArtifactReaderTool
+from src.tools.artifacts import ArtifactStore, artifact_store
+
+
+class TestArtifactStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store = ArtifactStore(self.tmp_dir.name)
+        self.content = "\n".join(f"line {index}" for index in range(1000))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_put_is_content_addressed(self):
+        handle = self.store.put(self.content)
+        self.assertEqual(self.store.put(self.content), handle)
+        self.assertEqual(self.store.get(handle), self.content)
+        with self.assertRaises(KeyError):
+            self.store.get("../etc/passwd")
+
+    def test_preview(self):
+        preview = self.store.preview(self.content, max_chars=100)
+        self.assertTrue(preview.startswith(self.content[:100]))
+        self.assertIn(self.store.put(self.content), preview)
+        self.assertLess(len(preview), 400)
+
+    def test_page_and_grep(self):
+        handle = self.store.put(self.content)
+        page = self.store.page(handle, page=2, page_size=100)
+        self.assertIn(f"page 2/{(len(self.content) + 99) // 100}", page)
+        self.assertTrue(page.endswith(self.content[100:200]))
+
+        result = self.store.grep(handle, r"line 99\d", context=0)
+        self.assertIn("10 matching lines", result)
+        self.assertIn("991: line 990", result)
+        self.assertIn("no line matches", self.store.grep(handle, "missing"))
+
+
+class TestArtifactReaderTool(unittest.TestCase):
+
+    def test_read(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            root = artifact_store.root
+            artifact_store.set_root(tmp_dir)
+            try:
+                handle = artifact_store.put("first line\nsecond line")
+                tool = ArtifactReaderTool()
+                self.assertIn("second line", str(asyncio.run(tool(handle=handle))))
+                self.assertIn("2: second line", str(asyncio.run(tool(handle=handle, pattern="second"))))
+                self.assertIn("Error", str(asyncio.run(tool(handle="artifact_unknown"))))
+            finally:
+                artifact_store.set_root(root)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from pydub import AudioSegment
+from pydub.generators import Sine
+
+from src.tools.markdown import mdconvert
+from src.tools.markdown.mdconvert import (
+    NO_TRANSCRIPTION,
+    AudioWhisperConverter,
+    _merge_overlap,
+)
+
+
+def tone(duration_ms: int) -> AudioSegment:
+    return Sine(440).to_audio_segment(duration=duration_ms, volume=-10)
+
+
+class TestAudioWhisperConverter(unittest.TestCase):
+
+    def setUp(self):
+        self.converter = AudioWhisperConverter(segment_length_ms=10000,
+                                               overlap_ms=1000,
+                                               silence_search_ms=3000,
+                                               min_silence_len_ms=400)
+        AudioWhisperConverter._cache.clear()
+
+    def tearDown(self):
+        AudioWhisperConverter._cache.clear()
+
+    def test_short_audio_is_a_single_range(self):
+        self.assertEqual(self.converter.split(tone(8000)), [(0, 8000)])
+
+    def test_split_cuts_on_silence_with_overlap(self):
+        silence = AudioSegment.silent(duration=1000)
+        audio = tone(9000) + silence + tone(9000) + silence + tone(5000)
+        silences = [(9000, 10000), (19000, 20000)]
+
+        ranges = self.converter.split(audio)
+
+        self.assertEqual(len(ranges), 3)
+        self.assertEqual(ranges[0][0], 0)
+        self.assertEqual(ranges[-1][1], len(audio))
+        for (_, end), (next_start, _), (silence_start, silence_end) in zip(ranges, ranges[1:], silences):
+            self.assertTrue(silence_start <= end <= silence_end, (end, silence_start, silence_end))
+            self.assertEqual(next_start, end - 1000)
+
+    def test_find_cut(self):
+        audio = tone(8000) + AudioSegment.silent(duration=1000) + tone(3000)
+        silence_thresh = audio.dBFS - 16
+        cut = self.converter._find_cut(audio, 10000, silence_thresh)
+        self.assertTrue(8000 <= cut <= 9000, cut)
+        # Without silence in the search window, cut at the target
+        self.assertEqual(self.converter._find_cut(tone(12000), 10000, silence_thresh), 10000)
+
+    def test_merge_overlap(self):
+        self.assertEqual(_merge_overlap("the quick brown fox", "Brown fox, jumps over"), "jumps over")
+        # A single repeated word is not taken for an overlap
+        self.assertEqual(_merge_overlap("one two three", "three four"), "three four")
+        self.assertEqual(_merge_overlap("", "hello world"), "hello world")
+
+    def test_failed_transcriptions_are_not_cached(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "clip.wav")
+            tone(1000).export(path, format="wav").close()
+            with mock.patch.object(mdconvert, "transcribe_audio", return_value=NO_TRANSCRIPTION) as transcribe:
+                self.converter.convert(path)
+                self.converter.convert(path)
+            self.assertEqual(transcribe.call_count, 2)
+
+            with mock.patch.object(mdconvert, "transcribe_audio", return_value="hello") as transcribe:
+                self.assertIn("hello", self.converter.convert(path).markdown)
+                self.assertIn("hello", self.converter.convert(path).markdown)
+            self.assertEqual(transcribe.call_count, 1)
+
+    def test_long_audio_with_failed_segment(self):
+        # The segments are transcribed in worker threads: record the calls under a lock
+        calls = []
+        calls_lock = threading.Lock()
+
+        def transcribe_audio(file_stream, audio_format):
+            with calls_lock:
+                calls.append(file_stream.name)
+            if file_stream.name == "segment_0.wav":
+                return "first part"
+            if file_stream.name.startswith("segment_"):
+                raise RuntimeError("service unavailable")
+            return NO_TRANSCRIPTION
+
+        self.converter.direct_max_bytes = 0
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "long.wav")
+            (tone(9000) + AudioSegment.silent(duration=1000) + tone(9000)).export(path, format="wav").close()
+            with mock.patch.object(mdconvert, "transcribe_audio", new=transcribe_audio):
+                markdown = self.converter.convert(path).markdown
+                self.converter.convert(path)
+
+        self.assertIn("] first part\n", markdown)
+        self.assertIn("] [transcription failed]", markdown)
+        # The incomplete transcript is not cached: both conversions transcribe both segments
+        self.assertEqual(len(calls), 4)
+        self.assertEqual(calls.count("segment_0.wav"), 2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,148 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from functools import partial
+
+import pytest
+
+from src.agent.runner import (
+    BenchmarkRunner,
+    ShardedBenchmarkRunner,
+    is_infrastructure_error,
+)
+
+
+async def create_solve(shard):
+    async def solve(task):
+        if task["task_id"] == "crash" and shard == 0:
+            os._exit(1)
+        if task["task_id"] == "wrong":
+            raise ValueError("bad answer")
+        await asyncio.sleep(0.05)
+        return {"task_id": task["task_id"], "shard": shard, "pid": os.getpid()}
+
+    return solve
+
+
+async def shutdown_shard(directory, shard):
+    with open(os.path.join(directory, f"shard{shard}"), "w") as f:
+        f.write(str(os.getpid()))
+
+
+class TestBenchmarkRunner(unittest.IsolatedAsyncioTestCase):
+
+    async def test_slow_task_only_holds_its_slot(self):
+        durations = {"slow": 0.3, **{f"fast_{i}": 0.05 for i in range(4)}}
+
+        async def solve(task):
+            await asyncio.sleep(durations[task["task_id"]])
+            return task["task_id"]
+
+        answers = []
+        runner = BenchmarkRunner(solve, on_result=lambda task, answer: answers.append(answer), concurrency=2,
+                                 report_interval=None)
+        loop = asyncio.get_running_loop()
+        start_time = loop.time()
+        results = await runner.run([{"task_id": task_id} for task_id in durations])
+
+        # Lockstep batches of 2 would take 0.3 + 0.05 + 0.05
+        self.assertLess(loop.time() - start_time, 0.35)
+        self.assertEqual([result.task_id for result in results][-1], "slow")
+        self.assertEqual({result.status for result in results}, {"done"})
+        self.assertEqual(runner.progress()["done"], 5)
+        self.assertEqual(sorted(answers), sorted(durations))
+
+    async def test_timeout_and_retries(self):
+        attempts = {"flaky": 0, "broken": 0, "wrong": 0}
+
+        async def solve(task):
+            task_id = task["task_id"]
+            if task_id == "slow":
+                await asyncio.sleep(1)
+            attempts[task_id] += 1
+            if task_id == "flaky" and attempts[task_id] < 2:
+                raise RuntimeError("Error while generating output") from ConnectionError("reset by peer")
+            if task_id == "broken":
+                raise ConnectionError("refused")
+            if task_id == "wrong":
+                raise ValueError("bad answer")
+
+        runner = BenchmarkRunner(solve, concurrency=2, task_timeout=0.1, max_retries=2, retry_backoff=0.01,
+                                 report_interval=None)
+        results = await runner.run([{"task_id": task_id} for task_id in ("slow", "flaky", "broken", "wrong")])
+        results = {result.task_id: result for result in results}
+
+        self.assertEqual(results["slow"].status, "timeout")
+        self.assertEqual((results["flaky"].status, results["flaky"].attempts), ("done", 2))
+        self.assertEqual((results["broken"].status, results["broken"].attempts), ("failed", 3))
+        self.assertEqual((results["wrong"].status, results["wrong"].attempts), ("failed", 1))
+        self.assertEqual(runner.retries, 3)
+
+    async def test_stop_drains_then_cancels(self):
+        started = []
+
+        async def solve(task):
+            started.append(task["task_id"])
+            await asyncio.sleep(0.1 if task["task_id"] < 2 else 10)
+
+        runner = BenchmarkRunner(solve, concurrency=2, report_interval=None)
+        run = asyncio.create_task(runner.run([{"task_id": i} for i in range(6)]))
+        await asyncio.sleep(0.05)
+        runner.stop()
+        results = await run
+        self.assertEqual(started, [0, 1])
+        self.assertEqual([result.status for result in results], ["done", "done"])
+
+        runner = BenchmarkRunner(solve, concurrency=2, report_interval=None)
+        run = asyncio.create_task(runner.run([{"task_id": i} for i in range(2, 6)]))
+        await asyncio.sleep(0.05)
+        runner.stop()
+        runner.stop()
+        results = await run
+        self.assertEqual([result.status for result in results], ["cancelled", "cancelled"])
+
+    def test_is_infrastructure_error(self):
+        try:
+            try:
+                raise TimeoutError("read timeout")
+            except TimeoutError as e:
+                raise RuntimeError("Agent interrupted.") from e
+        except RuntimeError as e:
+            self.assertTrue(is_infrastructure_error(e))
+        self.assertFalse(is_infrastructure_error(ValueError("bad answer")))
+
+
+# Each shard process imports the whole `src` package, which takes a while
+@pytest.mark.slow
+class TestShardedBenchmarkRunner(unittest.IsolatedAsyncioTestCase):
+
+    async def test_sharded_runner(self):
+        answers = []
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        runner = ShardedBenchmarkRunner(create_solve, shutdown_shard=partial(shutdown_shard, directory.name),
+                                        processes=2, concurrency=2, retry_backoff=0.01,
+                                        on_result=lambda task, answer: answers.append(answer), report_interval=None)
+        task_ids = [f"task_{i}" for i in range(8)] + ["wrong"]
+        results = await runner.run([{"task_id": task_id} for task_id in task_ids])
+
+        results = {result.task_id: result for result in results}
+        self.assertEqual(results["wrong"].status, "failed")
+        self.assertIn("ValueError: bad answer", results["wrong"].error)
+        self.assertEqual(sorted(answer["task_id"] for answer in answers), task_ids[:-1])
+        self.assertEqual({answer["shard"] for answer in answers}, {0, 1})
+        self.assertNotIn(os.getpid(), {answer["pid"] for answer in answers})
+        # Each shard process ran its shutdown
+        self.assertEqual(sorted(os.listdir(directory.name)), ["shard0", "shard1"])
+
+    async def test_sharded_runner_survives_dead_shard(self):
+        runner = ShardedBenchmarkRunner(create_solve, processes=2, concurrency=1, retry_backoff=0.01,
+                                        report_interval=None)
+        results = await runner.run([{"task_id": "crash"}, {"task_id": "task_0"}, {"task_id": "task_1"}])
+        self.assertEqual({result.task_id: result.status for result in results},
+                         {"crash": "done", "task_0": "done", "task_1": "done"})
+
+
+if __name__ == "__main__":
+    unittest.main()
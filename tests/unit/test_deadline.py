@@ -0,0 +1,41 @@
+import asyncio
+import unittest
+
+from src.utils.deadline import budget, deadline_scope, get_deadline, remaining_time
+
+
+class TestDeadline(unittest.IsolatedAsyncioTestCase):
+
+    def test_no_deadline(self):
+        self.assertIsNone(get_deadline())
+        self.assertIsNone(remaining_time())
+        self.assertEqual(budget(10), 10)
+        self.assertIsNone(budget(None))
+
+    def test_earlier_deadline_is_kept(self):
+        with deadline_scope(5) as outer:
+            with deadline_scope(100) as inner:
+                self.assertEqual(inner, outer)
+            with deadline_scope(1) as inner:
+                self.assertLess(inner, outer)
+            with deadline_scope(None) as inner:
+                self.assertEqual(inner, outer)
+        self.assertIsNone(get_deadline())
+
+    def test_budget(self):
+        with deadline_scope(5):
+            self.assertEqual(budget(1), 1)
+            self.assertLessEqual(budget(100), 5)
+            self.assertLessEqual(budget(None, reserve=2), 3)
+            self.assertEqual(budget(None, reserve=10), 0.0)
+
+    async def test_deadline_is_inherited_by_tasks(self):
+        async def child():
+            return get_deadline()
+
+        with deadline_scope(5) as deadline:
+            self.assertEqual(await asyncio.create_task(child()), deadline)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+import time
+import unittest
+
+from src.models import model_manager
+from src.tools.deep_researcher import DeepResearcherTool
+from src.utils import deadline_scope
+
+
+class RecordingDeepResearcherTool(DeepResearcherTool):
+    """Deep researcher that records its research budget instead of searching."""
+
+    async def _generate_optimized_query(self, query):
+        return query, None
+
+    async def _research_graph(self, context, query, filter_year=None, deadline=None):
+        self.max_depth_used = context.max_depth
+        self.deadline_used = deadline
+
+    async def _summary(self, query, summary):
+        return summary
+
+
+class TestDeepResearcherBudget(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        model_manager.registered_models["fake_model"] = object()
+        self.tool = RecordingDeepResearcherTool(model_id="fake_model", time_limit_seconds=120)
+
+    def tearDown(self):
+        model_manager.registered_models.pop("fake_model", None)
+
+    async def test_full_budget_without_deadline(self):
+        result = await self.tool.forward("query")
+        self.assertIsNone(result.error)
+        self.assertEqual(self.tool.max_depth_used, 2)
+        self.assertGreater(self.tool.deadline_used, time.time() + 100)
+
+    async def test_budget_is_bounded_by_run_deadline(self):
+        with deadline_scope(50):
+            result = await self.tool.forward("query")
+        self.assertIsNone(result.error)
+        # Less than half of the usual time is left after the summary reserve: only one level deep
+        self.assertEqual(self.tool.max_depth_used, 1)
+        self.assertLessEqual(self.tool.deadline_used, time.time() + 20)
+
+
+if __name__ == "__main__":
+    unittest.main()
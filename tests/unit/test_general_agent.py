@@ -0,0 +1,453 @@
+import asyncio
+import io
+import json
+import unittest
+from types import SimpleNamespace
+
+from rich.console import Console
+
+from src.agent.general_agent.general_agent import GeneralAgent, _is_complete_json
+from src.base.async_multistep_agent import RUN_SUMMARY_MAX_CHARS, AsyncMultiStepAgent
+from src.exception import AgentGenerationError, AgentToolExecutionError
+from src.logger import Timing
+from src.memory import ActionStep, AgentMemory, TaskStep, ToolCall
+from src.models import ChatMessage, ChatMessageStreamDelta, ChatMessageToolCall
+from src.models.base import ChatMessageToolCallFunction, ChatMessageToolCallStreamDelta
+from src.tools.cache import ManagedAgentCall, ManagedAgentMemo
+from src.tools.planning import PlanningTool
+from src.tools.tools import AsyncTool, ToolResult, make_tool_instance
+
+
+class QuietLogger:
+    """Agent logger that drops every message."""
+
+    console = Console(file=io.StringIO())
+
+    def is_enabled(self, level):
+        return False
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+
+class EchoTool(AsyncTool):
+    name = "echo_tool"
+    description = "Echo the given text."
+    parameters = {
+        "type": "object",
+        "properties": {
+            "text": {"type": "string", "description": "The text to echo."},
+        },
+        "required": ["text"],
+    }
+    output_type = "any"
+
+    def __init__(self, delay: float = 0.0):
+        super().__init__()
+        self.delay = delay
+        self.calls = []
+        self.cancelled = []
+        self.running = 0
+        self.max_running = 0
+
+    async def forward(self, text: str) -> ToolResult:
+        self.calls.append(text)
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled.append(text)
+            raise
+        finally:
+            self.running -= 1
+        return ToolResult(output=text, error=None)
+
+
+class TeamMemberTool(AsyncTool):
+    """Stands for a managed agent: each fork records its tasks in the list shared with the original tool."""
+
+    name = "worker_agent"
+    description = "Run a task."
+    parameters = {
+        "type": "object",
+        "properties": {
+            "task": {"type": "string", "description": "The task to run."},
+        },
+        "required": ["task"],
+    }
+    output_type = "any"
+
+    def __init__(self, delay: float = 0.0, calls: list | None = None):
+        super().__init__()
+        self.agent = SimpleNamespace(provide_run_summary=False)
+        self.delay = delay
+        self.calls = calls if calls is not None else []
+        self.is_fork = calls is not None
+
+    def fork(self):
+        return type(self)(delay=self.delay, calls=self.calls)
+
+    async def forward(self, task: str) -> ToolResult:
+        self.calls.append((task, self.is_fork))
+        await asyncio.sleep(self.delay)
+        return ToolResult(output=f"done: {task}", error=None)
+
+
+class FakeManagedAgent:
+    """Managed agent answering every task at once, in a memory of its own."""
+
+    name = "worker_agent"
+    description = "Runs tasks."
+    provide_run_summary = False
+
+    def __init__(self):
+        self.memory = AgentMemory(system_prompt="system")
+
+    def clone(self):
+        return type(self)()
+
+    async def run(self, task):
+        self.memory.reset()
+        self.memory.steps.append(TaskStep(task=task))
+        return f"done: {task}"
+
+
+class ResearchingAgent(FakeManagedAgent):
+    """Managed agent fetching a few pages before answering, and handing over a summary of its run."""
+
+    provide_run_summary = True
+    summarize_run = AsyncMultiStepAgent.summarize_run
+
+    async def run(self, task, reset=True):
+        if reset:
+            self.memory.reset()
+        self.memory.steps.append(TaskStep(task=task))
+        for step_number in range(1, 5):
+            url = f"https://example.com/page{step_number}"
+            self.memory.steps.append(
+                ActionStep(
+                    step_number=step_number,
+                    timing=Timing(start_time=0.0),
+                    tool_calls=[ToolCall(name="web_fetcher_tool", arguments={"url": url}, id=str(step_number))],
+                    observations=f"Page {step_number}: Paris is the capital.",
+                )
+            )
+        return "Paris"
+
+
+class FakeModel:
+    """Model streaming the given deltas, then raising `error` if any."""
+
+    def __init__(self, deltas=(), error: Exception | None = None):
+        self.deltas = list(deltas)
+        self.error = error
+
+    def generate_stream(self, messages, **kwargs):
+        yield from self.deltas
+        if self.error is not None:
+            raise self.error
+
+
+def tool_call_delta(index, id=None, name=None, arguments=None) -> ChatMessageStreamDelta:
+    return ChatMessageStreamDelta(
+        tool_calls=[
+            ChatMessageToolCallStreamDelta(
+                index=index,
+                id=id,
+                type="function" if id else None,
+                function=ChatMessageToolCallFunction(name=name or "", arguments=arguments or ""),
+            )
+        ]
+    )
+
+
+def create_agent(tools, model=None, name="test_agent", **kwargs) -> GeneralAgent:
+    return GeneralAgent(
+        config=SimpleNamespace(template_path="src/agent/general_agent/prompts/general_agent.yaml"),
+        tools=tools,
+        model=model or FakeModel(),
+        name=name,
+        logger=QuietLogger(),
+        **kwargs,
+    )
+
+
+class TestIsCompleteJson(unittest.TestCase):
+
+    def test_complete_json(self):
+        self.assertTrue(_is_complete_json('{"text": "a"}'))
+        self.assertTrue(_is_complete_json(' {"text": {"nested": 1}}\n'))
+
+    def test_incomplete_json(self):
+        self.assertFalse(_is_complete_json(""))
+        self.assertFalse(_is_complete_json('{"text": "a"'))
+        self.assertFalse(_is_complete_json('{"text": {"nested": 1}'))
+        self.assertFalse(_is_complete_json('{"text": "}"'))
+
+
+class TestStreamedToolCallDispatch(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.tool = EchoTool()
+        self.agent = create_agent([self.tool], stream_outputs=True, pipeline_tool_calls=True)
+        self.partial_tool_calls = {}
+        self.started_tool_calls = {}
+
+    def _dispatch(self, *events):
+        for event in events:
+            self.agent._dispatch_streamed_tool_calls(event, self.partial_tool_calls, self.started_tool_calls)
+
+    async def test_starts_once_arguments_are_complete_json(self):
+        self._dispatch(tool_call_delta(0, "call_0", "echo_tool", '{"text": '), tool_call_delta(0, arguments='"a"'))
+        self.assertEqual(self.started_tool_calls, {})
+
+        self._dispatch(tool_call_delta(0, arguments="}"))
+        name, arguments, task, timing = self.started_tool_calls["call_0"]
+        self.assertEqual((name, arguments), ("echo_tool", {"text": "a"}))
+        self.assertEqual(await task, "a")
+        self.assertIsNotNone(timing.end_time)
+
+    async def test_starts_when_model_moves_to_next_call(self):
+        # Lenient arguments that are not strict JSON only start once the next tool call begins
+        self._dispatch(tool_call_delta(0, "call_0", "echo_tool", "{text: 'a'}"))
+        self.assertEqual(self.started_tool_calls, {})
+
+        self._dispatch(tool_call_delta(1, "call_1", "echo_tool", '{"text": '))
+        self.assertEqual(list(self.started_tool_calls), ["call_0"])
+        self.assertEqual(self.started_tool_calls["call_0"][1], {"text": "a"})
+        await self.started_tool_calls["call_0"][2]
+
+    async def test_nothing_after_final_answer_starts(self):
+        self._dispatch(
+            tool_call_delta(0, "call_0", "final_answer_tool", '{"answer": "done"}'),
+            tool_call_delta(1, "call_1", "echo_tool", '{"text": "a"}'),
+            tool_call_delta(2, "call_2", "echo_tool", '{"text": "b"}'),
+        )
+        self.assertEqual(self.started_tool_calls, {})
+        await asyncio.sleep(0)
+        self.assertEqual(self.tool.calls, [])
+
+    async def test_started_call_is_not_dispatched_again(self):
+        self._dispatch(tool_call_delta(0, "call_0", "echo_tool", '{"text": "a"}'))
+        chat_message = ChatMessage(
+            role="assistant",
+            content=None,
+            tool_calls=[
+                ChatMessageToolCall(
+                    function=ChatMessageToolCallFunction(name="echo_tool", arguments={"text": "a"}),
+                    id="call_0",
+                    type="function",
+                )
+            ],
+        )
+        memory_step = ActionStep(step_number=1, timing=Timing(start_time=0.0))
+        [_ async for _ in self.agent.process_tool_calls(chat_message, memory_step, self.started_tool_calls)]
+
+        self.assertEqual(self.tool.calls, ["a"])
+        self.assertEqual(memory_step.observations, "a")
+        self.assertEqual(self.started_tool_calls, {})
+
+    async def test_started_calls_are_cancelled_on_stream_error(self):
+        tool = EchoTool(delay=10)
+        model = FakeModel([tool_call_delta(0, "call_0", "echo_tool", '{"text": "a"}')], error=RuntimeError("reset"))
+        agent = create_agent([tool], model=model, stream_outputs=True, pipeline_tool_calls=True)
+        memory_step = ActionStep(step_number=1, timing=Timing(start_time=0.0))
+
+        with self.assertRaises(AgentGenerationError):
+            [_ async for _ in agent._step_stream(memory_step)]
+        for _ in range(3):
+            await asyncio.sleep(0)
+        self.assertEqual(tool.cancelled, ["a"])
+
+
+class TestToolCallLimits(unittest.IsolatedAsyncioTestCase):
+
+    async def test_timeout_returns_cancelled_observation(self):
+        tool = EchoTool(delay=10)
+        tool.timeout = 0.05
+        agent = create_agent([tool])
+
+        observation = await agent._execute_tool_call_with_limits("echo_tool", {"text": "a"})
+        self.assertTrue(observation.startswith("Tool call cancelled: "))
+        details = json.loads(observation.splitlines()[0].removeprefix("Tool call cancelled: "))
+        self.assertEqual(details["status"], "timeout")
+        self.assertEqual(details["arguments"], {"text": "a"})
+        self.assertEqual(details["timeout_seconds"], 0.05)
+        self.assertEqual(tool.cancelled, ["a"])
+
+    async def test_interrupt_returns_cancelled_observation(self):
+        tool = EchoTool(delay=10)
+        agent = create_agent([tool])
+
+        call = asyncio.create_task(agent._execute_tool_call_with_limits("echo_tool", {"text": "a"}))
+        await asyncio.sleep(0.01)
+        agent.interrupt()
+        observation = await call
+        self.assertIn('"status": "interrupted"', observation)
+        self.assertEqual(tool.cancelled, ["a"])
+
+    async def test_max_concurrency_is_shared_by_agents(self):
+        tool = EchoTool(delay=0.02)
+        tool.max_concurrency = 2
+        agents = [create_agent([tool]), create_agent([tool])]
+
+        results = await asyncio.gather(
+            *[agents[i % 2]._execute_tool_call_with_limits("echo_tool", {"text": str(i)}) for i in range(6)]
+        )
+        self.assertEqual([str(result) for result in results], [str(i) for i in range(6)])
+        self.assertEqual(tool.max_running, 2)
+
+    async def test_plan_step_runs_on_fork(self):
+        tool = TeamMemberTool()
+        agent = create_agent([tool])
+        self.assertEqual(await agent._run_plan_step("worker_agent", "task"), "done: task")
+        self.assertEqual(tool.calls, [("task", True)])
+
+    async def test_plan_step_is_within_limits(self):
+        tool = TeamMemberTool(delay=10)
+        tool.timeout = 0.05
+        agent = create_agent([tool])
+        with self.assertRaises(AgentToolExecutionError) as context:
+            await agent._run_plan_step("worker_agent", "task")
+        self.assertIn('"status": "timeout"', context.exception.message)
+
+    async def test_timed_out_plan_step_blocks_dependents(self):
+        tool = TeamMemberTool(delay=10)
+        tool.timeout = 0.05
+        agent = create_agent([tool, PlanningTool()])
+        planning_tool = agent.tools["planning_tool"]
+        await planning_tool.forward(
+            action="create",
+            plan_id="plan",
+            title="Plan",
+            steps=["first", "second"],
+            dependencies=[[], [0]],
+            assignees=["worker_agent", "worker_agent"],
+        )
+
+        result = await planning_tool.forward(action="execute")
+        self.assertIsNone(result.error)
+        plan = planning_tool.plans["plan"]
+        self.assertEqual(plan["step_statuses"], ["blocked", "not_started"])
+        self.assertIn('"status": "timeout"', plan["step_notes"][0])
+        self.assertEqual(len(tool.calls), 1)
+
+    async def test_runs_of_managed_agents_are_recorded(self):
+        worker = FakeManagedAgent()
+        tool = make_tool_instance(worker)
+        agent = create_agent([tool])
+
+        await agent.execute_tool_call("worker_agent", {"task": "first"})
+        self.assertEqual(await agent._run_plan_step("worker_agent", "second"), "done: second")
+        self.assertEqual([run_agent is worker for run_agent, _ in tool.runs], [True, False])
+        self.assertEqual([memory.steps[0].task for _, memory in tool.runs], ["first", "second"])
+
+
+class TestRunSummaryHandover(unittest.IsolatedAsyncioTestCase):
+
+    def assert_brief_summary(self, summary):
+        self.assertIn("Final answer: Paris", summary)
+        self.assertIn("Key evidence:\n- [step 3, web_fetcher_tool] Page 3", summary)
+        self.assertIn("- [step 4, web_fetcher_tool] Page 4", summary)
+        self.assertNotIn("[step 2,", summary)
+        self.assertIn("Sources:\n- https://example.com/page1\n", summary)
+        self.assertIn("- https://example.com/page3\n", summary)
+        self.assertNotIn("https://example.com/page4", summary)
+        self.assertIn("Full transcript: artifact '", summary)
+        self.assertLessEqual(len(summary), RUN_SUMMARY_MAX_CHARS)
+
+    async def test_tool_path(self):
+        agent = create_agent([make_tool_instance(ResearchingAgent())])
+        result = await agent.execute_tool_call("worker_agent", {"task": "Find the capital of France"})
+        self.assert_brief_summary(result.output)
+
+    async def test_memo_path(self):
+        agent = create_agent([make_tool_instance(ResearchingAgent())], memoize_managed_agents=True)
+        with ManagedAgentMemo.run_scope():
+            result = await agent.execute_tool_call("worker_agent", {"task": "Find the capital of France"})
+        self.assert_brief_summary(result.output)
+
+
+class TestManagedAgentWarmStart(unittest.IsolatedAsyncioTestCase):
+
+    async def test_warm_start_runs_on_fork_from_copied_steps(self):
+        worker = ResearchingAgent()
+        worker.memory.steps.append(TaskStep(task="previous task"))
+        tool = make_tool_instance(worker)
+        agent = create_agent([tool], memoize_managed_agents=True)
+        previous_step = TaskStep(task="Find the capital of France")
+        previous = ManagedAgentCall(task="Find the capital of France", result=None, completed=False, steps=[previous_step])
+        with ManagedAgentMemo.run_scope():
+            memo = ManagedAgentMemo.current()
+            memo.record("worker_agent", previous)
+            await agent.execute_tool_call("worker_agent", {"task": "Find the capital of France"})
+
+        self.assertEqual(memo.warm_starts["worker_agent"], 1)
+        # The shared managed agent and the memo entry it started from are left as they were
+        self.assertEqual([step.task for step in worker.memory.steps], ["previous task"])
+        self.assertEqual(previous.steps, [previous_step])
+        (run_agent, run_memory), = tool.runs
+        self.assertIsNot(run_agent, worker)
+        self.assertEqual(len(run_memory.steps), 6)
+        self.assertEqual(run_memory.steps[0].task, "Find the capital of France")
+        self.assertIsNot(run_memory.steps[0], previous_step)
+
+
+class TestToolSemaphoresAcrossLoops(unittest.TestCase):
+
+    def test_each_event_loop_gets_its_own_semaphores(self):
+        tool = EchoTool(delay=0.01)
+        tool.max_concurrency = 1
+        agent = create_agent([tool])
+
+        async def run():
+            return await asyncio.gather(
+                *[agent._execute_tool_call_with_limits("echo_tool", {"text": text}) for text in ("a", "b")]
+            )
+
+        # A semaphore created in the first loop would fail to wake up waiters in the second one
+        for _ in range(2):
+            self.assertEqual([str(result) for result in asyncio.run(run())], ["a", "b"])
+        self.assertEqual(tool.max_running, 1)
+
+
+class TestClone(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.echo_tool = EchoTool()
+        self.worker = create_agent([self.echo_tool], name="worker_agent", description="Runs echo tasks.")
+        self.agent = create_agent([make_tool_instance(self.worker), PlanningTool()])
+
+    async def test_clone_gets_fresh_run_state(self):
+        self.agent._running_tool_tasks.add(asyncio.create_task(asyncio.sleep(0)))
+        clone = self.agent.clone()
+        self.assertIsNot(clone.memory, self.agent.memory)
+        self.assertEqual(clone.memory.system_prompt.system_prompt, self.agent.memory.system_prompt.system_prompt)
+        self.assertIsNot(clone.monitor, self.agent.monitor)
+        self.assertIn(clone.monitor.update_metrics, clone.step_callbacks)
+        self.assertNotIn(self.agent.monitor.update_metrics, clone.step_callbacks)
+        self.assertEqual(clone._running_tool_tasks, set())
+        self.assertEqual(len(self.agent._running_tool_tasks), 1)
+        # The model and the stateless tools are shared
+        self.assertIs(clone.model, self.agent.model)
+        await asyncio.gather(*self.agent._running_tool_tasks)
+
+    def test_managed_agents_are_forked(self):
+        clone = self.agent.clone()
+        worker_tool = clone.tools["worker_agent"]
+        self.assertIsNot(worker_tool, self.agent.tools["worker_agent"])
+        self.assertIsNot(worker_tool.agent, self.worker)
+        self.assertIsNot(worker_tool.agent.memory, self.worker.memory)
+        self.assertIs(worker_tool.agent.tools["echo_tool"], self.echo_tool)
+
+    async def test_planning_tool_is_bound_to_clone(self):
+        clone = self.agent.clone()
+        planning_tool = clone.tools["planning_tool"]
+        self.assertIsNot(planning_tool, self.agent.tools["planning_tool"])
+        self.assertIs(planning_tool.step_runner.__self__, clone)
+        self.assertIs(self.agent.tools["planning_tool"].step_runner.__self__, self.agent)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import io
+import logging
+import os
+import tempfile
+import unittest
+
+from rich.console import Console
+from rich.rule import Rule
+
+from src.logger.logger import LogLevel, _LogWriter, _WriterHandler, logger
+
+
+class TestLogWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "log.txt")
+        self.console = io.StringIO()
+        self.stream = io.StringIO()
+        self.writer = _LogWriter(
+            Console(file=self.console, width=100),
+            open(self.path, "a", encoding="utf-8"),
+            logging.Formatter("%(levelname)s %(message)s"),
+            stream=self.stream,
+        )
+        self.handler = _WriterHandler(self.writer)
+
+    def tearDown(self):
+        self.writer.close()
+        self.tmp.cleanup()
+
+    def _record(self, msg, args=()):
+        return logging.LogRecord("test", logging.INFO, __file__, 1, msg, args, None)
+
+    def test_messages_are_written_in_order(self):
+        args = ["first"]
+        self.handler.handle(self._record("record %s", (args,)))
+        # The arguments are merged when the record is queued
+        args.append("changed")
+        self.writer.put(Rule("rule"))
+        self.handler.handle(self._record("last record"))
+        self.writer.flush()
+
+        with open(self.path) as f:
+            content = f.read()
+        self.assertIn("INFO record ['first']", content)
+        self.assertLess(content.index("record ['first']"), content.index("rule"))
+        self.assertLess(content.index("rule"), content.index("last record"))
+        self.assertIn("rule", self.console.getvalue())
+        self.assertEqual(self.stream.getvalue(), "INFO record ['first']\nINFO last record\n")
+
+    def test_close_writes_pending_messages(self):
+        for index in range(1000):
+            self.handler.handle(self._record(f"record {index}"))
+        self.writer.close()
+        with open(self.path) as f:
+            self.assertEqual(len(f.readlines()), 1000)
+        # Messages logged after closing are written directly
+        self.handler.handle(self._record("late record"))
+        self.assertTrue(self.stream.getvalue().endswith("INFO late record\n"))
+
+
+class TestAgentLoggerLevels(unittest.TestCase):
+
+    def setUp(self):
+        self.verbosity_level = logger.verbosity_level
+        logger.verbosity_level = LogLevel.INFO
+
+    def tearDown(self):
+        logger.verbosity_level = self.verbosity_level
+
+    def test_is_enabled(self):
+        self.assertTrue(logger.is_enabled(LogLevel.ERROR))
+        self.assertTrue(logger.is_enabled("info"))
+        self.assertFalse(logger.is_enabled(LogLevel.DEBUG))
+
+    def test_filtered_messages_are_not_rendered(self):
+        # Rendering these messages would fail: they are dropped before
+        logger.log_messages([object()], level=LogLevel.DEBUG)
+        logger.log_markdown(content=None, title="title", level=LogLevel.DEBUG)
+
+
+if __name__ == "__main__":
+    unittest.main()
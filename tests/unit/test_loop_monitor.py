@@ -0,0 +1,75 @@
+import asyncio
+import json
+import os
+import tempfile
+import time
+import unittest
+
+from src.logger.loop_monitor import BlockingCallError, LoopMonitor
+from src.logger.tracing import tracer
+
+
+def blocking_tool_call():
+    time.sleep(0.3)
+
+
+class TestLoopMonitor(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        tracer.reset()
+        tracer.enable()
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        tracer.disable()
+        tracer.reset()
+        self.tmp.cleanup()
+
+    async def _run_blocking(self, monitor):
+        async with monitor:
+            await asyncio.sleep(0.1)
+            with tracer.span("web_searcher_tool", "tool"):
+                blocking_tool_call()
+            await asyncio.sleep(0.1)
+
+    async def test_stall_is_caught_and_attributed(self):
+        monitor = LoopMonitor(interval=0.02, threshold=0.1)
+        await self._run_blocking(monitor)
+
+        stall, = monitor.stalls
+        self.assertGreaterEqual(stall.duration, 0.2)
+        self.assertTrue(stall.site.endswith("test_loop_monitor.py:13 in blocking_tool_call"), stall.site)
+        self.assertEqual(stall.span, "tool:web_searcher_tool")
+        report = monitor.report()
+        self.assertEqual(report["stalls"], 1)
+        self.assertEqual(report["sites"][stall.site]["spans"], ["tool:web_searcher_tool"])
+        self.assertGreater(report["samples"], 5)
+        self.assertIn("1 stalls", monitor.format_report())
+
+        path = os.path.join(self.tmp.name, "loop.json")
+        monitor.export_json(path)
+        with open(path) as f:
+            self.assertEqual(json.load(f)["stalls"][0]["site"], stall.site)
+
+    async def test_check_fails_on_new_blocking_sites(self):
+        baseline = os.path.join(self.tmp.name, "baseline.json")
+        monitor = LoopMonitor(interval=0.02, threshold=0.1, baseline=baseline)
+        await self._run_blocking(monitor)
+        with self.assertRaises(BlockingCallError) as context:
+            monitor.check()
+        self.assertIn("blocking_tool_call", str(context.exception))
+
+        monitor.write_baseline()
+        monitor.check()
+
+    async def test_no_stall(self):
+        monitor = LoopMonitor(interval=0.02, threshold=0.1)
+        async with monitor:
+            await asyncio.sleep(0.1)
+        self.assertEqual(monitor.stalls, [])
+        self.assertFalse(monitor.running)
+        monitor.check()
+
+
+if __name__ == "__main__":
+    unittest.main()
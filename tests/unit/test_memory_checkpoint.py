@@ -0,0 +1,139 @@
+import json
+import os
+import tempfile
+import unittest
+
+from PIL import Image
+
+from src.exception import AgentExecutionError
+from src.logger import Timing, TokenUsage
+from src.memory import (
+    ActionStep,
+    AgentMemory,
+    MemoryCheckpoint,
+    PlanningStep,
+    TaskStep,
+    ToolCall,
+)
+from src.models import ChatMessage, MessageRole
+
+
+class FakeLogger:
+    def log_error(self, message):
+        pass
+
+
+def _action_step(step_number, **kwargs):
+    return ActionStep(
+        step_number=step_number,
+        timing=Timing(start_time=0.0, end_time=1.0),
+        model_output=f"Thought {step_number}",
+        observations=f"Observation {step_number}",
+        **kwargs,
+    )
+
+
+class TestMemoryCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "checkpoints", "task.jsonl")
+        self.memory = AgentMemory(system_prompt="system")
+        self.image = Image.new("RGB", (8, 8), "red")
+        self.memory.steps.append(TaskStep(task="task", task_images=[self.image]))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _lines(self):
+        with open(self.path) as f:
+            return f.read().splitlines()
+
+    def _records(self):
+        return [json.loads(line) for line in self._lines()]
+
+    def test_round_trip(self):
+        checkpoint = MemoryCheckpoint(self.path)
+        checkpoint.start("task")
+        self.memory.steps.append(
+            PlanningStep(
+                model_input_messages=[],
+                model_output_message=ChatMessage(role=MessageRole.ASSISTANT, content="plan"),
+                plan="plan",
+                timing=Timing(start_time=0.0, end_time=1.0),
+            )
+        )
+        step = _action_step(
+            1,
+            tool_calls=[ToolCall(name="web_searcher", arguments={"query": "q"}, id="call_1")],
+            error=AgentExecutionError("failed", FakeLogger()),
+            observations_images=[self.image.copy()],
+            token_usage=TokenUsage(input_tokens=10, output_tokens=2),
+        )
+        step.model_input_reference = self.memory.reference_messages()
+        self.memory.steps.append(step)
+        checkpoint.save(self.memory, 2, {"count": 1, "unserializable": object()})
+
+        loaded = MemoryCheckpoint.load(self.path)
+        self.assertEqual(loaded.task, "task")
+        self.assertEqual(loaded.step_number, 2)
+        self.assertEqual(loaded.state, {"count": 1})
+        self.assertFalse(loaded.finished)
+        action_step = loaded.steps[-1]
+        self.assertIsInstance(action_step.error, AgentExecutionError)
+        self.assertEqual(action_step.error.message, "failed")
+        self.assertEqual(action_step.tool_calls[0].arguments, {"query": "q"})
+        self.assertEqual(action_step.token_usage.total_tokens, 12)
+        self.assertEqual(loaded.steps[1].plan, "plan")
+
+        # The same image is written once
+        self.assertEqual(sum(record["type"] == "image" for record in self._records()), 1)
+
+        # The model input of the step can still be rebuilt
+        memory = AgentMemory(system_prompt="system")
+        memory.steps.extend(loaded.steps)
+        self.assertEqual(len(memory.get_model_input_messages(action_step)), 4)
+
+    def test_append_only(self):
+        checkpoint = MemoryCheckpoint(self.path)
+        checkpoint.start("task")
+        self.memory.steps.append(_action_step(1))
+        checkpoint.save(self.memory, 2, {})
+        self.memory.steps.append(_action_step(2))
+        checkpoint.save(self.memory, 3, {})
+        self.assertEqual([record["type"] for record in self._records()].count("step"), 3)
+
+        # Rewritten steps are appended again and supersede the previous ones
+        self.memory.steps[2] = _action_step(2, action_output="answer", is_final_answer=True)
+        checkpoint.save(self.memory, 3, {}, final_answer="answer", finished=True)
+        self.assertEqual([record["type"] for record in self._records()].count("step"), 4)
+
+        # A line truncated by a crash is ignored
+        with open(self.path, "a") as f:
+            f.write('{"type": "step", "ind')
+
+        loaded = MemoryCheckpoint.load(self.path)
+        self.assertEqual(len(loaded.steps), 3)
+        self.assertTrue(loaded.steps[-1].is_final_answer)
+        self.assertTrue(loaded.finished)
+        self.assertEqual(loaded.final_answer, "answer")
+
+        # Saving after a resume only appends what changed
+        memory = AgentMemory(system_prompt="system")
+        memory.steps.extend(loaded.steps)
+        num_lines = len(self._lines())
+        loaded.save(memory, 3, {})
+        self.assertEqual(len(self._lines()), num_lines + 1)
+        self.assertEqual(json.loads(self._lines()[-1])["type"], "state")
+
+    def test_new_run_replaces_previous(self):
+        checkpoint = MemoryCheckpoint(self.path)
+        checkpoint.start("first task")
+        checkpoint.save(self.memory, 1, {})
+        checkpoint.start("second task")
+        with self.assertRaises(ValueError):
+            MemoryCheckpoint.load(self.path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+from unittest.mock import patch
+
+from src.logger import Timing
+from src.memory import ActionStep, AgentMemory, MemoryCompactor, TaskStep
+from src.models import ChatMessage, MessageRole
+
+
+class FakeModel:
+    def __init__(self):
+        self.calls = 0
+
+    async def __call__(self, messages, **kwargs):
+        self.calls += 1
+        return ChatMessage(role=MessageRole.ASSISTANT, content="short summary")
+
+
+def _count_words(text):
+    return len(text.split())
+
+
+@patch("src.memory.compaction._count_tokens", _count_words)
+class TestMemoryCompactor(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.model = FakeModel()
+        self.compactor = MemoryCompactor(
+            self.model,
+            max_tokens=600,
+            target_tokens=480,
+            keep_recent_steps=1,
+            min_observation_tokens=50,
+            summary_max_words=20,
+        )
+        self.memory = AgentMemory(system_prompt="system")
+        self.memory.steps.append(TaskStep(task="task"))
+
+    def _add_step(self, step_number, observations):
+        self.memory.steps.append(
+            ActionStep(step_number=step_number, timing=Timing(start_time=0.0), observations=observations)
+        )
+
+    async def test_under_budget(self):
+        self._add_step(1, "word " * 100)
+        self.assertEqual(await self.compactor.compact(self.memory), 0)
+        self.assertEqual(self.model.calls, 0)
+
+    async def test_old_observations_are_summarized(self):
+        for step_number in range(1, 5):
+            self._add_step(step_number, f"observation {step_number} " + "word " * 200)
+        self.memory.to_messages()
+
+        tokens_saved = await self.compactor.compact(self.memory)
+        self.assertGreater(tokens_saved, 0)
+        steps = self.memory.steps[1:]
+        # Oldest first, until the target is expected to be met, and never the most recent step
+        self.assertEqual([step.observations_summary for step in steps], ["short summary"] * 2 + [None] * 2)
+        self.assertTrue(steps[0].observations.startswith("observation 1"))
+        self.assertEqual(self.memory.to_messages()[2].content[0]["text"], "Observation (summarized):\nshort summary")
+
+        stats = self.compactor.stats()
+        self.assertEqual(stats["compactions"], 1)
+        self.assertEqual(stats["summarized_steps"], 2)
+        self.assertEqual(stats["tokens_saved"], tokens_saved)
+
+    async def test_summaries_are_computed_once(self):
+        for step_number in range(1, 4):
+            self._add_step(step_number, "word " * 300)
+        await self.compactor.compact(self.memory)
+        self.assertEqual(self.model.calls, 1)
+        self.assertEqual(self.compactor.stats()["cache_hits"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
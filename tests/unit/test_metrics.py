@@ -0,0 +1,80 @@
+import json
+import os
+import tempfile
+import unittest
+import urllib.request
+
+from src.logger.metrics import HdrHistogram, MetricsRegistry, metrics
+
+
+class TestHdrHistogram(unittest.TestCase):
+
+    def test_quantiles_within_relative_error(self):
+        histogram = HdrHistogram(sub_buckets=128)
+        values = [0.001 * (1.05 ** index) for index in range(300)]
+        for value in values:
+            histogram.record(value)
+        for q in (0.5, 0.9, 0.99):
+            expected = values[int(q * len(values)) - 1]
+            self.assertAlmostEqual(histogram.quantile(q) / expected, 1.0, delta=0.06)
+        self.assertEqual(histogram.count, 300)
+        self.assertEqual(histogram.quantile(1.0), histogram.max)
+
+    def test_empty(self):
+        self.assertIsNone(HdrHistogram().quantile(0.5))
+
+
+class TestMetricsRegistry(unittest.TestCase):
+
+    def setUp(self):
+        metrics.reset()
+
+    def tearDown(self):
+        metrics.shutdown()
+        metrics.reset()
+
+    def test_singleton(self):
+        self.assertIs(MetricsRegistry(), metrics)
+
+    def test_counters_gauges_and_histograms(self):
+        metrics.counter("tool_cache_requests_total").inc(tool="web_fetcher_tool", result="hit")
+        metrics.counter("tool_cache_requests_total").inc(2, result="hit", tool="web_fetcher_tool")
+        gauge = metrics.gauge("tool_calls_in_flight")
+        gauge.inc(tool="web_fetcher_tool")
+        gauge.dec(tool="web_fetcher_tool")
+        for value in (0.1, 0.2, 0.3):
+            metrics.histogram("tool_call_seconds").observe(value, tool="web_fetcher_tool")
+
+        self.assertEqual(metrics.counter("tool_cache_requests_total").get(tool="web_fetcher_tool", result="hit"), 3)
+        self.assertEqual(gauge.get(tool="web_fetcher_tool"), 0)
+        self.assertEqual(metrics.histogram("tool_call_seconds").get(tool="web_fetcher_tool").count, 3)
+        with self.assertRaises(ValueError):
+            metrics.gauge("tool_cache_requests_total")
+
+        snapshot = metrics.snapshot()["metrics"]["tool_call_seconds"]
+        self.assertEqual(snapshot["type"], "summary")
+        self.assertAlmostEqual(snapshot["values"][0]["p50"], 0.2, delta=0.01)
+
+    def test_prometheus_endpoint_and_snapshots(self):
+        metrics.counter("agent_steps_total", "Agent steps.").inc(agent='say "hi"')
+        metrics.histogram("model_call_seconds").observe(1.5, model="gpt-4.1")
+        text = metrics.prometheus()
+        self.assertIn("# HELP agent_steps_total Agent steps.\n# TYPE agent_steps_total counter\n", text)
+        self.assertIn('agent_steps_total{agent="say \\"hi\\""} 1.0', text)
+        self.assertIn('model_call_seconds{model="gpt-4.1",quantile="0.5"}', text)
+        self.assertIn('model_call_seconds_count{model="gpt-4.1"} 1', text)
+
+        port = metrics.serve(port=0)
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+            self.assertEqual(response.read().decode(), metrics.prometheus())
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "metrics.jsonl")
+            metrics.write_snapshot(path)
+            with open(path) as f:
+                snapshot = json.loads(f.readline())
+        self.assertEqual(snapshot["metrics"]["agent_steps_total"]["values"][0]["value"], 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import json
+import os
+import tempfile
+import unittest
+
+from src.logger.ledger import ModelLedger, model_ledger
+
+
+class TestModelLedger(unittest.TestCase):
+
+    def setUp(self):
+        model_ledger.reset()
+
+    def tearDown(self):
+        model_ledger.reset()
+
+    def test_singleton(self):
+        self.assertIs(ModelLedger(), model_ledger)
+
+    def test_track_records_usage_and_cost(self):
+        with model_ledger.caller("agent"), model_ledger.caller("tool"):
+            with model_ledger.track("openai/gpt-4.1") as call:
+                call.mark_dispatched()
+                model_ledger.note_request_attempt()
+                model_ledger.note_request_attempt()
+                call.set_usage(1000, 100, cached_tokens=400)
+
+        record, = model_ledger.records
+        self.assertEqual(record.caller, "agent/tool")
+        self.assertEqual(record.retries, 1)
+        self.assertAlmostEqual(record.cost, (600 * 2.0 + 400 * 0.5 + 100 * 8.0) / 1_000_000)
+
+    def test_errors_are_recorded(self):
+        with self.assertRaises(RuntimeError):
+            with model_ledger.track("unpriced-model"):
+                raise RuntimeError("boom")
+
+        record, = model_ledger.records
+        self.assertIn("boom", record.error)
+        self.assertIsNone(record.cost)
+        self.assertEqual(record.attempts, 1)
+        self.assertIsNone(record.queue_seconds)
+        self.assertIsNone(model_ledger.aggregate()["unpriced-model"]["mean_queue_seconds"])
+
+    def test_aggregate_and_export(self):
+        for _ in range(3):
+            with model_ledger.track("gpt-4o") as call:
+                call.set_usage(10, 5)
+
+        stats = model_ledger.aggregate()["gpt-4o"]
+        self.assertEqual(stats["calls"], 3)
+        self.assertEqual(stats["prompt_tokens"], 30)
+        self.assertEqual(stats["completion_tokens"], 15)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "model_calls.jsonl")
+            model_ledger.export_jsonl(path)
+            model_ledger.export_jsonl(path)
+            with open(path) as f:
+                lines = [json.loads(line) for line in f]
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(lines[0]["model_id"], "gpt-4o")
+
+
+if __name__ == "__main__":
+    unittest.main()
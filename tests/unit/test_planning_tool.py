@@ -0,0 +1,75 @@
+import asyncio
+import unittest
+
+from src.tools.planning import PlanningTool
+
+
+class TestPlanningToolExecution(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.tool = PlanningTool(max_parallel_steps=2)
+        self.running = 0
+        self.max_running = 0
+        self.tasks = []
+
+        async def step_runner(agent_name, task):
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+            self.tasks.append(task)
+            await asyncio.sleep(0.01)
+            self.running -= 1
+            if "fail" in task:
+                raise RuntimeError("step failed")
+            return f"{agent_name} done: {task.splitlines()[0]}"
+
+        self.tool.step_runner = step_runner
+
+    async def _create(self, steps, dependencies, assignees):
+        return await self.tool.forward(
+            action="create", plan_id="plan", title="Plan", steps=steps, dependencies=dependencies, assignees=assignees
+        )
+
+    async def test_invalid_graphs(self):
+        result = await self._create(["a", "b"], [[1], [0]], ["researcher", "researcher"])
+        self.assertIn("cycle", result.error)
+        result = await self._create(["a", "b"], [[2], []], ["researcher", "researcher"])
+        self.assertIn("Invalid dependency", result.error)
+        result = await self._create(["a", "b"], [[]], ["researcher", "researcher"])
+        self.assertIn("one entry per step", result.error)
+
+    async def test_execute_follows_dependencies(self):
+        await self._create(
+            ["fact a", "fact b", "fact c", "combine", "do it myself"],
+            [[], [], [], [0, 1, 2], []],
+            ["researcher", "researcher", "analyzer", "analyzer", ""],
+        )
+        result = await self.tool.forward(action="execute")
+        self.assertIsNone(result.error)
+        plan = self.tool.plans["plan"]
+        self.assertEqual(plan["step_statuses"], ["completed"] * 4 + ["not_started"])
+        self.assertEqual(self.max_running, 2)
+        # The dependent step runs last, with the results of its dependencies
+        self.assertTrue(self.tasks[-1].startswith("combine"))
+        self.assertIn("researcher done: fact a", self.tasks[-1])
+        self.assertIn("(depends on: 0, 1, 2) [analyzer]", result.output)
+
+        result = await self.tool.forward(action="execute")
+        self.assertIn("No step of plan 'plan' is ready", result.error)
+
+    async def test_failed_step_blocks_dependents(self):
+        await self._create(["fail first", "second"], [[], [0]], ["researcher", "researcher"])
+        await self.tool.forward(action="execute")
+        plan = self.tool.plans["plan"]
+        self.assertEqual(plan["step_statuses"], ["blocked", "not_started"])
+        self.assertIn("step failed", plan["step_notes"][0])
+
+    async def test_update_keeps_graph_of_unchanged_steps(self):
+        await self._create(["a", "b"], [[], [0]], ["researcher", "analyzer"])
+        await self.tool.forward(action="update", plan_id="plan", steps=["a", "b", "c"])
+        plan = self.tool.plans["plan"]
+        self.assertEqual(plan["step_dependencies"], [[], [0], []])
+        self.assertEqual(plan["step_assignees"], ["researcher", "analyzer", ""])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,131 @@
+import unittest
+from types import SimpleNamespace
+
+from src.logger import Timing, TokenUsage
+from src.memory import (
+    ActionStep,
+    AgentMemory,
+    PlanningStep,
+    TaskStep,
+    ToolCall,
+    build_run_report,
+    format_run_report,
+)
+from src.models import ChatMessage, MessageRole
+
+
+def _tool_call(name, start, end):
+    return ToolCall(name=name, arguments={}, id=name, timing=Timing(start_time=start, end_time=end))
+
+
+def _agent(name, model_id, steps, tools=None):
+    memory = AgentMemory(system_prompt="system")
+    memory.steps.extend([TaskStep(task="task"), *steps])
+    return SimpleNamespace(name=name, model=SimpleNamespace(model_id=model_id), memory=memory, tools=tools or {})
+
+
+class TestRunReport(unittest.TestCase):
+
+    def setUp(self):
+        researcher = _agent(
+            "deep_researcher_agent",
+            "gpt-4.1",
+            [
+                ActionStep(
+                    step_number=1,
+                    timing=Timing(start_time=0.0, end_time=4.0),
+                    tool_calls=[_tool_call("web_searcher_tool", 1.0, 3.0)],
+                    token_usage=TokenUsage(input_tokens=100, output_tokens=10),
+                )
+            ],
+        )
+        self.agent = _agent(
+            "planning_agent",
+            "o3",
+            [
+                PlanningStep(
+                    model_input_messages=[],
+                    model_output_message=ChatMessage(role=MessageRole.ASSISTANT, content="plan"),
+                    plan="plan",
+                    timing=Timing(start_time=0.0, end_time=2.0),
+                    token_usage=TokenUsage(input_tokens=50, output_tokens=20),
+                ),
+                # Two concurrent tool calls: 4s and 6s long, covering 7s of a 10s step
+                ActionStep(
+                    step_number=1,
+                    timing=Timing(start_time=2.0, end_time=12.0),
+                    tool_calls=[
+                        _tool_call("deep_researcher_agent", 3.0, 7.0),
+                        _tool_call("deep_analyzer_agent", 4.0, 10.0),
+                    ],
+                    token_usage=TokenUsage(input_tokens=200, output_tokens=30),
+                ),
+            ],
+            tools={"deep_researcher_agent": SimpleNamespace(agent=researcher), "web": SimpleNamespace()},
+        )
+
+    def test_aggregates(self):
+        report = build_run_report(self.agent)
+        self.assertEqual(report["total_seconds"], 12.0)
+        self.assertEqual(report["tool_seconds"], 10.0)
+        self.assertEqual(report["tool_wall_seconds"], 7.0)
+        # Model time (2s + 3s) plus the longest tool call (6s)
+        self.assertEqual(report["critical_path_seconds"], 11.0)
+        self.assertEqual(report["tool_parallelism"], 1.43)
+        self.assertEqual(list(report["by_agent"]), ["planning_agent", "planning_agent/deep_researcher_agent"])
+        self.assertEqual(report["by_step_type"]["ActionStep"]["steps"], 2)
+        self.assertEqual(report["by_step_type"]["PlanningStep"]["input_tokens"], 50)
+        self.assertEqual(report["by_tool"]["deep_analyzer_agent"]["critical_seconds"], 6.0)
+        self.assertNotIn("critical_seconds", report["by_tool"]["deep_researcher_agent"])
+        self.assertEqual(report["by_model"]["o3"]["seconds"], 5.0)
+        self.assertEqual(report["by_model"]["gpt-4.1"]["seconds"], 2.0)
+        slowest = report["slowest_steps"][0]
+        self.assertEqual((slowest["agent"], slowest["critical_tool"]), ("planning_agent", "deep_analyzer_agent"))
+
+    def test_every_run_of_managed_agents(self):
+        def action_step(start, end):
+            return ActionStep(step_number=1, timing=Timing(start_time=start, end_time=end))
+
+        browser = _agent("browser_agent", "gpt-4.1", [action_step(0.0, 1.0)])
+        browser_tool = SimpleNamespace(agent=browser, runs=[(browser, browser.memory)])
+        researcher = _agent("deep_researcher_agent", "gpt-4.1", [], tools={"browser_agent": browser_tool})
+        # A fork of the researcher, run for a plan step, with managed agents of its own
+        fork_browser = _agent("browser_agent", "gpt-4.1", [action_step(0.0, 2.0)])
+        fork = _agent(
+            "deep_researcher_agent",
+            "gpt-4.1",
+            [],
+            tools={"browser_agent": SimpleNamespace(agent=fork_browser, runs=[(fork_browser, fork_browser.memory)])},
+        )
+        runs = [
+            _agent("deep_researcher_agent", "gpt-4.1", [action_step(0.0, 3.0)]).memory,
+            _agent("deep_researcher_agent", "gpt-4.1", [action_step(0.0, 4.0)]).memory,
+            _agent("deep_researcher_agent", "gpt-4.1", [action_step(0.0, 5.0)]).memory,
+        ]
+        agent = _agent(
+            "planning_agent",
+            "o3",
+            [],
+            tools={
+                "deep_researcher_agent": SimpleNamespace(
+                    agent=researcher, runs=[(researcher, runs[0]), (researcher, runs[1]), (fork, runs[2])]
+                )
+            },
+        )
+
+        by_agent = build_run_report(agent)["by_agent"]
+        self.assertEqual(by_agent["planning_agent/deep_researcher_agent"]["runs"], 3)
+        self.assertEqual(by_agent["planning_agent/deep_researcher_agent"]["seconds"], 12.0)
+        # The browser runs once for the researcher and once for its fork
+        self.assertEqual(by_agent["planning_agent/deep_researcher_agent/browser_agent"]["runs"], 2)
+        self.assertEqual(by_agent["planning_agent/deep_researcher_agent/browser_agent"]["seconds"], 3.0)
+
+    def test_format(self):
+        text = format_run_report(build_run_report(self.agent))
+        self.assertTrue(text.startswith("Run: 12.0s (critical path 11.0s), tools 10.0s in 7.0s (parallelism 1.43)"))
+        self.assertIn("deep_analyzer_agent", text)
+        self.assertIn("slowest steps:", text)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+
+from src.logger import Timing
+from src.memory import (
+    ActionStep,
+    AgentMemory,
+    TaskStep,
+    ToolCall,
+    format_run_summary,
+    render_transcript,
+)
+
+
+class TestRunSummary(unittest.TestCase):
+
+    def setUp(self):
+        self.memory = AgentMemory(system_prompt="system")
+        self.memory.steps.append(TaskStep(task="Find the capital of France"))
+        for step_number in range(1, 9):
+            url = f"https://example.com/page{step_number}"
+            self.memory.steps.append(
+                ActionStep(
+                    step_number=step_number,
+                    timing=Timing(start_time=0.0),
+                    tool_calls=[ToolCall(name="web_fetcher_tool", arguments={"url": url}, id=str(step_number))],
+                    observations=f"Page {step_number}: Paris is the capital. " + "filler " * 200,
+                )
+            )
+
+    def test_summary_sections(self):
+        summary = format_run_summary(
+            self.memory, "Paris", name="deep_researcher_agent", transcript_handle="artifact_0123456789abcdef"
+        )
+        self.assertTrue(summary.startswith('<run_summary agent="deep_researcher_agent">\nFinal answer: Paris'))
+        self.assertIn("Key evidence:\n- [step 4, web_fetcher_tool] Page 4: Paris is the capital.", summary)
+        self.assertNotIn("[step 3,", summary)
+        self.assertIn("Sources:\n- https://example.com/page1\n", summary)
+        self.assertIn("artifact 'artifact_0123456789abcdef' (8 steps", summary)
+        self.assertTrue(summary.endswith("</run_summary>"))
+
+    def test_answer_and_transcript_only(self):
+        summary = format_run_summary(
+            self.memory, "Paris", transcript_handle="artifact_0123456789abcdef", max_evidence=0, max_sources=0
+        )
+        self.assertNotIn("Key evidence:", summary)
+        self.assertNotIn("Sources:", summary)
+        self.assertEqual(len(summary.splitlines()), 4)
+        self.assertIn("Final answer: Paris", summary)
+        self.assertIn("artifact 'artifact_0123456789abcdef'", summary)
+
+    def test_size_cap_drops_oldest_evidence(self):
+        summary = format_run_summary(self.memory, "Paris", max_chars=1200)
+        self.assertLessEqual(len(summary), 1200)
+        self.assertIn("[step 8,", summary)
+        self.assertNotIn("[step 4,", summary)
+
+    def test_transcript_contains_observations(self):
+        transcript = render_transcript(self.memory)
+        self.assertIn("Find the capital of France", transcript)
+        self.assertIn("Page 8: Paris is the capital.", transcript)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,24 @@
+import unittest
+
+from jinja2 import Template, UndefinedError
+
+from src.utils import compile_template
+
+
+class TestCompileTemplate(unittest.TestCase):
+
+    def test_compiled_once(self):
+        source = "Hello {{ name }}!\n{% for tool in tools %}- {{ tool }}\n{% endfor %}"
+        self.assertIs(compile_template(source), compile_template(source))
+        self.assertEqual(
+            compile_template(source).render(name="agent", tools=["a", "b"]),
+            Template(source).render(name="agent", tools=["a", "b"]),
+        )
+
+    def test_strict_undefined(self):
+        with self.assertRaises(UndefinedError):
+            compile_template("{{ missing }}").render()
+
+
+if __name__ == "__main__":
+    unittest.main()
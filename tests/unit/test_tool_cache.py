@@ -0,0 +1,111 @@
+import asyncio
+import unittest
+
+from src.tools.cache import (
+    ManagedAgentCall,
+    ManagedAgentMemo,
+    ToolResultCache,
+    canonicalize_arguments,
+    normalize_task,
+)
+
+
+class FakeTool:
+    name = "fake_tool"
+    cacheable = True
+    cache_ttl = None
+
+    def __init__(self):
+        self.calls = 0
+
+    def is_cacheable_result(self, result):
+        return result != "error"
+
+    async def run(self, result="result"):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        return result
+
+
+class TestCanonicalizeArguments(unittest.TestCase):
+
+    def test_key_order_and_whitespace(self):
+        self.assertEqual(
+            canonicalize_arguments({"b": 1, "a": " x "}),
+            canonicalize_arguments({"a": "x", "b": 1}),
+        )
+
+    def test_string_arguments(self):
+        self.assertEqual(canonicalize_arguments("  query "), "query")
+
+
+class TestToolResultCache(unittest.IsolatedAsyncioTestCase):
+
+    async def test_hit_after_miss(self):
+        cache, tool = ToolResultCache(), FakeTool()
+        first, first_hit = await cache.get_or_call(tool, {"url": "a"}, tool.run)
+        second, second_hit = await cache.get_or_call(tool, {"url": " a"}, tool.run)
+        self.assertEqual((first, first_hit, second, second_hit), ("result", False, "result", True))
+        self.assertEqual(tool.calls, 1)
+        self.assertEqual(cache.stats(), {"fake_tool": {"hits": 1, "misses": 1}})
+
+    async def test_concurrent_calls_share_execution(self):
+        cache, tool = ToolResultCache(), FakeTool()
+        results = await asyncio.gather(*[cache.get_or_call(tool, {"url": "a"}, tool.run) for _ in range(3)])
+        self.assertEqual([result for result, _ in results], ["result"] * 3)
+        self.assertEqual(tool.calls, 1)
+
+    async def test_uncacheable_result_and_ttl(self):
+        cache, tool = ToolResultCache(), FakeTool()
+        await cache.get_or_call(tool, {"url": "a"}, lambda: tool.run("error"))
+        await cache.get_or_call(tool, {"url": "a"}, lambda: tool.run("error"))
+        self.assertEqual(tool.calls, 2)
+
+        tool.cache_ttl = -1
+        await cache.get_or_call(tool, {"url": "b"}, tool.run)
+        await cache.get_or_call(tool, {"url": "b"}, tool.run)
+        self.assertEqual(tool.calls, 4)
+
+    async def test_run_scope_is_shared_by_nested_runs(self):
+        self.assertIsNone(ToolResultCache.current())
+        with ToolResultCache.run_scope() as outer:
+            with ToolResultCache.run_scope() as inner:
+                self.assertIs(outer, inner)
+        self.assertIsNone(ToolResultCache.current())
+
+
+class TestManagedAgentMemo(unittest.TestCase):
+
+    def setUp(self):
+        self.memo = ManagedAgentMemo()
+        self.memo.record(
+            "deep_researcher_agent",
+            ManagedAgentCall(task="Find the population of Paris in 2020.", result="2.1 million", completed=True),
+        )
+
+    def test_normalize_task(self):
+        self.assertEqual(normalize_task("  Find the\n population  of Paris?! "), "find the population of paris")
+
+    def test_exact_match_after_normalization(self):
+        call, similarity = self.memo.find("deep_researcher_agent", "find the population of  Paris in 2020")
+        self.assertEqual((call.result, similarity), ("2.1 million", 1.0))
+        self.assertEqual(self.memo.find("deep_analyzer_agent", "Find the population of Paris in 2020."), (None, 0.0))
+
+    def test_similarity_threshold(self):
+        task = "Find the population of Paris, France in 2020"
+        self.assertIsNone(self.memo.find("deep_researcher_agent", task)[0])
+        call, similarity = self.memo.find("deep_researcher_agent", task, similarity_threshold=0.8)
+        self.assertEqual(call.result, "2.1 million")
+        self.assertGreaterEqual(similarity, 0.8)
+        self.assertIsNone(self.memo.find("deep_researcher_agent", "Find the area of Rome", 0.8)[0])
+
+    def test_run_scope_is_shared_by_nested_runs(self):
+        self.assertIsNone(ManagedAgentMemo.current())
+        with ManagedAgentMemo.run_scope() as outer:
+            with ManagedAgentMemo.run_scope() as inner:
+                self.assertIs(outer, inner)
+        self.assertIsNone(ManagedAgentMemo.current())
+
+
+if __name__ == "__main__":
+    unittest.main()
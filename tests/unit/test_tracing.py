@@ -0,0 +1,79 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+
+from src.logger.tracing import Tracer, tracer
+
+
+class TestTracer(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        tracer.reset()
+        tracer.enable()
+
+    def tearDown(self):
+        tracer.disable()
+        tracer.reset()
+
+    def test_singleton(self):
+        self.assertIs(Tracer(), tracer)
+
+    async def test_spans_nest_across_tasks(self):
+        async def tool_call(name):
+            with tracer.span(name, "tool") as span:
+                await asyncio.sleep(0.01)
+                span.set(cache_hit=False)
+
+        with tracer.span("agent", "run") as run_span:
+            with tracer.span("step 1", "step"):
+                await asyncio.gather(tool_call("web_searcher_tool"), tool_call("web_fetcher_tool"))
+
+        spans = {span.name: span for span in tracer.spans}
+        step = spans["step 1"]
+        self.assertEqual(step.parent_id, run_span.span_id)
+        for name in ("web_searcher_tool", "web_fetcher_tool"):
+            self.assertEqual(spans[name].parent_id, step.span_id)
+            self.assertEqual(spans[name].trace_id, run_span.span_id)
+            self.assertEqual(spans[name].attributes, {"cache_hit": False})
+        # Concurrent tool calls run in their own asyncio task, hence their own lane
+        self.assertNotEqual(spans["web_searcher_tool"].lane, spans["web_fetcher_tool"].lane)
+        self.assertIsNone(tracer.current_span())
+
+    def test_errors_are_recorded(self):
+        with self.assertRaises(RuntimeError):
+            with tracer.span("model", "model"):
+                raise RuntimeError("boom")
+        span, = tracer.spans
+        self.assertEqual(span.error, "RuntimeError: boom")
+        self.assertIsNotNone(span.duration)
+
+    def test_disabled(self):
+        tracer.disable()
+        with tracer.span("agent", "run") as span:
+            span.set(steps=1)
+            tracer.annotate(memo_hit=True)
+        self.assertEqual(tracer.spans, [])
+
+    def test_export(self):
+        with tracer.span("agent", "run", max_steps=3):
+            tracer.annotate(steps=2)
+        with tempfile.TemporaryDirectory() as tmp:
+            jsonl_path = os.path.join(tmp, "trace.jsonl")
+            chrome_path = os.path.join(tmp, "trace.json")
+            # A rerun replaces the trace instead of adding its spans to the previous ones
+            tracer.export_jsonl(jsonl_path)
+            tracer.export_jsonl(jsonl_path)
+            tracer.export_chrome_trace(chrome_path)
+            with open(jsonl_path) as f:
+                record, = [json.loads(line) for line in f]
+            with open(chrome_path) as f:
+                event, = json.load(f)["traceEvents"]
+        self.assertEqual(record["attributes"], {"max_steps": 3, "steps": 2})
+        self.assertEqual((event["name"], event["cat"], event["ph"]), ("agent", "run", "X"))
+        self.assertEqual(event["args"], {"max_steps": 3, "steps": 2})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,186 @@
+import importlib.util
+import queue
+import unittest
+from collections import OrderedDict
+from threading import Lock
+
+from src.logger import model_ledger
+from src.models.base import (
+    ChatMessage,
+    MessageRole,
+    TransformersModel,
+    longest_common_prefix_length,
+)
+
+HAS_TORCH = importlib.util.find_spec("torch") is not None and importlib.util.find_spec("transformers") is not None
+TINY_MODEL_ID = "hf-internal-testing/tiny-random-LlamaForCausalLM"
+
+
+def _user_message(text):
+    return ChatMessage(role=MessageRole.USER, content=[{"type": "text", "text": text}])
+
+
+class TokenIds(list):
+    def tolist(self):
+        return list(self)
+
+
+class PromptIds(list):
+    """Batch of one prompt, indexed like the input ids tensor."""
+
+    @property
+    def shape(self):
+        return (1, len(self[0]))
+
+
+class FakeCache:
+    """Past-key-values holding one entry per token."""
+
+    def __init__(self):
+        self.ids = []
+
+    def crop(self, length):
+        self.ids = self.ids[:length]
+
+    def get_seq_length(self):
+        return len(self.ids)
+
+
+class FakeStreamer:
+    def __init__(self):
+        self.queue = queue.Queue()
+
+    def put(self, text):
+        self.queue.put(text)
+
+    def end(self):
+        self.queue.put(None)
+
+    def __iter__(self):
+        while (text := self.queue.get()) is not None:
+            yield text
+
+
+class FakeGenerator:
+    """Stands for the transformers model: encodes the uncached prompt tokens, then fails if asked to."""
+
+    def __init__(self):
+        self.encoded = []
+        self.fail = False
+
+    def generate(self, inputs, past_key_values, streamer, **kwargs):
+        prompt_ids = inputs[0].tolist()
+        self.encoded.append(len(prompt_ids) - past_key_values.get_seq_length())
+        past_key_values.ids = prompt_ids + [0]
+        if self.fail:
+            raise RuntimeError("out of memory")
+        streamer.put("answer")
+        streamer.end()
+
+
+class FakeTransformersModel(TransformersModel):
+    """Transformers model without torch: the prompt is given as token ids and generation is faked."""
+
+    def __init__(self, prefix_cache_size=8):
+        self.model = FakeGenerator()
+        self.streamer = FakeStreamer()
+        self.prefix_cache = True
+        self.prefix_cache_max_tokens = 32768
+        self.prefix_cache_size = prefix_cache_size
+        self._prefix_caches = OrderedDict()
+        self._prefix_caches_lock = Lock()
+        self.prefix_cache_hit_tokens = 0
+
+    def _new_prefix_cache(self):
+        return FakeCache()
+
+    def _prepare_completion_args(self, messages, **kwargs):
+        return dict(inputs=PromptIds([TokenIds(messages)]))
+
+    def call(self, caller, prompt_ids):
+        with model_ledger.caller(caller):
+            return "".join(delta.content for delta in self.generate_stream(prompt_ids))
+
+
+class TestPrefixCacheByCaller(unittest.TestCase):
+
+    def setUp(self):
+        self.model = FakeTransformersModel(prefix_cache_size=2)
+
+    def test_callers_taking_turns_keep_their_prefix(self):
+        self.model.call("planner", [1, 2, 3, 4])
+        self.model.call("researcher", [5, 6, 7])
+        self.model.call("planner", [1, 2, 3, 4, 8])
+        self.assertEqual(self.model.prefix_cache_hit_tokens, 4)
+        self.model.call("researcher", [5, 6, 7, 9])
+        self.assertEqual(self.model.prefix_cache_hit_tokens, 3)
+        self.assertEqual(self.model.model.encoded, [4, 3, 1, 1])
+
+    def test_least_recently_used_caller_is_dropped(self):
+        self.model.call("planner", [1, 2, 3])
+        self.model.call("researcher", [4, 5, 6])
+        self.model.call("analyzer", [7, 8, 9])
+        self.assertEqual(list(self.model._prefix_caches), ["researcher", "analyzer"])
+        self.model.call("planner", [1, 2, 3, 4])
+        self.assertEqual(self.model.prefix_cache_hit_tokens, 0)
+
+    def test_failed_stream_drops_cache(self):
+        self.model.call("planner", [1, 2, 3])
+        self.model.model.fail = True
+        with self.assertRaises(RuntimeError):
+            self.model.call("planner", [1, 2, 3, 4])
+        self.assertNotIn("planner", self.model._prefix_caches)
+
+        self.model.model.fail = False
+        self.model.call("planner", [1, 2, 3, 4])
+        self.assertEqual(self.model.prefix_cache_hit_tokens, 0)
+
+
+class TestLongestCommonPrefixLength(unittest.TestCase):
+
+    def test_identical(self):
+        self.assertEqual(longest_common_prefix_length([1, 2, 3], [1, 2, 3]), 3)
+
+    def test_diverging(self):
+        self.assertEqual(longest_common_prefix_length([1, 2, 3, 4], [1, 2, 5]), 2)
+
+    def test_empty(self):
+        self.assertEqual(longest_common_prefix_length([], [1, 2]), 0)
+
+
+@unittest.skipUnless(HAS_TORCH, "torch and transformers are required")
+class TestTransformersPrefixCache(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.cached_model = TransformersModel(
+            model_id=TINY_MODEL_ID, device_map="cpu", max_new_tokens=8, do_sample=False, prefix_cache=True
+        )
+        cls.plain_model = TransformersModel(model_id=TINY_MODEL_ID, device_map="cpu", max_new_tokens=8, do_sample=False)
+
+    def setUp(self):
+        self.cached_model.reset_prefix_cache()
+
+    def test_second_call_reuses_prefix_and_matches_uncached_output(self):
+        history = [_user_message("You are a helpful agent. " * 8), _user_message("First step.")]
+        self.cached_model.generate(history)
+        self.assertEqual(self.cached_model.prefix_cache_hit_tokens, 0)
+
+        history = history + [_user_message("Second step.")]
+        cached_output = self.cached_model.generate(history)
+        self.assertGreater(self.cached_model.prefix_cache_hit_tokens, 0)
+
+        plain_output = self.plain_model.generate(history)
+        self.assertEqual(cached_output.content, plain_output.content)
+
+    def test_cache_dropped_beyond_bound(self):
+        self.cached_model.prefix_cache_max_tokens = 4
+        try:
+            self.cached_model.generate([_user_message("A prompt that is longer than four tokens.")])
+            self.assertEqual(self.cached_model._prefix_caches, {})
+        finally:
+            self.cached_model.prefix_cache_max_tokens = 32768
+
+
+if __name__ == "__main__":
+    unittest.main()